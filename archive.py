@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Arquivamento de documentos antigos já verificados.
+
+Documentos verificados há mais de ARCHIVE_AFTER_DAYS dias são movidos, junto
+com seus logs de verificação, folhas de Merkle e entregas, para bancos de arquivo mensais
+(archive/documents_AAAA_MM.db). A tabela archived_documents do banco principal
+indica em qual partição cada documento está, para que as consultas de
+document_manager consigam encontrá-lo de forma transparente.
+
+Uso:
+    python archive.py executar [--dias N] [--lote N]
+    python archive.py retomar [--lote N]
+    python archive.py status
+"""
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from database import get_db_connection, add_missing_columns
+from config import ARCHIVE_DIR, ARCHIVE_AFTER_DAYS
+
+ARCHIVE_SCHEMA = "arch"
+
+def get_archive_dir():
+    """Diretório de arquivo, relativo ao banco principal quando não for absoluto"""
+    if os.path.isabs(ARCHIVE_DIR):
+        return ARCHIVE_DIR
+    db_dir = os.path.dirname(os.path.abspath(database.DATABASE_NAME))
+    return os.path.join(db_dir, ARCHIVE_DIR)
+
+def archive_path(partition):
+    """Caminho do banco de arquivo de uma partição ("AAAA_MM")"""
+    return os.path.join(get_archive_dir(), f"documents_{partition}.db")
+
+def _table_columns(cursor, table, schema="main"):
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [(row[1], row[2]) for row in cursor.fetchall()]
+
+# Tabelas movidas para o arquivo e suas chaves únicas
+ARCHIVED_TABLES = (
+    ("documents", "document_id"),
+    ("verification_logs", "log_id"),
+    ("document_chunks", "document_id, chunk_index"),
+    ("document_deliveries", "document_id, receiver_id"),
+)
+
+def _ensure_archive_tables(cursor):
+    """Cria (ou atualiza) as tabelas do banco de arquivo anexado"""
+    for table, key in ARCHIVED_TABLES:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.{table} AS SELECT * FROM main.{table} WHERE 0")
+        index_name = f"idx_{table}_" + key.replace(", ", "_")
+        cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.{index_name} ON {table}({key})")
+        # Colunas adicionadas ao banco principal depois da criação do arquivo
+        add_missing_columns(cursor, table, _table_columns(cursor, table), schema=ARCHIVE_SCHEMA)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_verification_logs_document ON verification_logs(document_id)")
+
+@contextmanager
+def attached_partition(conn, partition, create=False):
+    """
+    Anexa o banco de arquivo da partição à conexão como schema "arch".
+
+    Yields:
+        str: Nome do schema anexado, ou None se o arquivo não existir
+    """
+    path = archive_path(partition)
+    if not create and not os.path.exists(path):
+        yield None
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+    try:
+        yield ARCHIVE_SCHEMA
+    finally:
+        conn.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+
+def upgrade_partitions():
+    """
+    Cria nas partições existentes as tabelas e colunas adicionadas ao banco
+    principal depois delas. Roda uma vez, em database.create_tables, para que
+    as leituras das partições não precisem alterar o esquema.
+    """
+    directory = get_archive_dir()
+    if not os.path.isdir(directory):
+        return
+    partitions = sorted(name[len("documents_"):-len(".db")] for name in os.listdir(directory)
+                        if name.startswith("documents_") and name.endswith(".db"))
+    conn = get_db_connection()
+    try:
+        for partition in partitions:
+            with attached_partition(conn, partition):
+                _ensure_archive_tables(conn.cursor())
+                conn.commit()
+    finally:
+        conn.close()
+
+def get_document_partition(conn, document_id):
+    """Retorna a partição de um documento arquivado, ou None se estiver no banco principal"""
+    row = conn.execute("SELECT partition FROM archived_documents WHERE document_id = ?",
+                       (document_id,)).fetchone()
+    return row[0] if row else None
+
+@contextmanager
+def archived_document_schema(conn, document_id):
+    """Anexa a partição que contém o documento, se ele estiver arquivado"""
+    partition = get_document_partition(conn, document_id)
+    if partition is None:
+        yield None
+        return
+    # Só leitura: o esquema das partições é atualizado em upgrade_partitions
+    with attached_partition(conn, partition) as schema:
+        yield schema
+
+def _move_partition(conn, partition, document_ids):
+    """Move um lote de documentos de uma mesma partição em uma única transação"""
+    placeholders = ",".join("?" * len(document_ids))
+    with attached_partition(conn, partition, create=True):
+        cursor = conn.cursor()
+        _ensure_archive_tables(cursor)
+        conn.commit()
+
+        try:
+            # INSERT OR IGNORE torna a cópia idempotente caso um lote seja repetido
+            for table, _ in ARCHIVED_TABLES:
+                columns = ", ".join(name for name, _ in _table_columns(cursor, table))
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO {ARCHIVE_SCHEMA}.{table} ({columns})
+                    SELECT {columns} FROM main.{table} WHERE document_id IN ({placeholders})
+                """, document_ids)
+            cursor.executemany("INSERT OR REPLACE INTO archived_documents (document_id, partition) VALUES (?, ?)",
+                               [(document_id, partition) for document_id in document_ids])
+            for table, _ in reversed(ARCHIVED_TABLES):
+                cursor.execute(f"DELETE FROM main.{table} WHERE document_id IN ({placeholders})", document_ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def archive_documents(older_than_days=ARCHIVE_AFTER_DAYS, batch_size=500, run_id=None, progress=None, stop=None):
+    """
+    Move documentos verificados mais antigos que o limite para os bancos de arquivo.
+    Cada lote é confirmado separadamente, então uma execução interrompida pode
+    ser retomada sem repetir trabalho.
+
+    Args:
+        older_than_days: Idade mínima (dias desde a verificação)
+        batch_size: Quantidade de documentos movidos por transação
+        run_id: Execução a retomar (usa o mesmo limite de data da execução original)
+        progress: Função chamada com (run_id, movidos) no início e a cada lote
+        stop: Função consultada entre os lotes; se retornar True, a execução fica
+              'interrupted' e pode ser retomada depois
+
+    Returns:
+        int: Quantidade de documentos movidos nesta chamada
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    moved = 0
+    try:
+        if run_id is None:
+            cutoff = datetime.now() - timedelta(days=older_than_days)
+            cursor.execute("INSERT INTO archive_runs (cutoff) VALUES (?)", (cutoff,))
+            run_id = cursor.lastrowid
+            conn.commit()
+        else:
+            cursor.execute("SELECT cutoff FROM archive_runs WHERE run_id = ?", (run_id,))
+            row = cursor.fetchone()
+            if not row:
+                raise ValueError(f"Execução de arquivamento {run_id} não encontrada")
+            cutoff = row["cutoff"]
+            cursor.execute("UPDATE archive_runs SET status = 'running', finished_at = NULL WHERE run_id = ?", (run_id,))
+            conn.commit()
+
+        if progress:
+            progress(run_id, moved)
+        while True:
+            if stop and stop():
+                cursor.execute("UPDATE archive_runs SET status = 'interrupted' WHERE run_id = ?", (run_id,))
+                conn.commit()
+                return moved
+
+            cursor.execute("""
+                SELECT document_id, substr(created_at, 1, 7) as month
+                FROM documents
+                WHERE status = 'verified' AND verified_at < ?
+                LIMIT ?
+            """, (cutoff, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            by_partition = {}
+            for row in rows:
+                by_partition.setdefault(row["month"].replace("-", "_"), []).append(row["document_id"])
+
+            for partition, document_ids in by_partition.items():
+                _move_partition(conn, partition, document_ids)
+                moved += len(document_ids)
+                print(f"  {len(document_ids)} documento(s) movido(s) para {os.path.basename(archive_path(partition))}")
+
+            cursor.execute("UPDATE archive_runs SET moved_count = moved_count + ? WHERE run_id = ?",
+                           (len(rows), run_id))
+            conn.commit()
+            if progress:
+                progress(run_id, moved)
+
+        cursor.execute("UPDATE archive_runs SET status = 'finished', finished_at = ? WHERE run_id = ?",
+                       (datetime.now(), run_id))
+        conn.commit()
+        return moved
+    except BaseException:
+        if run_id is not None:
+            conn.rollback()
+            cursor.execute("UPDATE archive_runs SET status = 'interrupted' WHERE run_id = ?", (run_id,))
+            conn.commit()
+        raise
+    finally:
+        conn.close()
+
+def get_last_unfinished_run():
+    """Retorna o id da última execução não concluída, ou None"""
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT run_id FROM archive_runs WHERE status != 'finished' ORDER BY run_id DESC LIMIT 1").fetchone()
+        return row["run_id"] if row else None
+    finally:
+        conn.close()
+
+def get_archive_status():
+    """Resumo do arquivamento: documentos por partição e últimas execuções"""
+    conn = get_db_connection()
+    try:
+        partitions = [dict(row) for row in conn.execute("""
+            SELECT partition, COUNT(*) as documents FROM archived_documents
+            GROUP BY partition ORDER BY partition
+        """)]
+        runs = [dict(row) for row in conn.execute("SELECT * FROM archive_runs ORDER BY run_id DESC LIMIT 5")]
+        return {"partitions": partitions, "runs": runs}
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Arquivamento de documentos verificados antigos")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_run = subparsers.add_parser("executar", help="Inicia uma nova execução de arquivamento")
+    p_run.add_argument("--dias", type=int, default=ARCHIVE_AFTER_DAYS,
+                       help="Idade mínima em dias desde a verificação")
+    p_run.add_argument("--lote", type=int, default=500, help="Documentos por transação")
+
+    p_resume = subparsers.add_parser("retomar", help="Retoma a última execução interrompida")
+    p_resume.add_argument("--lote", type=int, default=500, help="Documentos por transação")
+
+    subparsers.add_parser("status", help="Mostra partições e execuções recentes")
+
+    args = parser.parse_args()
+    database.create_tables()
+
+    if args.comando == "executar":
+        moved = archive_documents(args.dias, args.lote)
+        print(f"Arquivamento concluído: {moved} documento(s) movido(s).")
+    elif args.comando == "retomar":
+        run_id = get_last_unfinished_run()
+        if run_id is None:
+            print("Nenhuma execução interrompida para retomar.")
+            return
+        moved = archive_documents(batch_size=args.lote, run_id=run_id)
+        print(f"Execução {run_id} retomada: {moved} documento(s) movido(s).")
+    else:
+        status = get_archive_status()
+        print("Partições:")
+        for partition in status["partitions"]:
+            print(f"  {partition['partition']}: {partition['documents']} documento(s)")
+        print("Execuções recentes:")
+        for run in status["runs"]:
+            print(f"  #{run['run_id']} {run['status']} corte={run['cutoff']} movidos={run['moved_count']}")
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,16 @@ import bcrypt
 import secrets
 from datetime import datetime, timedelta
 from database import get_db_connection
+from records import row_factory, UserSummary
+import metrics
 
 # Função para hash de senha
+@metrics.timed("auth.bcrypt_hash")
 def hash_password(password):
     return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
 
 # Função para verificar senha
+@metrics.timed("auth.bcrypt_check")
 def check_password(password, hashed_password):
     return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
 
@@ -48,6 +52,7 @@ def register_user(nome, email, senha):
         conn.close()
 
 # Função de login de usuário
+@metrics.timed("auth.login")
 def login_user(email, senha):
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -128,16 +133,52 @@ def get_user_by_id(user_id):
     finally:
         conn.close()
 
-# Função para obter todos os usuários (para seleção de destinatário)
+# Função para obter todos os usuários (lista completa; para seleção de destinatário use search_users)
 def get_all_users_except_current(current_user_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
+        cursor.row_factory = row_factory(UserSummary)
         cursor.execute("SELECT user_id, nome, email FROM users WHERE user_id != ? AND email_verified = TRUE", (current_user_id,))
-        users = []
-        for row in cursor.fetchall():
-            users.append({"user_id": row[0], "nome": row[1], "email": row[2]})
-        return users
+        return cursor.fetchall()
     finally:
         conn.close()
 
+def _like_prefix(text):
+    """Padrão LIKE de prefixo, escapando os curingas digitados pelo usuário"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+# Função de busca de destinatários por prefixo do nome ou do email
+def search_users(query, current_user_id, limit=20, cursor=None):
+    """
+    Busca usuários verificados cujo nome ou email começa com `query`, sem
+    distinção de maiúsculas (apenas ASCII, como o NOCASE do SQLite).
+    Os resultados vêm ordenados por nome; para a próxima página, passe o
+    cursor devolvido pela chamada anterior.
+
+    Returns:
+        tuple: (lista de UserSummary, cursor da próxima página ou None)
+    """
+    pattern = _like_prefix(query.strip())
+    params = [pattern, pattern, current_user_id]
+    after_cursor = ""
+    if cursor:
+        after_cursor = "AND (nome COLLATE NOCASE, user_id) > (?, ?)"
+        params.extend(cursor)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = row_factory(UserSummary)
+    try:
+        rows = cursor.execute(f"""
+            SELECT user_id, nome, email FROM users
+            WHERE (nome LIKE ? ESCAPE '\\' OR email LIKE ? ESCAPE '\\')
+              AND email_verified = TRUE AND user_id != ?
+              {after_cursor}
+            ORDER BY nome COLLATE NOCASE, user_id
+            LIMIT ?
+        """, (*params, limit + 1)).fetchall()
+    finally:
+        conn.close()
+    users = rows[:limit]
+    next_cursor = (users[-1].nome, users[-1].user_id) if len(rows) > limit else None
+    return users, next_cursor
@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do sistema de assinatura digital.
+
+Uso:
+    python benchmarks.py compressao [arquivos...] [--repeticoes N]
+    python benchmarks.py verificacao [--tamanhos-mb 1 4 16]
+    python benchmarks.py backends [--assinaturas N]
+    python benchmarks.py hashes [--mb N]
+    python benchmarks.py escala [--escalas 1000 10000 100000] [--saida resultado.json]
+    python benchmarks.py registros [--documentos N]
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from compression import CODECS, compress_payload, decompress_payload
+
+def _sample_payloads(paths):
+    """Carrega os arquivos informados ou gera amostras sintéticas"""
+    if paths:
+        samples = []
+        for path in paths:
+            with open(path, "rb") as f:
+                samples.append((os.path.basename(path), f.read()))
+        return samples
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(base_dir, "teste_documento.txt"), "rb") as f:
+        texto = f.read()
+    log_line = b"2025-07-16 10:00:00 INFO usuario=joao@teste.com acao=assinar documento=contrato.pdf status=ok\n"
+    return [
+        ("teste_documento.txt", texto),
+        ("texto_1MB", (texto * (1024 * 1024 // len(texto) + 1))[:1024 * 1024]),
+        ("log_1MB", (log_line * (1024 * 1024 // len(log_line) + 1))[:1024 * 1024]),
+        ("aleatorio_1MB", os.urandom(1024 * 1024)),
+    ]
+
+def bench_compression(paths=None, repeat=5):
+    """
+    Compara a economia de espaço de cada codec com o custo de CPU.
+
+    Returns:
+        list: Um dicionário de resultados por (amostra, codec)
+    """
+    results = []
+    for name, data in _sample_payloads(paths):
+        for codec in CODECS:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                stored, used_codec = compress_payload(data, codec)
+            compress_s = (time.perf_counter() - start) / repeat
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                restored = decompress_payload(stored, used_codec)
+            decompress_s = (time.perf_counter() - start) / repeat
+
+            assert restored == data
+            results.append({
+                "amostra": name,
+                "codec": codec,
+                "codec_usado": used_codec,
+                "tamanho_original": len(data),
+                "tamanho_armazenado": len(stored),
+                "economia_pct": 100.0 * (1 - len(stored) / max(len(data), 1)),
+                "compressao_ms": compress_s * 1000,
+                "descompressao_ms": decompress_s * 1000,
+            })
+    return results
+
+def print_compression_report(results):
+    print(f"{'amostra':<22}{'codec':<7}{'original':>12}{'armazenado':>12}{'economia':>10}{'compr. ms':>11}{'descomp. ms':>13}")
+    for r in results:
+        codec = r["codec"] if r["codec"] == r["codec_usado"] else f"{r['codec']}*"
+        print(f"{r['amostra']:<22}{codec:<7}{r['tamanho_original']:>12}{r['tamanho_armazenado']:>12}"
+              f"{r['economia_pct']:>9.1f}%{r['compressao_ms']:>11.2f}{r['descompressao_ms']:>13.2f}")
+    print("\n* conteúdo não diminuiu e foi armazenado sem compressão")
+    print("O armazenamento inclui a codificação base64 usada na coluna document_content.")
+
+def _legacy_verify_payload(document_content_b64, verifier, signature_b64, stored_hash):
+    """Reprodução do pipeline anterior: várias decodificações do base64 e teste de UTF-8"""
+    from crypto.signature import sha3_256_hash
+    try:
+        document_content = base64.b64decode(document_content_b64).decode("utf-8")
+    except UnicodeDecodeError:
+        document_content = document_content_b64
+    if document_content == document_content_b64:
+        calculated_hash = sha3_256_hash(base64.b64decode(document_content_b64))
+    else:
+        calculated_hash = sha3_256_hash(document_content)
+    return calculated_hash == stored_hash and verifier.verify(document_content, signature_b64)
+
+def _measure(func, repeat):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def bench_verification(sizes_mb=(1, 4, 16), repeat=3):
+    """
+    Mede tempo e pico de memória por MB da verificação de um pacote:
+    pipeline anterior, pacote base64 decodificado uma vez e buffer já decodificado.
+    """
+    from crypto.keygen import generate_rsa_keys
+    from crypto.signature import sign_document_content
+    from crypto.verification import Verifier
+
+    public_key, private_key = generate_rsa_keys()
+    verifier = Verifier(public_key)
+
+    results = []
+    for size_mb in sizes_mb:
+        text = (b"linha de contrato para o benchmark de verificacao\n" * (size_mb * 1024 * 1024 // 51 + 1))[:size_mb * 1024 * 1024]
+        package = sign_document_content(text, private_key, "a@teste.com", "b@teste.com", "text")
+        stored_hash = base64.b64decode(package["document_hash"])
+
+        variants = {
+            "anterior": lambda: _legacy_verify_payload(package["document_content"], verifier,
+                                                       package["signature"], stored_hash),
+            "pacote_base64": lambda: verifier.verify_package(package),
+            "buffer": lambda: verifier.verify_package(package, text),
+        }
+        for name, func in variants.items():
+            elapsed, peak = _measure(func, repeat)
+            results.append({
+                "tamanho_mb": size_mb,
+                "pipeline": name,
+                "ms_por_mb": elapsed * 1000 / size_mb,
+                "pico_memoria_por_mb": peak / (size_mb * 1024 * 1024),
+            })
+    return results
+
+def print_verification_report(results):
+    print(f"{'MB':>4}  {'pipeline':<15}{'ms/MB':>10}{'pico de memória (MB/MB)':>26}")
+    for r in results:
+        print(f"{r['tamanho_mb']:>4}  {r['pipeline']:<15}{r['ms_por_mb']:>10.2f}{r['pico_memoria_por_mb']:>26.2f}")
+
+def backend_compatibility_matrix(signatures=10):
+    """
+    Matriz de compatibilidade entre backends: para cada combinação de
+    (gerador de chaves, assinante, verificador), conta as assinaturas aceitas
+    e confirma que uma assinatura não é aceita para outro hash.
+    Inclui as funções de referência rsa_pss_sign/rsa_pss_verify.
+    """
+    from crypto.crypto_backend import BACKENDS, get_backend
+    from crypto.signature import format_signature, rsa_pss_sign, sha3_256_hash
+    from crypto.verification import rsa_pss_verify
+
+    names = list(BACKENDS)
+    rows = []
+    for keygen_name in names:
+        public_key, private_key = get_backend(keygen_name).generate_rsa_keys()
+        em_len = (public_key[0].bit_length() + 7) // 8
+
+        for signer_name in names + ["rsa_pss_sign"]:
+            for verifier_name in names + ["rsa_pss_verify"]:
+                accepted = rejected = 0
+                for i in range(signatures):
+                    message = f"mensagem {i}".encode()
+                    m_hash = sha3_256_hash(message)
+                    if signer_name == "rsa_pss_sign":
+                        sig = format_signature(rsa_pss_sign(message, private_key, em_len), em_len)
+                    else:
+                        sig = get_backend(signer_name).sign_digest(m_hash, private_key)
+
+                    if verifier_name == "rsa_pss_verify":
+                        ok = rsa_pss_verify(message, sig, public_key, em_len)
+                        wrong = rsa_pss_verify(message + b"!", sig, public_key, em_len)
+                    else:
+                        backend = get_backend(verifier_name)
+                        ok = backend.verify_digest(m_hash, sig, public_key)
+                        wrong = backend.verify_digest(sha3_256_hash(message + b"!"), sig, public_key)
+                    accepted += ok
+                    rejected += not wrong
+                rows.append({
+                    "chaves": keygen_name,
+                    "assinante": signer_name,
+                    "verificador": verifier_name,
+                    "aceitas": accepted,
+                    "adulteradas_rejeitadas": rejected,
+                    "total": signatures,
+                })
+    return rows
+
+def bench_backends(signatures=50, keys=3):
+    """Vazão de geração de chaves, assinatura e verificação por backend"""
+    from crypto.crypto_backend import BACKENDS, get_backend
+    from crypto.signature import sha3_256_hash
+
+    m_hash = sha3_256_hash(b"benchmark")
+    results = []
+    for name in BACKENDS:
+        backend = get_backend(name)
+
+        start = time.perf_counter()
+        for _ in range(keys):
+            public_key, private_key = backend.generate_rsa_keys()
+        keygen_s = (time.perf_counter() - start) / keys
+
+        start = time.perf_counter()
+        sigs = [backend.sign_digest(m_hash, private_key) for _ in range(signatures)]
+        sign_s = (time.perf_counter() - start) / signatures
+
+        start = time.perf_counter()
+        for sig in sigs:
+            backend.verify_digest(m_hash, sig, public_key)
+        verify_s = (time.perf_counter() - start) / signatures
+
+        results.append({
+            "backend": name,
+            "chaves_por_s": 1 / keygen_s,
+            "assinaturas_por_s": 1 / sign_s,
+            "verificacoes_por_s": 1 / verify_s,
+        })
+    return results
+
+def print_backends_report(matrix, throughput):
+    print("Matriz de compatibilidade:")
+    print(f"{'chaves':<10}{'assinante':<15}{'verificador':<17}{'aceitas':>9}{'adulteradas rejeitadas':>24}")
+    for r in matrix:
+        print(f"{r['chaves']:<10}{r['assinante']:<15}{r['verificador']:<17}"
+              f"{r['aceitas']:>5}/{r['total']:<3}{r['adulteradas_rejeitadas']:>20}/{r['total']}")
+    print("\nVazão:")
+    print(f"{'backend':<10}{'chaves/s':>12}{'assinaturas/s':>16}{'verificações/s':>17}")
+    for r in throughput:
+        print(f"{r['backend']:<10}{r['chaves_por_s']:>12.2f}{r['assinaturas_por_s']:>16.1f}{r['verificacoes_por_s']:>17.1f}")
+
+def bench_hashes(buffer_mb=64, repeat=3, signatures=50):
+    """
+    Vazão por GB de cada algoritmo de hash para o conteúdo do documento e o
+    custo do PSS (MGF1 + hash de m') por assinatura.
+    """
+    from crypto.signature import HASH_ALGORITHMS, get_hash_function, hash_content, mgf1
+
+    data = os.urandom(buffer_mb * 1024 * 1024)
+    salt = os.urandom(32)
+    db_len = 256 - 32 - 1  # chave de 2048 bits
+    results = []
+    for name in HASH_ALGORITHMS:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            m_hash = hash_content(data, name)
+        elapsed = (time.perf_counter() - start) / repeat
+        gb = buffer_mb / 1024
+
+        # Mede só os hashes do PSS: a exponenciação RSA é igual para todos os algoritmos
+        hash_function = get_hash_function(name)
+        start = time.perf_counter()
+        for _ in range(signatures):
+            h = hash_function(b"\x00" * 8 + m_hash + salt).digest()
+            mgf1(h, db_len, 32, name)
+        pss_us = (time.perf_counter() - start) / signatures * 1e6
+
+        results.append({
+            "algoritmo": name,
+            "segundos_por_gb": elapsed / gb,
+            "mb_por_s": buffer_mb / elapsed,
+            "pss_us_por_assinatura": pss_us,
+        })
+    return results
+
+def print_hashes_report(results):
+    print(f"{'algoritmo':<14}{'s/GB':>10}{'MB/s':>10}{'PSS (µs/assinatura)':>22}")
+    for r in results:
+        print(f"{r['algoritmo']:<14}{r['segundos_por_gb']:>10.2f}{r['mb_por_s']:>10.1f}{r['pss_us_por_assinatura']:>22.1f}")
+
+# ---------------------------------------------------------------------------
+# Escala da camada de banco de dados
+# ---------------------------------------------------------------------------
+
+SCALING_OPERATIONS = ("enviados", "recebidos", "estatisticas", "historico", "usuarios", "busca", "verificar")
+
+def _drop_file_cache(path):
+    """
+    Pede ao kernel que descarte as páginas do arquivo do cache do sistema.
+    O cache de páginas do SQLite já é descartado a cada chamada, porque as
+    funções do sistema abrem uma conexão nova.
+
+    Returns:
+        bool: False se a plataforma não oferece posix_fadvise
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        # Páginas sujas não são descartadas; grava-as antes
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+def _sample_participants(conn, rng, count):
+    """Sorteia documentos por rowid: usuários ativos aparecem na proporção da sua atividade"""
+    max_rowid = conn.execute("SELECT MAX(rowid) FROM documents").fetchone()[0] or 0
+    rows = []
+    for first in range(0, count if max_rowid else 0, 500):
+        rowids = [rng.randint(1, max_rowid) for _ in range(min(500, count - first))]
+        rows.extend(conn.execute(
+            f"SELECT document_id, sender_id, receiver_id FROM documents WHERE rowid IN ({','.join('?' * len(rowids))})",
+            rowids).fetchall())
+    return [(row["document_id"], row["sender_id"], row["receiver_id"]) for row in rows]
+
+def _run_scaling_operation(name, document_id, sender_id, receiver_id):
+    """
+    Executa uma operação do sistema.
+
+    Returns:
+        int: Linhas produzidas (para estatísticas, documentos contados)
+    """
+    import auth
+    import document_manager
+
+    if name == "enviados":
+        return len(document_manager.get_sent_documents(sender_id))
+    if name == "recebidos":
+        return len(document_manager.get_received_documents(receiver_id))
+    if name == "estatisticas":
+        stats = document_manager.get_document_statistics(receiver_id)
+        return stats["sent_count"] + stats["received_count"]
+    if name == "historico":
+        history, _ = document_manager.get_verification_history(document_id, receiver_id)
+        return len(history)
+    if name == "usuarios":
+        return len(auth.get_all_users_except_current(receiver_id))
+    if name == "busca":
+        # Primeira página da busca de destinatários pelo início do email de carga ("carga12...")
+        users, _ = auth.search_users(f"carga{str(sender_id)[:2]}", receiver_id)
+        return len(users)
+    document_manager.verify_document(document_id, receiver_id)
+    return 1
+
+def _summarize_scaling(latencies, rows):
+    from gerar_carga_teste import percentile
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "chamadas": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "media_ms": total / len(latencies) * 1000,
+        "linhas_por_chamada": rows / len(latencies),
+        "linhas_por_s": rows / total if total else None,
+    }
+
+def bench_scaling(scales=(1000, 10000, 100000), repeat=30, users_ratio=1.0, directory=None,
+                  operations=SCALING_OPERATIONS, seed=42):
+    """
+    Latência das consultas e da verificação em bancos de tamanhos crescentes.
+
+    Para cada escala, popula um banco com gerar_carga_teste (N documentos,
+    N * users_ratio usuários, N / 5 verificações) e executa cada operação
+    `repeat` vezes com cache frio (páginas do arquivo descartadas antes de cada
+    chamada) e depois com cache quente (após uma chamada de aquecimento).
+
+    Args:
+        directory: Onde manter os bancos gerados; um banco já existente para a
+            escala é reaproveitado. Sem diretório, usa um temporário descartado ao final.
+
+    Returns:
+        dict: Resultados por escala, operação e cache ("frio"/"quente")
+    """
+    import database
+    import key_manager
+    from gerar_carga_teste import generate_load
+
+    temporary = directory is None
+    directory = tempfile.mkdtemp(prefix="bench_escala_") if temporary else directory
+    os.makedirs(directory, exist_ok=True)
+    original_db = database.DATABASE_NAME
+    results = {}
+    try:
+        for scale in scales:
+            path = os.path.join(directory, f"escala_{scale}.db")
+            database.DATABASE_NAME = path
+            entry = {"documentos": scale, "usuarios": max(2, int(scale * users_ratio))}
+            if os.path.exists(path):
+                database.create_tables()
+            else:
+                load = generate_load(entry["usuarios"], scale, scale // 5, seed=seed, verbose=False)
+                entry["populacao_s"] = sum(value for key, value in load.items() if key.endswith("_s"))
+            entry["tamanho_banco_mb"] = os.path.getsize(path) / (1024 * 1024)
+
+            conn = database.get_db_connection()
+            try:
+                samples = _sample_participants(conn, random.Random(seed + scale), repeat + 1)
+            finally:
+                conn.close()
+
+            entry["operacoes"] = {}
+            for name in operations:
+                measured = {}
+                for cache in ("frio", "quente"):
+                    latencies, rows = [], 0
+                    # As funções do sistema imprimem o progresso (ex.: "Verificando assinatura...")
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        if cache == "quente":
+                            _run_scaling_operation(name, *samples[-1])
+                        for sample in samples[:repeat]:
+                            if cache == "frio":
+                                key_manager.clear_user_key_cache()
+                                if not _drop_file_cache(path):
+                                    break
+                            start = time.perf_counter()
+                            rows += _run_scaling_operation(name, *sample)
+                            latencies.append(time.perf_counter() - start)
+                    measured[cache] = _summarize_scaling(latencies, rows) if latencies else None
+                entry["operacoes"][name] = measured
+            results[str(scale)] = entry
+    finally:
+        database.DATABASE_NAME = original_db
+        if temporary:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def print_scaling_report(results):
+    print(f"{'escala':>9} {'operação':<14}{'cache':<8}{'p50 ms':>10}{'p99 ms':>10}{'linhas/s':>14}")
+    for scale, entry in results.items():
+        for name, measured in entry["operacoes"].items():
+            for cache, r in measured.items():
+                if r is None:
+                    print(f"{scale:>9} {name:<14}{cache:<8}{'indisponível':>34}")
+                    continue
+                rows_per_s = f"{r['linhas_por_s']:.0f}" if r["linhas_por_s"] is not None else "-"
+                print(f"{scale:>9} {name:<14}{cache:<8}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{rows_per_s:>14}")
+
+# ---------------------------------------------------------------------------
+# Memória das listagens: dicionários por linha x registros com __slots__
+# ---------------------------------------------------------------------------
+
+@contextlib.contextmanager
+def _legacy_dict_rows():
+    """Reprodução das listagens anteriores: cada sqlite3.Row copiado campo a campo para um dict"""
+    import document_manager
+
+    def legacy_factory(record_class):
+        def factory(cursor, row):
+            row = sqlite3.Row(cursor, row)
+            return {name: row[name] for name in record_class.__slots__}
+        return factory
+
+    original = document_manager.row_factory
+    document_manager.row_factory = legacy_factory
+    try:
+        yield
+    finally:
+        document_manager.row_factory = original
+
+def _seed_listing_database(documents):
+    """Banco com dois usuários, `documents` documentos de um para o outro e um histórico do mesmo tamanho"""
+    import database
+
+    database.create_tables()
+    conn = database.get_db_connection()
+    try:
+        conn.executemany("INSERT INTO users (nome, email, senha_hash, email_verified) VALUES (?, ?, '-', TRUE)",
+                         [("Remetente", "remetente@teste.com"), ("Destinatário", "destinatario@teste.com")])
+        created_at = datetime.now()
+        conn.executemany("""
+            INSERT INTO documents (document_id, sender_id, receiver_id, document_name, document_content,
+                                   document_hash, public_key, private_key_encrypted, signature, created_at)
+            VALUES (?, 1, 2, ?, '', '', '', '', '', ?)
+        """, ((f"{i:08d}-0000-0000-0000-000000000000", f"Documento {i}.pdf", created_at - timedelta(seconds=i))
+              for i in range(documents)))
+        conn.executemany("""
+            INSERT INTO verification_logs (document_id, verifier_id, result, error_message, verified_at)
+            VALUES ('00000000-0000-0000-0000-000000000000', 2, 'verified', NULL, ?)
+        """, ((created_at + timedelta(seconds=i),) for i in range(documents)))
+        conn.commit()
+    finally:
+        conn.close()
+
+def bench_records(documents=100000, repeat=3):
+    """
+    Bytes retidos por item listado e tempo das listagens, com dicionários por
+    linha (como antes) e com os registros de records.py.
+
+    Returns:
+        list: Um dicionário de resultados por (operação, formato)
+    """
+    import database
+    import document_manager
+
+    operations = {
+        "enviados": lambda: document_manager.get_sent_documents(1),
+        "recebidos": lambda: document_manager.get_received_documents(2),
+        "historico": lambda: document_manager.get_verification_history("00000000-0000-0000-0000-000000000000", 2)[0],
+    }
+    directory = tempfile.mkdtemp(prefix="bench_registros_")
+    original_db = database.DATABASE_NAME
+    database.DATABASE_NAME = os.path.join(directory, "registros.db")
+    results = []
+    try:
+        _seed_listing_database(documents)
+        for name, listing in operations.items():
+            for layout in ("dict", "registro"):
+                with _legacy_dict_rows() if layout == "dict" else contextlib.nullcontext():
+                    start = time.perf_counter()
+                    for _ in range(repeat):
+                        items = listing()
+                    elapsed = (time.perf_counter() - start) / repeat
+                    del items
+
+                    tracemalloc.start()
+                    items = listing()
+                    retained, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                results.append({
+                    "operacao": name,
+                    "formato": layout,
+                    "itens": len(items),
+                    "bytes_por_item": retained / max(len(items), 1),
+                    "pico_mb": peak / (1024 * 1024),
+                    "tempo_ms": elapsed * 1000,
+                })
+                del items
+    finally:
+        database.DATABASE_NAME = original_db
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def print_records_report(results):
+    print(f"{'operação':<12}{'formato':<10}{'itens':>9}{'bytes/item':>12}{'pico MB':>10}{'tempo ms':>10}")
+    for r in results:
+        print(f"{r['operacao']:<12}{r['formato']:<10}{r['itens']:>9}{r['bytes_por_item']:>12.0f}"
+              f"{r['pico_mb']:>10.1f}{r['tempo_ms']:>10.1f}")
+    print("\nbytes/item: memória retida pela lista devolvida (itens e seus valores), medida com tracemalloc.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do sistema de assinatura digital")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_comp = subparsers.add_parser("compressao", help="Economia de espaço x custo de CPU por codec")
+    p_comp.add_argument("arquivos", nargs="*", help="Arquivos de amostra (padrão: amostras sintéticas)")
+    p_comp.add_argument("--repeticoes", type=int, default=5)
+
+    p_ver = subparsers.add_parser("verificacao", help="Tempo e memória por MB da verificação")
+    p_ver.add_argument("--tamanhos-mb", type=int, nargs="+", default=[1, 4, 16])
+    p_ver.add_argument("--repeticoes", type=int, default=3)
+
+    p_back = subparsers.add_parser("backends", help="Compatibilidade e vazão dos backends criptográficos")
+    p_back.add_argument("--assinaturas", type=int, default=20)
+
+    p_hash = subparsers.add_parser("hashes", help="Vazão por GB de cada algoritmo de hash")
+    p_hash.add_argument("--mb", type=int, default=64, help="Tamanho do buffer de teste em MB")
+    p_hash.add_argument("--repeticoes", type=int, default=3)
+
+    p_scale = subparsers.add_parser("escala", help="Latência das consultas em bancos de 10^3 a 10^6 documentos")
+    p_scale.add_argument("--escalas", type=int, nargs="+", default=[1000, 10000, 100000],
+                         help="Quantidades de documentos (ex.: 1000 10000 100000 1000000)")
+    p_scale.add_argument("--repeticoes", type=int, default=30, help="Chamadas por operação e cache")
+    p_scale.add_argument("--proporcao-usuarios", type=float, default=1.0,
+                         help="Usuários por documento em cada escala")
+    p_scale.add_argument("--operacoes", nargs="+", choices=SCALING_OPERATIONS, default=list(SCALING_OPERATIONS))
+    p_scale.add_argument("--diretorio", help="Mantém (e reaproveita) os bancos gerados neste diretório")
+    p_scale.add_argument("--saida", help="Grava os resultados em JSON neste arquivo")
+
+    p_rec = subparsers.add_parser("registros", help="Memória por item listado: dicts x registros com __slots__")
+    p_rec.add_argument("--documentos", type=int, default=100000)
+    p_rec.add_argument("--repeticoes", type=int, default=3)
+
+    args = parser.parse_args()
+
+    if args.comando == "compressao":
+        print_compression_report(bench_compression(args.arquivos, args.repeticoes))
+    elif args.comando == "verificacao":
+        print_verification_report(bench_verification(args.tamanhos_mb, args.repeticoes))
+    elif args.comando == "backends":
+        print_backends_report(backend_compatibility_matrix(args.assinaturas),
+                              bench_backends(args.assinaturas))
+    elif args.comando == "hashes":
+        print_hashes_report(bench_hashes(args.mb, args.repeticoes))
+    elif args.comando == "escala":
+        results = bench_scaling(args.escalas, args.repeticoes, args.proporcao_usuarios, args.diretorio,
+                                args.operacoes)
+        print_scaling_report(results)
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+        else:
+            print(json.dumps(results, indent=2))
+    elif args.comando == "registros":
+        print_records_report(bench_records(args.documentos, args.repeticoes))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Módulo de compressão transparente do conteúdo armazenado dos documentos.
+
+O hash e a assinatura continuam sendo calculados sobre os bytes originais;
+a compressão afeta apenas a forma como o conteúdo é gravado no banco.
+"""
+import base64
+import lzma
+import zlib
+
+import metrics
+
+CODECS = ("none", "zlib", "lzma")
+
+@metrics.timed("storage.compress")
+def compress_payload(data, codec):
+    """
+    Comprime os bytes do documento para armazenamento.
+
+    Args:
+        data (bytes): Conteúdo original (os mesmos bytes que foram assinados)
+        codec (str): "none", "zlib" ou "lzma"
+
+    Returns:
+        tuple: (conteúdo armazenado em base64, codec efetivamente usado)
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Codec de compressão desconhecido: {codec}")
+
+    if codec == "zlib":
+        compressed = zlib.compress(data, 6)
+    elif codec == "lzma":
+        compressed = lzma.compress(data, preset=6)
+    else:
+        compressed = None
+
+    # Conteúdos que não diminuem (PDF, imagens, zip) são guardados sem compressão
+    if compressed is None or len(compressed) >= len(data):
+        return base64.b64encode(data).decode(), "none"
+    return base64.b64encode(compressed).decode(), codec
+
+@metrics.timed("storage.decompress")
+def decompress_payload(stored_content, codec):
+    """
+    Recupera os bytes originais a partir do conteúdo armazenado.
+
+    Args:
+        stored_content (str): Valor da coluna document_content
+        codec (str): Valor da coluna content_codec (None em documentos antigos)
+
+    Returns:
+        bytes: Conteúdo original do documento
+    """
+    data = base64.b64decode(stored_content)
+    if codec in (None, "none"):
+        return data
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "lzma":
+        return lzma.decompress(data)
+    raise ValueError(f"Codec de compressão desconhecido: {codec}")
+
+def stored_content_to_b64(stored_content, codec):
+    """Retorna o conteúdo original em base64, sem recodificar documentos não comprimidos"""
+    if codec in (None, "none"):
+        return stored_content
+    return base64.b64encode(decompress_payload(stored_content, codec)).decode()
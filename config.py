@@ -0,0 +1,54 @@
+"""
+Configurações do sistema de assinatura digital.
+Cada opção pode ser sobrescrita por uma variável de ambiente de mesmo nome.
+"""
+import os
+
+# Codec usado para comprimir o conteúdo armazenado em documents.document_content
+# Valores aceitos: "none", "zlib" ou "lzma"
+DOCUMENT_COMPRESSION = os.environ.get("DOCUMENT_COMPRESSION", "zlib")
+
+# Diretório dos bancos de arquivo (um arquivo por mês de criação dos documentos)
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "archive")
+
+# Idade mínima, em dias desde a verificação, para um documento ser arquivado
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "180"))
+
+# Backend criptográfico: "python" (implementação própria) ou "openssl" (pacote cryptography)
+CRYPTO_BACKEND = os.environ.get("CRYPTO_BACKEND", "python")
+
+# Algoritmo de hash de novos documentos: "SHA3-256", "SHA-256" ou "BLAKE2b-256"
+# (documentos existentes continuam sendo verificados com o algoritmo registrado)
+HASH_ALGORITHM = os.environ.get("HASH_ALGORITHM", "SHA3-256")
+
+# Modo do hash assinado de novos documentos: "flat" (hash único) ou "merkle"
+# (raiz da árvore de Merkle dos blocos, permite verificação parcial)
+DIGEST_MODE = os.environ.get("DIGEST_MODE", "flat")
+
+# Tamanho dos blocos da árvore de Merkle, em bytes
+MERKLE_CHUNK_SIZE = int(os.environ.get("MERKLE_CHUNK_SIZE", str(1024 * 1024)))
+
+# Chaves de assinatura: "document" (um par RSA novo por documento) ou
+# "user" (uma chave de longa duração por usuário, ver key_manager.py)
+KEY_MODE = os.environ.get("KEY_MODE", "document")
+
+# Validade, em dias, das chaves de assinatura de usuário
+USER_KEY_VALIDITY_DAYS = int(os.environ.get("USER_KEY_VALIDITY_DAYS", "365"))
+
+# Diagnóstico do banco: mede as consultas, registra as lentas com o plano de
+# execução e aponta varreduras completas (ver database.py)
+DB_DIAGNOSTICS = os.environ.get("DB_DIAGNOSTICS", "") not in ("", "0")
+
+# Limite, em milissegundos, para uma consulta ser registrada como lenta
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "50"))
+
+# Busca de documentos: indexa também o texto de documentos do tipo "text"
+# (além de título, remetente e destinatários), até o limite de bytes abaixo
+SEARCH_INDEX_CONTENT = os.environ.get("SEARCH_INDEX_CONTENT", "") not in ("", "0")
+SEARCH_CONTENT_MAX_BYTES = int(os.environ.get("SEARCH_CONTENT_MAX_BYTES", str(1024 * 1024)))
+
+# Fila de tarefas (ver jobs.py): segundos sem sinal de vida para uma tarefa em
+# execução ser considerada abandonada (worker encerrado) e voltar para a fila,
+# e intervalo entre consultas dos workers à fila
+JOB_STALE_SECONDS = float(os.environ.get("JOB_STALE_SECONDS", "60"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "2"))
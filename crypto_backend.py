@@ -0,0 +1,156 @@
+"""
+Backends criptográficos do sistema de assinatura.
+
+Um backend fornece geração de chaves RSA, as operações RSA-PSS com a chave
+privada (assinatura) e pública (verificação) e o hash SHA3-256.
+
+- "python": implementação própria em Python puro (padrão)
+- "openssl": usa as primitivas RSA da biblioteca cryptography (OpenSSL)
+
+Os dois backends usam o mesmo formato de chave (n, expoente) e produzem
+assinaturas RSA-PSS/SHA3-256 (MGF1-SHA3-256, salt de 32 bytes) aceitas
+um pelo outro. O backend é escolhido por CRYPTO_BACKEND (ver config.py).
+"""
+import base64
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+
+from config import CRYPTO_BACKEND
+
+class PurePythonBackend:
+    """Backend padrão, com RSA implementado em Python puro"""
+    name = "python"
+    accelerated = False
+
+    def generate_rsa_keys(self, bits=2048):
+        from crypto.keygen import generate_rsa_keys
+        return generate_rsa_keys(bits)
+
+    def sign_digest(self, m_hash, private_key, salt_len=32, hash_algorithm="SHA3-256"):
+        from crypto.signature import Signer
+        return Signer(private_key, salt_len, backend=self, hash_algorithm=hash_algorithm).sign_digest(m_hash)
+
+    def verify_digest(self, m_hash, b64_sig, public_key, hash_algorithm="SHA3-256"):
+        from crypto.verification import Verifier
+        return Verifier(public_key, backend=self).verify_digest(m_hash, b64_sig, hash_algorithm)
+
+    def sha3_256(self, data):
+        return hashlib.sha3_256(data).digest()
+
+class OpenSSLBackend:
+    """Backend acelerado, usando as primitivas RSA do pacote cryptography"""
+    name = "openssl"
+    accelerated = True
+
+    def __init__(self):
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding, rsa, utils
+
+        self._invalid_signature = InvalidSignature
+        self._rsa = rsa
+        self._padding = padding
+        # BLAKE2b-256 não é suportado pelo OpenSSL no RSA-PSS e fica com o backend em Python
+        self._hashes = {"SHA3-256": hashes.SHA3_256(), "SHA-256": hashes.SHA256()}
+        self._prehashed = {name: utils.Prehashed(h) for name, h in self._hashes.items()}
+        # Chaves privadas já carregadas no OpenSSL, indexadas por (n, d)
+        self._private_keys = OrderedDict()
+
+    def _remember_private_key(self, n, d, key):
+        self._private_keys[(n, d)] = key
+        self._private_keys.move_to_end((n, d))
+        if len(self._private_keys) > 128:
+            self._private_keys.popitem(last=False)
+
+    def _pss(self, salt_len, hash_algorithm):
+        return self._padding.PSS(mgf=self._padding.MGF1(self._hashes[hash_algorithm]), salt_length=salt_len)
+
+    def generate_rsa_keys(self, bits=2048):
+        private_key = self._rsa.generate_private_key(public_exponent=65537, key_size=bits)
+        numbers = private_key.private_numbers()
+        n = numbers.public_numbers.n
+        # Mantém a chave carregada: a assinatura logo após a geração não precisa reconstruí-la
+        self._remember_private_key(n, numbers.d, private_key)
+        return (n, numbers.public_numbers.e), (n, numbers.d)
+
+    def _load_private_key(self, n, d):
+        """
+        Reconstrói a chave do OpenSSL a partir de (n, d). O formato de chave do
+        sistema não guarda e, p e q; e = 65537 é o expoente usado na geração.
+        Retorna None se a chave não puder ser reconstruída.
+        """
+        key = self._private_keys.get((n, d))
+        if key is not None:
+            return key
+        e = 65537
+        if pow(pow(2, e, n), d, n) != 2:
+            return None
+        p, q = self._rsa.rsa_recover_prime_factors(n, e, d)
+        numbers = self._rsa.RSAPrivateNumbers(
+            p=p, q=q, d=d,
+            dmp1=self._rsa.rsa_crt_dmp1(d, p),
+            dmq1=self._rsa.rsa_crt_dmq1(d, q),
+            iqmp=self._rsa.rsa_crt_iqmp(p, q),
+            public_numbers=self._rsa.RSAPublicNumbers(e, n),
+        )
+        try:
+            # A consistência da chave já foi conferida acima
+            key = numbers.private_key(unsafe_skip_rsa_key_validation=True)
+        except TypeError:
+            # Versões do cryptography anteriores à 39
+            key = numbers.private_key()
+        self._remember_private_key(n, d, key)
+        return key
+
+    @lru_cache(maxsize=1024)
+    def _load_public_key(self, n, e):
+        return self._rsa.RSAPublicNumbers(e, n).public_key()
+
+    def sign_digest(self, m_hash, private_key, salt_len=32, hash_algorithm="SHA3-256"):
+        key = self._load_private_key(*private_key) if hash_algorithm in self._hashes else None
+        if key is None:
+            # Chave gerada com expoente público diferente de 65537, ou hash sem suporte no OpenSSL
+            return _PURE_PYTHON.sign_digest(m_hash, private_key, salt_len, hash_algorithm)
+        signature = key.sign(bytes(m_hash), self._pss(salt_len, hash_algorithm), self._prehashed[hash_algorithm])
+        return base64.b64encode(signature).decode()
+
+    def verify_digest(self, m_hash, b64_sig, public_key, hash_algorithm="SHA3-256"):
+        n, e = public_key
+        signature = base64.b64decode(b64_sig)
+        if hash_algorithm not in self._hashes or len(signature) != (n.bit_length() + 7) // 8:
+            # Hash sem suporte no OpenSSL, ou assinatura sem exatamente k bytes
+            return _PURE_PYTHON.verify_digest(m_hash, b64_sig, public_key, hash_algorithm)
+        try:
+            self._load_public_key(n, e).verify(signature, bytes(m_hash), self._pss(32, hash_algorithm),
+                                               self._prehashed[hash_algorithm])
+            return True
+        except self._invalid_signature:
+            # Assinaturas antigas sem os bits altos do EM zerados são rejeitadas pelo
+            # OpenSSL, mas continuam válidas para a verificação em Python puro; só
+            # elas são reverificadas, as demais já são inválidas
+            sig_int = int.from_bytes(signature, "big")
+            if sig_int >= n or not pow(sig_int, e, n) >> (n.bit_length() - 1):
+                return False
+            return _PURE_PYTHON.verify_digest(m_hash, b64_sig, public_key, hash_algorithm)
+
+    def sha3_256(self, data):
+        return hashlib.sha3_256(data).digest()
+
+_PURE_PYTHON = PurePythonBackend()
+
+BACKENDS = {
+    "python": PurePythonBackend,
+    "openssl": OpenSSLBackend,
+}
+
+_instances = {"python": _PURE_PYTHON}
+
+def get_backend(name=None):
+    """Retorna a instância do backend pedido (padrão: CRYPTO_BACKEND)"""
+    name = name or CRYPTO_BACKEND
+    if name not in _instances:
+        if name not in BACKENDS:
+            raise ValueError(f"Backend criptográfico desconhecido: {name}")
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
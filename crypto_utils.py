@@ -3,6 +3,7 @@ import base64
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import metrics
 
 # Calcula o máximo divisor comum (MDC) de a e b usando o algoritmo de Euclides
 def gcd(a, b):
@@ -63,6 +64,7 @@ def generate_prime(bits):
             return p
 
 # Novas funções para criptografia simétrica das chaves privadas
+@metrics.timed("crypto.pbkdf2")
 def derive_key_from_password(password, salt):
     """Deriva chave de criptografia a partir da senha do usuário"""
     kdf = PBKDF2HMAC(
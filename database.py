@@ -1,13 +1,312 @@
+import logging
+import re
 import sqlite3
+import threading
+import time
 from datetime import datetime
 
+import metrics
+from config import DB_DIAGNOSTICS, SLOW_QUERY_MS
+
 DATABASE_NAME = 'database.db'
 
+@metrics.timed("db.connect")
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE_NAME)
+    if _diagnostics["enabled"]:
+        conn = sqlite3.connect(DATABASE_NAME, factory=DiagnosticConnection)
+        conn.set_trace_callback(_trace_statement)
+    else:
+        conn = sqlite3.connect(DATABASE_NAME)
     conn.row_factory = sqlite3.Row  # Permite acessar colunas por nome
     return conn
 
+# ---------------------------------------------------------------------------
+# Diagnóstico de consultas (DB_DIAGNOSTICS=1 ou main.py --db-diagnostico)
+#
+# Com o diagnóstico ligado, as conexões usam um cursor que mede cada execução
+# (execute + fetch) e agrega contagem e latência por instrução. Instruções mais
+# lentas que SLOW_QUERY_MS vão para o log junto com o EXPLAIN QUERY PLAN, e o
+# plano de cada instrução distinta é analisado uma vez para marcar varreduras
+# completas (SCAN sem índice) nas tabelas grandes. O set_trace_callback conta
+# também as instruções que não passam pelo cursor (BEGIN/COMMIT implícitos).
+# ---------------------------------------------------------------------------
+
+# Tabelas em que uma varredura completa indica índice faltando
+WATCHED_TABLES = ("documents", "verification_logs", "email_verifications")
+
+diagnostics_logger = logging.getLogger("database.diagnostics")
+
+_diagnostics = {"enabled": DB_DIAGNOSTICS, "slow_ms": SLOW_QUERY_MS}
+_stats_lock = threading.Lock()
+_query_stats = {}
+_traced_counts = {}
+
+_WHITESPACE = re.compile(r"\s+")
+_TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(?:\w+\.)?(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SQL_KEYWORDS = {"on", "where", "join", "left", "inner", "cross", "natural", "set", "order", "group",
+                 "limit", "union", "values", "select", "having", "window", "except", "intersect", "default"}
+_PLAN_SCAN = re.compile(r"^SCAN (?:TABLE )?(?:\w+\.)?(\w+)(?: AS (\w+))?(.*)$")
+
+_LITERAL = re.compile(r"[xX]?'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\bNULL\b", re.IGNORECASE)
+
+def _normalize_sql(sql):
+    return _WHITESPACE.sub(" ", sql).strip()
+
+def _statement_shape(sql):
+    """
+    Forma da instrução sem literais. O trace callback recebe o SQL com os
+    parâmetros já substituídos; comparando as formas, as execuções vistas
+    pelo trace são associadas à instrução com placeholders do cursor.
+    """
+    return _LITERAL.sub("?", sql)
+
+def _table_aliases(sql):
+    """Mapeia apelidos (e nomes) usados na consulta para o nome real da tabela"""
+    aliases = {}
+    for table, alias in _TABLE_REFERENCE.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in _SQL_KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+def _full_scans(plan_rows, sql):
+    """Tabelas monitoradas que o plano percorre por inteiro, resolvendo apelidos"""
+    aliases = _table_aliases(sql)
+    scans = []
+    for detail in plan_rows:
+        match = _PLAN_SCAN.match(detail)
+        if not match or "USING" in match.group(3):
+            continue
+        name = (match.group(2) or match.group(1)).lower()
+        table = aliases.get(name, name)
+        if table in WATCHED_TABLES and table not in scans:
+            scans.append(table)
+    return scans
+
+class _QueryStats:
+    __slots__ = ("sql", "count", "total_s", "max_s", "slow_count", "plan", "full_scans")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.count = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.slow_count = 0
+        self.plan = None
+        self.full_scans = []
+
+def _explain(connection, sql, parameters):
+    """EXPLAIN QUERY PLAN da instrução, ou lista vazia se ela não puder ser explicada"""
+    try:
+        cursor = sqlite3.Cursor(connection)
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, parameters)
+        return [row[3] for row in cursor.fetchall()]
+    except sqlite3.Error:
+        return []
+
+class TimingCursor(sqlite3.Cursor):
+    """Cursor que mede execute/executemany e os fetch seguintes de cada instrução"""
+
+    def _begin(self, sql, parameters):
+        key = _normalize_sql(sql)
+        with _stats_lock:
+            stats = _query_stats.get(key)
+            if stats is None:
+                stats = _query_stats[key] = _QueryStats(key)
+            stats.count += 1
+        if stats.plan is None and not key.upper().startswith(("EXPLAIN", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK")):
+            # O plano de cada instrução distinta é analisado uma única vez
+            stats.plan = _explain(self.connection, sql, parameters)
+            stats.full_scans = _full_scans(stats.plan, key)
+            if stats.full_scans:
+                diagnostics_logger.warning("Varredura completa em %s: %s\n  plano: %s",
+                                           ", ".join(stats.full_scans), key, " | ".join(stats.plan))
+        self._stats = stats
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._logged = False
+
+    def _record(self, elapsed):
+        stats = getattr(self, "_stats", None)
+        if stats is None:
+            return
+        self._elapsed += elapsed
+        with _stats_lock:
+            stats.total_s += elapsed
+            stats.max_s = max(stats.max_s, self._elapsed)
+        if not self._logged and self._elapsed * 1000 >= _diagnostics["slow_ms"]:
+            self._logged = True
+            with _stats_lock:
+                stats.slow_count += 1
+            plan = stats.plan if stats.plan is not None else _explain(self.connection, self._sql, self._parameters)
+            diagnostics_logger.warning("Consulta lenta (%.1f ms): %s\n  parâmetros: %r\n  plano: %s",
+                                       self._elapsed * 1000, stats.sql, self._parameters, " | ".join(plan))
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        # O plano é obtido com o primeiro conjunto de parâmetros
+        self._begin(sql, seq_of_parameters[0] if seq_of_parameters else ())
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(self.arraysize if size is None else size)
+        finally:
+            self._record(time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._record(time.perf_counter() - start)
+
+class DiagnosticConnection(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de conn.execute) são TimingCursor"""
+
+    def cursor(self, factory=TimingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def _trace_statement(statement):
+    key = _statement_shape(_normalize_sql(statement))
+    with _stats_lock:
+        _traced_counts[key] = _traced_counts.get(key, 0) + 1
+
+def enable_diagnostics(slow_ms=None, log_path=None):
+    """
+    Liga o diagnóstico para as conexões abertas a partir de agora.
+
+    Args:
+        slow_ms: Limite, em milissegundos, para registrar uma consulta como lenta
+        log_path: Arquivo do log de consultas lentas e varreduras (padrão: stderr)
+    """
+    _diagnostics["enabled"] = True
+    if slow_ms is not None:
+        _diagnostics["slow_ms"] = slow_ms
+    if log_path:
+        handler = logging.FileHandler(log_path, encoding="utf-8")
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    diagnostics_logger.addHandler(handler)
+    diagnostics_logger.setLevel(logging.INFO)
+
+def disable_diagnostics():
+    _diagnostics["enabled"] = False
+
+def reset_query_stats():
+    with _stats_lock:
+        _query_stats.clear()
+        _traced_counts.clear()
+
+def get_query_stats():
+    """
+    Estatísticas agregadas por instrução, da mais custosa para a menos custosa.
+
+    Returns:
+        list: Dicionários com sql, count, total_ms, mean_ms, max_ms, slow_count,
+              full_scans, plan e traced (execuções vistas pelo trace callback)
+    """
+    with _stats_lock:
+        stats = list(_query_stats.values())
+        traced = dict(_traced_counts)
+    shapes = {item.sql: _statement_shape(item.sql) for item in stats}
+    result = [{
+        "sql": item.sql,
+        "count": item.count,
+        "total_ms": item.total_s * 1000,
+        "mean_ms": item.total_s * 1000 / item.count if item.count else 0.0,
+        "max_ms": item.max_s * 1000,
+        "slow_count": item.slow_count,
+        "full_scans": list(item.full_scans),
+        "plan": list(item.plan or []),
+        "traced": traced.get(shapes[item.sql], 0),
+    } for item in stats]
+    # Instruções que só o trace viu (BEGIN/COMMIT implícitos, comandos internos)
+    known_shapes = set(shapes.values())
+    for sql, count in traced.items():
+        if sql not in known_shapes:
+            result.append({"sql": sql, "count": 0, "total_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0,
+                           "slow_count": 0, "full_scans": [], "plan": [], "traced": count})
+    result.sort(key=lambda item: item["total_ms"], reverse=True)
+    return result
+
+def format_query_report(limit=20):
+    """Relatório em texto das instruções mais custosas e das varreduras completas"""
+    stats = get_query_stats()
+    lines = [f"{'execuções':>9} {'trace':>6} {'total ms':>10} {'média ms':>9} {'máx ms':>9} {'lentas':>6}  instrução"]
+    for item in stats[:limit]:
+        lines.append(f"{item['count']:>9} {item['traced']:>6} {item['total_ms']:>10.2f} {item['mean_ms']:>9.3f} "
+                     f"{item['max_ms']:>9.2f} {item['slow_count']:>6}  {item['sql'][:100]}")
+    scans = [item for item in stats if item["full_scans"]]
+    if scans:
+        lines.append("")
+        lines.append("Varreduras completas em tabelas monitoradas:")
+        for item in scans:
+            lines.append(f"  [{', '.join(item['full_scans'])}] {item['sql'][:120]}")
+            lines.append(f"      plano: {' | '.join(item['plan'])}")
+    return "\n".join(lines)
+
+# Adiciona colunas novas em bancos criados por versões anteriores do sistema
+def add_missing_columns(cursor, table, columns, schema="main"):
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, definition in columns:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {name} {definition}")
+
+# Nomes e emails dos destinatários de um documento (direto e entregas), pelo search_rowid do documento
+_FTS_RECEIVERS = """(
+    SELECT group_concat(u.nome || ' ' || u.email, ' ') FROM users u WHERE u.user_id IN (
+        SELECT d.receiver_id FROM documents d WHERE d.search_rowid = {search_rowid}
+        UNION
+        SELECT dd.receiver_id FROM document_deliveries dd
+        JOIN documents d ON d.document_id = dd.document_id WHERE d.search_rowid = {search_rowid}))"""
+
+# Triggers que mantêm documents_fts; recriados quando o índice é migrado
+_FTS_TRIGGERS = ("documents_fts_insert", "documents_fts_update", "documents_fts_delete",
+                 "document_deliveries_fts_insert", "users_fts_update")
+
+def rebuild_search_index(cursor):
+    """
+    Reconstrói documents_fts a partir de documents.
+    O conteúdo indexado (SEARCH_INDEX_CONTENT) só é preenchido na assinatura.
+    """
+    cursor.execute("DELETE FROM documents_fts")
+    cursor.execute(f"""
+        INSERT INTO documents_fts (rowid, document_name, sender, receivers, content)
+        SELECT doc.search_rowid, doc.document_name, s.nome || ' ' || s.email,
+               {_FTS_RECEIVERS.format(search_rowid="doc.search_rowid")}, ''
+        FROM documents doc JOIN users s ON s.user_id = doc.sender_id
+    """)
+
 def create_tables():
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -24,6 +323,10 @@ def create_tables():
             last_login TIMESTAMP
         );
     ''')
+    # Busca de destinatários por prefixo (auth.search_users): LIKE 'abc%' sem
+    # distinção de maiúsculas usa índices NOCASE como busca por intervalo
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_nome_nocase ON users(nome COLLATE NOCASE)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users(email COLLATE NOCASE)")
 
     # Tabela de verificações de email
     cursor.execute('''
@@ -38,6 +341,23 @@ def create_tables():
         );
     ''')
 
+    # Chaves de assinatura de longa duração por usuário (KEY_MODE = 'user', ver key_manager.py).
+    # Apenas uma chave fica 'active'; as rotacionadas ficam 'retired' e continuam verificando
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_keys (
+            key_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            public_key TEXT NOT NULL,
+            private_key_encrypted TEXT NOT NULL,
+            status VARCHAR(10) DEFAULT 'active',
+            valid_from TIMESTAMP NOT NULL,
+            valid_until TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+        );
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_keys_user_status ON user_keys(user_id, status)")
+
     # Tabela de documentos
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS documents (
@@ -53,11 +373,40 @@ def create_tables():
             status VARCHAR(20) DEFAULT 'sent',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             verified_at TIMESTAMP,
+            content_codec VARCHAR(10) DEFAULT 'none',
+            content_type VARCHAR(10),
+            hash_algorithm VARCHAR(20) DEFAULT 'SHA3-256',
+            digest_mode VARCHAR(10) DEFAULT 'flat',
+            chunk_size INTEGER,
+            storage_mode VARCHAR(10) DEFAULT 'embedded',
+            file_path TEXT,
+            file_size INTEGER,
+            file_mtime REAL,
+            delivery_mode VARCHAR(10) DEFAULT 'direct',
+            key_id INTEGER,
+            search_rowid INTEGER,
             FOREIGN KEY (sender_id) REFERENCES users(user_id) ON DELETE CASCADE,
             FOREIGN KEY (receiver_id) REFERENCES users(user_id) ON DELETE CASCADE
         );
     ''')
 
+    cursor.execute("PRAGMA table_info(documents)")
+    search_rowid_missing = "search_rowid" not in {row[1] for row in cursor.fetchall()}
+    add_missing_columns(cursor, "documents", [
+        ("content_codec", "VARCHAR(10) DEFAULT 'none'"),
+        ("content_type", "VARCHAR(10)"),
+        ("hash_algorithm", "VARCHAR(20) DEFAULT 'SHA3-256'"),
+        ("digest_mode", "VARCHAR(10) DEFAULT 'flat'"),
+        ("chunk_size", "INTEGER"),
+        ("storage_mode", "VARCHAR(10) DEFAULT 'embedded'"),
+        ("file_path", "TEXT"),
+        ("file_size", "INTEGER"),
+        ("file_mtime", "REAL"),
+        ("delivery_mode", "VARCHAR(10) DEFAULT 'direct'"),
+        ("key_id", "INTEGER"),
+        ("search_rowid", "INTEGER"),
+    ])
+
     # Tabela de logs de verificação
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS verification_logs (
@@ -72,9 +421,186 @@ def create_tables():
         );
     ''')
 
+    # Folhas da árvore de Merkle de documentos com digest_mode = 'merkle',
+    # usadas para montar provas de inclusão de intervalos de blocos
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS document_chunks (
+            document_id VARCHAR(36) NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            leaf_hash BLOB NOT NULL,
+            PRIMARY KEY (document_id, chunk_index),
+            FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+    ''')
+
+    # Entregas de documentos enviados para vários destinatários (delivery_mode = 'fanout'):
+    # o documento assinado é gravado uma vez e cada destinatário tem seu próprio status
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS document_deliveries (
+            delivery_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            document_id VARCHAR(36) NOT NULL,
+            receiver_id INTEGER NOT NULL,
+            status VARCHAR(20) DEFAULT 'sent',
+            verified_at TIMESTAMP,
+            UNIQUE (document_id, receiver_id),
+            FOREIGN KEY (document_id) REFERENCES documents(document_id) ON DELETE CASCADE,
+            FOREIGN KEY (receiver_id) REFERENCES users(user_id) ON DELETE CASCADE
+        );
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_document_deliveries_receiver ON document_deliveries(receiver_id)")
+
+    # Índice de documentos arquivados (ver archive.py): document_id -> partição mensal
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archived_documents (
+            document_id VARCHAR(36) PRIMARY KEY,
+            partition VARCHAR(7) NOT NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+
+    # Execuções do arquivamento, usadas para retomar uma execução interrompida
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archive_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cutoff TIMESTAMP NOT NULL,
+            status VARCHAR(20) DEFAULT 'running',
+            moved_count INTEGER DEFAULT 0,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+    ''')
+
+    # Índice da pasta monitorada (ver watch_folder.py): tamanho, data de modificação e
+    # hash de cada arquivo já processado, para assinar só os novos ou alterados
+    # mesmo depois de reiniciar o serviço. status: 'signing', 'signed' ou 'error'
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS watched_files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            digest VARCHAR(64),
+            status VARCHAR(10) NOT NULL,
+            document_id VARCHAR(36),
+            error_message TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    ''')
+
+    # Fila de tarefas longas (ver jobs.py). status: 'pending', 'running', 'done',
+    # 'failed' ou 'cancelled'; heartbeat_at é atualizado pelo worker enquanto a
+    # tarefa roda, para que tarefas de um worker encerrado voltem para a fila
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind VARCHAR(30) NOT NULL,
+            params TEXT NOT NULL,
+            status VARCHAR(10) DEFAULT 'pending',
+            progress_done INTEGER DEFAULT 0,
+            progress_total INTEGER,
+            cancel_requested BOOLEAN DEFAULT FALSE,
+            attempts INTEGER DEFAULT 0,
+            worker VARCHAR(64),
+            heartbeat_at TIMESTAMP,
+            result TEXT,
+            error_message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        );
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, job_id)")
+
+    # Último ponto de retomada de cada tarefa (estado em JSON, definido pelo tipo da tarefa)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_checkpoints (
+            job_id INTEGER PRIMARY KEY,
+            state TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (job_id) REFERENCES jobs(job_id) ON DELETE CASCADE
+        );
+    ''')
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_status_verified ON documents(status, verified_at)")
+    # Busca por conteúdo (document_manager.find_documents_by_content) e histórico de verificações
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents(document_hash)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_verification_logs_document ON verification_logs(document_id)")
+
+    # Busca textual (document_manager.search_documents): título, remetente e
+    # destinatários, e o texto dos documentos se SEARCH_INDEX_CONTENT estiver ativo.
+    # O rowid de documents_fts é a coluna search_rowid do documento, atribuída pelo
+    # trigger de inserção (o rowid implícito de documents, de chave TEXT, pode ser
+    # renumerado pelo VACUUM); os triggers mantêm o índice atualizado, inclusive
+    # quando o arquivamento remove documentos do banco principal
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'documents_fts'")
+    fts_exists = cursor.fetchone() is not None
+    if search_rowid_missing:
+        # Bancos anteriores ligavam o índice ao rowid: triggers e índice são refeitos
+        cursor.execute("UPDATE documents SET search_rowid = rowid")
+        for trigger in _FTS_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        fts_exists = False
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_search_rowid ON documents(search_rowid)")
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+            document_name, sender, receivers, content,
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+    ''')
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+            UPDATE documents SET search_rowid = (SELECT IFNULL(MAX(search_rowid), 0) + 1 FROM documents)
+            WHERE document_id = NEW.document_id;
+            INSERT INTO documents_fts (rowid, document_name, sender, receivers, content)
+            VALUES ((SELECT search_rowid FROM documents WHERE document_id = NEW.document_id), NEW.document_name,
+                    (SELECT nome || ' ' || email FROM users WHERE user_id = NEW.sender_id),
+                    (SELECT nome || ' ' || email FROM users WHERE user_id = NEW.receiver_id), '');
+        END;
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS documents_fts_update AFTER UPDATE OF document_name, sender_id, receiver_id
+        ON documents BEGIN
+            UPDATE documents_fts SET document_name = NEW.document_name,
+                sender = (SELECT nome || ' ' || email FROM users WHERE user_id = NEW.sender_id),
+                receivers = {_FTS_RECEIVERS.format(search_rowid="NEW.search_rowid")}
+            WHERE rowid = NEW.search_rowid;
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+            DELETE FROM documents_fts WHERE rowid = OLD.search_rowid;
+        END;
+    """)
+    # Envio para vários destinatários: o primeiro já foi indexado junto com o documento
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS document_deliveries_fts_insert AFTER INSERT ON document_deliveries
+        WHEN NEW.receiver_id != (SELECT receiver_id FROM documents WHERE document_id = NEW.document_id) BEGIN
+            UPDATE documents_fts
+            SET receivers = receivers || ' ' || (SELECT nome || ' ' || email FROM users WHERE user_id = NEW.receiver_id)
+            WHERE rowid = (SELECT search_rowid FROM documents WHERE document_id = NEW.document_id);
+        END;
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF nome, email ON users BEGIN
+            UPDATE documents_fts SET sender = NEW.nome || ' ' || NEW.email
+            WHERE rowid IN (SELECT search_rowid FROM documents WHERE sender_id = NEW.user_id);
+            UPDATE documents_fts SET receivers = {_FTS_RECEIVERS.format(search_rowid="documents_fts.rowid")}
+            WHERE rowid IN (
+                SELECT search_rowid FROM documents WHERE receiver_id = NEW.user_id
+                UNION
+                SELECT d.search_rowid FROM documents d JOIN document_deliveries dd ON dd.document_id = d.document_id
+                WHERE dd.receiver_id = NEW.user_id);
+        END;
+    """)
+    if not fts_exists:
+        rebuild_search_index(cursor)
+
     conn.commit()
     conn.close()
 
+    # Partições de arquivo criadas por versões anteriores recebem as tabelas/colunas novas
+    from archive import upgrade_partitions
+    upgrade_partitions()
+
 if __name__ == '__main__':
     create_tables()
     print(f"Banco de dados '{DATABASE_NAME}' e tabelas criadas com sucesso.")
@@ -1,15 +1,37 @@
 import os
 import base64
+import codecs
 import uuid
 from datetime import datetime
 from database import get_db_connection
 from crypto.keygen import generate_document_keys, deserialize_key
-from crypto.signature import sign_document_content, sha3_256_hash
-from crypto.verification import verify_signed_document
+from crypto.signature import sign_document_content, sign_detached_file, sha3_256_hash, HASH_ALGORITHMS, get_hash_function
+from crypto.verification import verify_signed_document, verify_detached_file, verify_digest
 from crypto.crypto_utils import decrypt_private_key
 from file_selector import get_file_path
+from compression import compress_payload, decompress_payload, stored_content_to_b64
+from config import (DOCUMENT_COMPRESSION, HASH_ALGORITHM, DIGEST_MODE, MERKLE_CHUNK_SIZE, KEY_MODE,
+                    SEARCH_INDEX_CONTENT, SEARCH_CONTENT_MAX_BYTES)
+from key_manager import get_signing_key, get_user_public_key
+from archive import archived_document_schema
+from crypto.merkle import leaf_hashes_from_file, range_proofs, verify_chunks, leaf_hash, merkle_root
+from records import row_factory, SentDocument, ReceivedDocument, DocumentSearchResult, VerificationEntry
+import metrics
 
-def sign_and_send_document(sender_id, sender_email, receiver_id, receiver_email, document_name, user_password, use_gui=True):
+def _detect_content_type(path, block_size=1024 * 1024):
+    """Detecta se o arquivo é texto UTF-8 lendo-o em blocos, sem carregá-lo inteiro"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                decoder.decode(block)
+        decoder.decode(b"", final=True)
+        return "text"
+    except UnicodeDecodeError:
+        return "binary"
+
+def sign_and_send_document(sender_id, sender_email, receiver_id, receiver_email, document_name, user_password, use_gui=True,
+                           detached=False):
     """
     Assina e envia um documento com seleção de arquivo via interface gráfica ou terminal.
     
@@ -21,60 +43,165 @@ def sign_and_send_document(sender_id, sender_email, receiver_id, receiver_email,
         document_name: Nome/título do documento
         user_password: Senha do usuário para criptografar chave privada
         use_gui: Se deve usar interface gráfica para seleção de arquivo
+        detached: Assinatura destacada: o arquivo fica no disco e o banco guarda apenas
+                  hash, assinatura, chave pública e os metadados do arquivo (caminho,
+                  tamanho e data de modificação). A verificação relê o arquivo do disco.
     
     Returns:
         tuple: (sucesso, mensagem)
     """
+    success, message, _ = _sign_and_send(sender_id, sender_email, [(receiver_id, receiver_email)],
+                                         document_name, user_password, use_gui, detached)
+    return success, message
+
+def sign_and_send_to_many(sender_id, sender_email, receivers, document_name, user_password, use_gui=True,
+                          detached=False):
+    """
+    Assina um documento uma única vez e o envia para vários destinatários.
+
+    O conteúdo, o par de chaves e a assinatura são gravados uma vez em documents;
+    cada destinatário recebe apenas uma linha em document_deliveries, com seu
+    próprio status de verificação.
+
+    Args:
+        receivers: Lista de tuplas (user_id, email) dos destinatários
+        (demais argumentos como em sign_and_send_document)
+
+    Returns:
+        tuple: (sucesso, mensagem)
+    """
+    # Remove destinatários repetidos, mantendo a ordem
+    receivers = list(dict((user_id, email) for user_id, email in receivers).items())
+    if not receivers:
+        return False, "Nenhum destinatário selecionado."
+    success, message, _ = _sign_and_send(sender_id, sender_email, receivers, document_name, user_password, use_gui, detached)
+    return success, message
+
+def sign_and_send_file(sender_id, sender_email, receivers, document_path, user_password, document_name=None,
+                       detached=False):
+    """
+    Assina e envia um arquivo já conhecido, sem seleção interativa (ex.: watch_folder.py).
+
+    Args:
+        receivers: Lista de tuplas (user_id, email) dos destinatários; com mais de um,
+                   o documento é assinado uma vez e entregue como em sign_and_send_to_many
+        document_path: Caminho do arquivo a assinar
+        document_name: Título do documento (padrão: o nome do arquivo)
+
+    Returns:
+        tuple: (sucesso, mensagem, document_id ou None)
+    """
+    receivers = list(dict((user_id, email) for user_id, email in receivers).items())
+    if not receivers:
+        return False, "Nenhum destinatário selecionado.", None
+    return _sign_and_send(sender_id, sender_email, receivers, document_name or os.path.basename(document_path),
+                          user_password, False, detached, document_path)
+
+@metrics.timed("sign.total")
+def _sign_and_send(sender_id, sender_email, receivers, document_name, user_password, use_gui, detached,
+                   document_path=None):
+    """
+    Assina o arquivo selecionado (ou o informado em document_path) uma vez e
+    registra a entrega para os destinatários.
+
+    Returns:
+        tuple: (sucesso, mensagem, document_id ou None)
+    """
+    # Com mais de um destinatário, as entregas ficam em document_deliveries
+    delivery_mode = "fanout" if len(receivers) > 1 else "direct"
+    receiver_id = receivers[0][0]
+    receiver_email = ", ".join(email for _, email in receivers)
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
     try:
-        # Seleção do arquivo
-        print(f"\n=== SELECIONANDO ARQUIVO PARA ASSINAR ===")
-        print(f"Título do documento: {document_name}")
-        
-        document_path = get_file_path(use_gui=use_gui)
-        
-        if not document_path:
-            return False, "Seleção de arquivo cancelada."
-        
-        print(f"Arquivo selecionado: {document_path}")
+        # Seleção do arquivo (a não ser que o caminho já tenha sido informado)
+        if document_path is None:
+            print(f"\n=== SELECIONANDO ARQUIVO PARA ASSINAR ===")
+            print(f"Título do documento: {document_name}")
+
+            document_path = get_file_path(use_gui=use_gui)
+
+            if not document_path:
+                return False, "Seleção de arquivo cancelada.", None
+
+            print(f"Arquivo selecionado: {document_path}")
         
         if not os.path.exists(document_path):
-            return False, "Arquivo não encontrado."
+            return False, "Arquivo não encontrado.", None
 
-        # Lê o conteúdo do arquivo
-        with open(document_path, "rb") as f:
-            document_content_bytes = f.read()
-        
         # Verifica se o arquivo não está vazio
-        if len(document_content_bytes) == 0:
-            return False, "O arquivo selecionado está vazio."
+        file_size = os.path.getsize(document_path)
+        if file_size == 0:
+            return False, "O arquivo selecionado está vazio.", None
         
-        # Tenta decodificar como texto (para assinatura)
-        try:
-            document_content_text = document_content_bytes.decode("utf-8")
-        except UnicodeDecodeError:
-            # Se não for texto UTF-8, usa o conteúdo em base64
-            document_content_text = base64.b64encode(document_content_bytes).decode("utf-8")
-        
-        document_content_b64 = base64.b64encode(document_content_bytes).decode()
+        # Registra o tipo do conteúdo na assinatura, em vez de adivinhá-lo na verificação
+        if detached:
+            # No modo destacado o arquivo nunca é carregado inteiro na memória
+            document_content_bytes = None
+            content_type = _detect_content_type(document_path)
+        else:
+            with metrics.span("sign.read_file"), open(document_path, "rb") as f:
+                document_content_bytes = f.read()
+            try:
+                document_content_bytes.decode("utf-8")
+                content_type = "text"
+            except UnicodeDecodeError:
+                content_type = "binary"
 
-        print("Gerando chaves criptográficas...")
-        
-        # Gera chaves específicas para este documento
-        public_key_pem, private_key_encrypted, document_id, public_key_tuple, private_key_tuple = \
-            generate_document_keys(user_password)
+        if KEY_MODE == "user":
+            print("Carregando chave de assinatura do usuário...")
+            
+            # Chave de longa duração do remetente: o documento guarda apenas o key_id
+            key_id, private_key_tuple = get_signing_key(sender_id, user_password)
+            document_id = str(uuid.uuid4())
+            public_key_pem, private_key_encrypted = "", ""
+        else:
+            print("Gerando chaves criptográficas...")
+            
+            # Gera chaves específicas para este documento
+            public_key_pem, private_key_encrypted, document_id, public_key_tuple, private_key_tuple = \
+                generate_document_keys(user_password)
+            key_id = None
         
         print("Assinando documento...")
         
-        # Assina o documento
-        signature_package = sign_document_content(
-            document_content_text,  # Conteúdo como string para assinatura
-            private_key_tuple, 
-            sender_email, 
-            receiver_email
-        )
+        # No modo Merkle, as folhas são calculadas em paralelo direto do arquivo
+        leaves = None
+        if DIGEST_MODE == "merkle":
+            leaves = leaf_hashes_from_file(document_path, MERKLE_CHUNK_SIZE, HASH_ALGORITHM)
+        
+        if detached:
+            # Assina o arquivo lendo-o em blocos; nenhum conteúdo é gravado no banco
+            signature_package = sign_detached_file(
+                document_path,
+                private_key_tuple,
+                sender_email,
+                receiver_email,
+                content_type,
+                HASH_ALGORITHM,
+                DIGEST_MODE,
+                MERKLE_CHUNK_SIZE,
+                leaves
+            )
+            stored_content, content_codec = "", "none"
+        else:
+            # Assina os bytes originais do arquivo
+            signature_package = sign_document_content(
+                document_content_bytes,
+                private_key_tuple, 
+                sender_email, 
+                receiver_email,
+                content_type,
+                HASH_ALGORITHM,
+                DIGEST_MODE,
+                MERKLE_CHUNK_SIZE,
+                leaves
+            )
+            
+            # Comprime o conteúdo assinado (hash e assinatura cobrem os bytes originais)
+            stored_content, content_codec = compress_payload(document_content_bytes, DOCUMENT_COMPRESSION)
         
         print("Salvando no banco de dados...")
         
@@ -83,26 +210,61 @@ def sign_and_send_document(sender_id, sender_email, receiver_id, receiver_email,
             INSERT INTO documents (
                 document_id, sender_id, receiver_id, document_name,
                 document_content, document_hash, public_key,
-                private_key_encrypted, signature, status, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                private_key_encrypted, signature, status, created_at,
+                content_codec, content_type, hash_algorithm,
+                digest_mode, chunk_size, storage_mode,
+                file_path, file_size, file_mtime, delivery_mode, key_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             document_id,
             sender_id,
             receiver_id,
             document_name,
-            signature_package["document_content"],  # Já está em base64
+            stored_content,                         # Base64, comprimido ou não
             signature_package["document_hash"],     # Já está em base64
             public_key_pem,
             private_key_encrypted,
             signature_package["signature"],
             "sent",
-            datetime.now()
+            datetime.now(),
+            content_codec,
+            content_type,
+            signature_package["hash_algorithm"],
+            signature_package["digest_mode"],
+            signature_package.get("chunk_size"),
+            "detached" if detached else "embedded",
+            signature_package.get("file_path"),
+            signature_package.get("file_size"),
+            signature_package.get("file_mtime"),
+            delivery_mode,
+            key_id
         ))
         
-        conn.commit()
+        # Uma entrega leve por destinatário, referenciando o documento assinado
+        if delivery_mode == "fanout":
+            cursor.executemany(
+                "INSERT INTO document_deliveries (document_id, receiver_id) VALUES (?, ?)",
+                [(document_id, user_id) for user_id, _ in receivers]
+            )
+        
+        # O trigger de documents já indexou título e participantes; o texto é opcional
+        if SEARCH_INDEX_CONTENT and content_type == "text" and not detached:
+            cursor.execute(
+                "UPDATE documents_fts SET content = ? WHERE rowid = (SELECT search_rowid FROM documents WHERE document_id = ?)",
+                (document_content_bytes[:SEARCH_CONTENT_MAX_BYTES].decode("utf-8", errors="ignore"), document_id)
+            )
+        
+        # Guarda as folhas da árvore para provas de inclusão de intervalos de blocos
+        if leaves is not None:
+            cursor.executemany(
+                "INSERT INTO document_chunks (document_id, chunk_index, leaf_hash) VALUES (?, ?, ?)",
+                [(document_id, index, leaf) for index, leaf in enumerate(leaves)]
+            )
+        
+        with metrics.span("db.commit"):
+            conn.commit()
         
         # Informações do documento criado
-        file_size = len(document_content_bytes)
         file_size_str = f"{file_size} bytes"
         if file_size > 1024:
             file_size_str = f"{file_size/1024:.1f} KB"
@@ -115,105 +277,318 @@ Detalhes:
 - ID do documento: {document_id}
 - Arquivo: {os.path.basename(document_path)}
 - Tamanho: {file_size_str}
-- Destinatário: {receiver_email}
-- Algoritmo: RSA-PSS com SHA3-256"""
+- Destinatário(s): {receiver_email}
+- Algoritmo: RSA-PSS com {signature_package["hash_algorithm"]}"""
+        if detached:
+            success_msg += "\n- Assinatura destacada: o arquivo deve permanecer no caminho original para a verificação"
         
-        return True, success_msg
+        return True, success_msg, document_id
         
     except ValueError as e:
         conn.rollback()
-        return False, f"Erro de segurança: {e}. Verifique sua senha."
+        return False, f"Erro de segurança: {e}. Verifique sua senha.", None
     except Exception as e:
         conn.rollback()
-        return False, f"Erro ao assinar e enviar documento: {e}"
+        return False, f"Erro ao assinar e enviar documento: {e}", None
     finally:
         conn.close()
 
 def get_sent_documents(user_id):
     """
     Obtém lista de documentos enviados pelo usuário.
+    Documentos enviados para vários destinatários aparecem uma vez por destinatário,
+    com o status da respectiva entrega.
     """
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(SentDocument)
     try:
         cursor.execute("""
             SELECT d.document_id, d.document_name, u.nome as receiver_name,
-                   u.email as receiver_email, d.status, d.created_at, d.verified_at
+                   u.email as receiver_email,
+                   COALESCE(dd.status, d.status) as status, d.created_at,
+                   CASE WHEN dd.delivery_id IS NULL THEN d.verified_at ELSE dd.verified_at END as verified_at
             FROM documents d
-            JOIN users u ON d.receiver_id = u.user_id
+            LEFT JOIN document_deliveries dd ON dd.document_id = d.document_id
+            JOIN users u ON COALESCE(dd.receiver_id, d.receiver_id) = u.user_id
             WHERE d.sender_id = ?
             ORDER BY d.created_at DESC
         """, (user_id,))
-        documents = []
-        for row in cursor.fetchall():
-            documents.append({
-                "document_id": row["document_id"],
-                "document_name": row["document_name"],
-                "receiver_name": row["receiver_name"],
-                "receiver_email": row["receiver_email"],
-                "status": row["status"],
-                "created_at": row["created_at"],
-                "verified_at": row["verified_at"]
-            })
-        return documents
+        return cursor.fetchall()
     finally:
         conn.close()
 
 def get_received_documents(user_id):
     """
-    Obtém lista de documentos recebidos pelo usuário.
+    Obtém lista de documentos recebidos pelo usuário, incluindo as entregas de
+    documentos enviados para vários destinatários (com o status da entrega).
     """
     conn = get_db_connection()
     cursor = conn.cursor()
+    cursor.row_factory = row_factory(ReceivedDocument)
     try:
         cursor.execute("""
             SELECT d.document_id, d.document_name, u.nome as sender_name,
-                   u.email as sender_email, d.status, d.created_at, d.verified_at
+                   u.email as sender_email, d.status, d.created_at as created_at, d.verified_at
             FROM documents d
             JOIN users u ON d.sender_id = u.user_id
-            WHERE d.receiver_id = ?
-            ORDER BY d.created_at DESC
-        """, (user_id,))
-        documents = []
-        for row in cursor.fetchall():
-            documents.append({
-                "document_id": row["document_id"],
-                "document_name": row["document_name"],
-                "sender_name": row["sender_name"],
-                "sender_email": row["sender_email"],
-                "status": row["status"],
-                "created_at": row["created_at"],
-                "verified_at": row["verified_at"]
-            })
-        return documents
+            WHERE d.receiver_id = ? AND d.delivery_mode = 'direct'
+            UNION ALL
+            SELECT d.document_id, d.document_name, u.nome as sender_name,
+                   u.email as sender_email, dd.status, d.created_at, dd.verified_at
+            FROM document_deliveries dd
+            JOIN documents d ON dd.document_id = d.document_id
+            JOIN users u ON d.sender_id = u.user_id
+            WHERE dd.receiver_id = ?
+            ORDER BY created_at DESC
+        """, (user_id, user_id))
+        return cursor.fetchall()
     finally:
         conn.close()
 
-def get_document_details(document_id, user_id):
+def _fts_query(text):
+    """Cada palavra digitada vira um prefixo entre aspas; todas precisam aparecer"""
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"*' for term in terms if term.strip('"'))
+
+def search_documents(user_id, query, limit=20, cursor=None):
     """
-    Obtém detalhes completos de um documento.
+    Busca, entre os documentos enviados ou recebidos pelo usuário, os que
+    contêm as palavras (ou prefixos) no título, no nome ou email do remetente
+    ou dos destinatários e, com SEARCH_INDEX_CONTENT, no texto do documento.
+    Os resultados vêm do mais recente para o mais antigo; para a próxima página,
+    passe o cursor devolvido pela chamada anterior.
+
+    Returns:
+        tuple: (lista de DocumentSearchResult, cursor da próxima página ou None)
     """
+    match = _fts_query(query)
+    if not match:
+        return [], None
+    params = [user_id, match, user_id, user_id]
+    after_cursor = ""
+    if cursor:
+        after_cursor = "AND (d.created_at, d.document_id) < (?, ?)"
+        params.extend(cursor)
+
     conn = get_db_connection()
-    cursor = conn.cursor()
+    db_cursor = conn.cursor()
+    db_cursor.row_factory = row_factory(DocumentSearchResult)
     try:
-        cursor.execute("""
-            SELECT d.document_id, d.document_name, d.document_content, d.document_hash,
-                   d.public_key, d.private_key_encrypted, d.signature, d.status,
-                   d.created_at, d.verified_at,
+        # Para um destinatário de envio múltiplo, destinatário, status e data de
+        # verificação vêm da entrega dele (documents.receiver_id é só o primeiro destinatário)
+        rows = db_cursor.execute(f"""
+            SELECT d.document_id, d.document_name, s.nome as sender_name, s.email as sender_email,
+                   r.nome as receiver_name, r.email as receiver_email,
+                   COALESCE(dd.status, d.status) as status, d.created_at,
+                   CASE WHEN dd.delivery_id IS NULL THEN d.verified_at ELSE dd.verified_at END as verified_at
+            FROM documents_fts f
+            JOIN documents d ON d.search_rowid = f.rowid
+            LEFT JOIN document_deliveries dd ON dd.document_id = d.document_id AND dd.receiver_id = ?
+            JOIN users s ON d.sender_id = s.user_id
+            JOIN users r ON COALESCE(dd.receiver_id, d.receiver_id) = r.user_id
+            WHERE documents_fts MATCH ?
+              AND (d.sender_id = ? OR d.receiver_id = ? OR dd.delivery_id IS NOT NULL)
+              {after_cursor}
+            ORDER BY d.created_at DESC, d.document_id DESC
+            LIMIT ?
+        """, (*params, limit + 1)).fetchall()
+    finally:
+        conn.close()
+
+    documents = rows[:limit]
+    next_cursor = (documents[-1].created_at, documents[-1].document_id) if len(rows) > limit else None
+    return documents, next_cursor
+
+def _content_digests(path, chunk_size=MERKLE_CHUNK_SIZE):
+    """
+    document_hash que o arquivo teria se assinado por sign_and_send_document, em
+    uma única leitura: hash plano dos bytes originais com cada algoritmo aceito e
+    raiz de Merkle com blocos de chunk_size bytes (os blocos lidos são as folhas).
+
+    Returns:
+        dict: document_hash (base64) -> (hash_algorithm, digest_mode, chunk_size)
+    """
+    flat = {name: get_hash_function(name)() for name in HASH_ALGORITHMS}
+    leaves = {name: [] for name in HASH_ALGORITHMS}
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            for name in HASH_ALGORITHMS:
+                flat[name].update(block)
+                leaves[name].append(leaf_hash(block, name))
+
+    digests = {}
+    for name in HASH_ALGORITHMS:
+        digests[base64.b64encode(flat[name].digest()).decode()] = (name, "flat", None)
+        if leaves[name]:
+            root = merkle_root(leaves[name], name)
+            digests[base64.b64encode(root).decode()] = (name, "merkle", chunk_size)
+    return digests
+
+@metrics.timed("lookup.by_content")
+def find_documents_by_content(user_id, path):
+    """
+    Procura, entre os documentos enviados ou recebidos pelo usuário, os que têm
+    exatamente o conteúdo do arquivo local, pelo índice de document_hash, sem
+    reverificar assinaturas. Documentos em modo Merkle só são encontrados se
+    assinados com blocos de MERKLE_CHUNK_SIZE; documentos arquivados não entram.
+
+    Returns:
+        tuple: (lista de documentos com status e histórico de verificações, mensagem de erro ou None)
+    """
+    if not os.path.isfile(path):
+        return [], "Arquivo não encontrado."
+    if os.path.getsize(path) == 0:
+        return [], "O arquivo está vazio."
+    digests = _content_digests(path)
+
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(f"""
+            SELECT d.document_id, d.document_name, d.sender_id, d.created_at, d.verified_at,
+                   d.document_hash, d.hash_algorithm, d.digest_mode, d.chunk_size,
+                   COALESCE((SELECT dd.status FROM document_deliveries dd
+                             WHERE dd.document_id = d.document_id AND dd.receiver_id = ?), d.status) as status,
                    s.nome as sender_name, s.email as sender_email,
                    r.nome as receiver_name, r.email as receiver_email
             FROM documents d
             JOIN users s ON d.sender_id = s.user_id
             JOIN users r ON d.receiver_id = r.user_id
-            WHERE d.document_id = ? AND (d.sender_id = ? OR d.receiver_id = ?)
-        """, (document_id, user_id, user_id))
-        document = cursor.fetchone()
-        if document:
-            return dict(document)
-        return None
+            WHERE d.document_hash IN ({",".join("?" * len(digests))})
+              AND (d.sender_id = ? OR d.receiver_id = ? OR EXISTS (
+                  SELECT 1 FROM document_deliveries dd
+                  WHERE dd.document_id = d.document_id AND dd.receiver_id = ?))
+            ORDER BY d.created_at DESC
+        """, (user_id, *digests, user_id, user_id, user_id)).fetchall()
+
+        # O hash precisa ter sido calculado do mesmo jeito (algoritmo, modo e blocos)
+        matches = [row for row in rows if digests[row["document_hash"]] == (
+            row["hash_algorithm"] or "SHA3-256", row["digest_mode"] or "flat",
+            row["chunk_size"] if row["digest_mode"] == "merkle" else None)]
+
+        history = {row["document_id"]: [] for row in matches}
+        if history:
+            for log in conn.execute(f"""
+                SELECT vl.document_id, vl.result, vl.error_message, vl.verified_at,
+                       u.nome as verifier_name, u.email as verifier_email
+                FROM verification_logs vl
+                JOIN users u ON vl.verifier_id = u.user_id
+                WHERE vl.document_id IN ({",".join("?" * len(history))})
+                ORDER BY vl.verified_at DESC
+            """, list(history)):
+                history[log["document_id"]].append(VerificationEntry(*tuple(log)[1:]))
     finally:
         conn.close()
 
+    documents = []
+    for row in matches:
+        documents.append({
+            "document_id": row["document_id"],
+            "document_name": row["document_name"],
+            "role": "sent" if row["sender_id"] == user_id else "received",
+            "sender_name": row["sender_name"],
+            "sender_email": row["sender_email"],
+            "receiver_name": row["receiver_name"],
+            "receiver_email": row["receiver_email"],
+            "status": row["status"],
+            "created_at": row["created_at"],
+            "verified_at": row["verified_at"],
+            "history": history[row["document_id"]]
+        })
+    return documents, None
+
+def _fetch_document_details(cursor, document_id, user_id, schema="main"):
+    """Busca os detalhes do documento no banco principal ou em uma partição de arquivo anexada"""
+    cursor.execute(f"""
+        SELECT d.document_id, d.document_name, d.document_content, d.document_hash,
+               d.public_key, d.private_key_encrypted, d.signature,
+               COALESCE(dd.status, d.status) as status, d.created_at,
+               CASE WHEN dd.delivery_id IS NULL THEN d.verified_at ELSE dd.verified_at END as verified_at,
+               d.content_codec, d.content_type, d.hash_algorithm,
+               d.digest_mode, d.chunk_size, d.storage_mode, d.file_path, d.file_size, d.file_mtime,
+               s.nome as sender_name, s.email as sender_email,
+               d.delivery_mode, d.key_id, d.sender_id,
+               r.nome as receiver_name, r.email as receiver_email
+        FROM {schema}.documents d
+        LEFT JOIN {schema}.document_deliveries dd ON dd.document_id = d.document_id AND dd.receiver_id = ?
+        JOIN main.users s ON d.sender_id = s.user_id
+        JOIN main.users r ON COALESCE(dd.receiver_id, d.receiver_id) = r.user_id
+        WHERE d.document_id = ? AND (d.sender_id = ? OR d.receiver_id = ? OR dd.delivery_id IS NOT NULL)
+    """, (user_id, document_id, user_id, user_id))
+    rows = cursor.fetchall()
+    return rows[0] if rows else None
+
+@metrics.timed("db.load_document")
+def _load_document(document_id, user_id):
+    """Carrega a linha do documento com o conteúdo ainda no formato armazenado"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        document = _fetch_document_details(cursor, document_id, user_id)
+        if not document:
+            with archived_document_schema(conn, document_id) as schema:
+                if schema:
+                    document = _fetch_document_details(cursor, document_id, user_id, schema)
+        return dict(document) if document else None
+    finally:
+        conn.close()
+
+def get_document_details(document_id, user_id):
+    """
+    Obtém detalhes completos de um documento.
+    O conteúdo é descomprimido aqui, apenas quando os detalhes são lidos.
+    Documentos arquivados são buscados na partição de arquivo correspondente.
+    """
+    details = _load_document(document_id, user_id)
+    if details:
+        details["document_content"] = stored_content_to_b64(
+            details["document_content"], details["content_codec"]
+        )
+    return details
+
+def _resolve_public_key(document):
+    """
+    Chave pública que verifica o documento: a gravada na própria linha (chave por
+    documento) ou a chave de usuário referenciada por key_id, que precisa pertencer
+    ao remetente e estar válida na data de envio.
+
+    Returns:
+        tuple: (chave pública, mensagem de erro ou None)
+    """
+    if document["key_id"] is None:
+        return document["public_key"], None
+    key = get_user_public_key(document["key_id"])
+    if key is None or key[0] != document["sender_id"]:
+        return None, "Chave de assinatura do remetente não encontrada"
+    _, public_key, valid_from, valid_until = key
+    if not valid_from <= str(document["created_at"]) <= valid_until:
+        return None, "Documento assinado fora do período de validade da chave"
+    return public_key, None
+
+def _update_delivery_status(cursor, document_id, receiver_id, status, verified_at, schema="main"):
+    """
+    Atualiza o status da entrega do destinatário e recalcula o status agregado do
+    documento: "verified" quando todas as entregas foram verificadas, "rejected"
+    se alguma foi rejeitada. Verificações feitas por quem não é destinatário
+    (ex.: o remetente) ficam apenas no log.
+    """
+    cursor.execute(f"UPDATE {schema}.document_deliveries SET status = ?, verified_at = ? "
+                   "WHERE document_id = ? AND receiver_id = ?",
+                   (status, verified_at, document_id, receiver_id))
+    if cursor.rowcount == 0:
+        return
+    cursor.execute(f"""
+        UPDATE {schema}.documents SET
+            status = CASE
+                WHEN EXISTS (SELECT 1 FROM {schema}.document_deliveries WHERE document_id = :id AND status = 'rejected') THEN 'rejected'
+                WHEN EXISTS (SELECT 1 FROM {schema}.document_deliveries WHERE document_id = :id AND status != 'verified') THEN 'sent'
+                ELSE 'verified'
+            END,
+            verified_at = (SELECT MAX(verified_at) FROM {schema}.document_deliveries WHERE document_id = :id)
+        WHERE document_id = :id
+    """, {"id": document_id})
+
+@metrics.timed("verify.total")
 def verify_document(document_id, verifier_id):
     """
     Verifica a autenticidade de um documento.
@@ -222,7 +597,7 @@ def verify_document(document_id, verifier_id):
     cursor = conn.cursor()
 
     try:
-        document = get_document_details(document_id, verifier_id)
+        document = _load_document(document_id, verifier_id)
         if not document:
             return False, "Documento não encontrado ou sem permissão."
 
@@ -230,34 +605,65 @@ def verify_document(document_id, verifier_id):
         
         # Reconstruir o signature_package para a função verify_signed_document
         signature_package = {
-            "document_content": document["document_content"],
             "document_hash": document["document_hash"],
             "signature": document["signature"],
             "sender_email": document["sender_email"],
             "receiver_email": document["receiver_email"],
             "timestamp": document["created_at"],
+            "content_type": document["content_type"],
             "algorithm": "RSA-PSS",
-            "hash_algorithm": "SHA3-256"
+            "hash_algorithm": document["hash_algorithm"] or "SHA3-256",
+            "digest_mode": document["digest_mode"] or "flat",
+            "chunk_size": document["chunk_size"]
         }
         
-        public_key_pem = document["public_key"]
+        public_key, key_error = _resolve_public_key(document)
 
-        verification_result = verify_signed_document(signature_package, public_key_pem)
+        if key_error:
+            verification_result = {"valid": False, "error": key_error, "details": None}
+        elif document["storage_mode"] == "detached":
+            # Sem o arquivo não há o que verificar; o status do documento não muda
+            if not os.path.isfile(document["file_path"]):
+                return False, f"Arquivo do documento não encontrado: {document['file_path']}"
+            signature_package.update({
+                "file_path": document["file_path"],
+                "file_size": document["file_size"],
+                "file_mtime": document["file_mtime"]
+            })
+            # Lê o arquivo do disco em blocos e confere com o hash armazenado
+            verification_result = verify_detached_file(signature_package, public_key)
+        else:
+            # Decodifica (e descomprime) o conteúdo armazenado uma única vez
+            content = decompress_payload(document["document_content"], document["content_codec"])
+            verification_result = verify_signed_document(signature_package, public_key, content)
         
         new_status = "verified" if verification_result["valid"] else "rejected"
         verified_at = datetime.now()
 
-        cursor.execute("UPDATE documents SET status = ?, verified_at = ? WHERE document_id = ?",
-                       (new_status, verified_at, document_id))
-        
-        # Log da verificação
         error_message = verification_result["error"] if not verification_result["valid"] else None
-        cursor.execute("""
-            INSERT INTO verification_logs (document_id, verifier_id, result, error_message, verified_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (document_id, verifier_id, new_status, error_message, verified_at))
-        
-        conn.commit()
+
+        # Documentos arquivados têm status e log gravados na própria partição
+        with archived_document_schema(conn, document_id) as schema:
+            schema = schema or "main"
+            try:
+                if document["delivery_mode"] == "fanout":
+                    _update_delivery_status(cursor, document_id, verifier_id, new_status, verified_at, schema)
+                else:
+                    cursor.execute(f"UPDATE {schema}.documents SET status = ?, verified_at = ? WHERE document_id = ?",
+                                   (new_status, verified_at, document_id))
+
+                # Log da verificação
+                cursor.execute(f"""
+                    INSERT INTO {schema}.verification_logs (document_id, verifier_id, result, error_message, verified_at)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (document_id, verifier_id, new_status, error_message, verified_at))
+
+                with metrics.span("db.commit"):
+                    conn.commit()
+            except Exception:
+                # Desfaz antes de desanexar a partição
+                conn.rollback()
+                raise
         
         if verification_result["valid"]:
             success_msg = f"""✅ DOCUMENTO VERIFICADO COM SUCESSO!
@@ -266,7 +672,7 @@ Detalhes da verificação:
 - Documento: {document['document_name']}
 - Remetente: {document['sender_name']} ({document['sender_email']})
 - Data de envio: {document['created_at']}
-- Algoritmo: RSA-PSS com SHA3-256
+- Algoritmo: RSA-PSS com {signature_package['hash_algorithm']}
 - Status: ASSINATURA VÁLIDA
 
 A integridade e autenticidade do documento foram confirmadas."""
@@ -288,36 +694,104 @@ ATENÇÃO: Este documento pode ter sido alterado ou a assinatura é inválida.""
     finally:
         conn.close()
 
+def _load_chunk_leaves(document_id):
+    """Folhas da árvore de Merkle do documento, no banco principal ou na partição de arquivo"""
+    conn = get_db_connection()
+    try:
+        with archived_document_schema(conn, document_id) as schema:
+            rows = conn.execute(f"""
+                SELECT leaf_hash FROM {schema or 'main'}.document_chunks
+                WHERE document_id = ? ORDER BY chunk_index
+            """, (document_id,)).fetchall()
+        return [row["leaf_hash"] for row in rows]
+    finally:
+        conn.close()
+
+def verify_document_chunks(document_id, verifier_id, first_chunk, last_chunk):
+    """
+    Verifica apenas os blocos [first_chunk, last_chunk] de um documento assinado
+    no modo Merkle, usando provas de inclusão em relação à raiz assinada.
+    Não altera o status do documento, que depende da verificação completa.
+
+    Returns:
+        tuple: (sucesso, mensagem)
+    """
+    try:
+        document = _load_document(document_id, verifier_id)
+        if not document:
+            return False, "Documento não encontrado ou sem permissão."
+        if document["digest_mode"] != "merkle":
+            return False, "O documento não foi assinado no modo de blocos (Merkle)."
+
+        hash_algorithm = document["hash_algorithm"] or "SHA3-256"
+        chunk_size = document["chunk_size"]
+        root = base64.b64decode(document["document_hash"])
+
+        # A raiz precisa estar coberta pela assinatura
+        public_key, key_error = _resolve_public_key(document)
+        if key_error:
+            return False, key_error
+        if not verify_digest(root, document["signature"], public_key, hash_algorithm):
+            return False, "Assinatura digital inválida."
+
+        leaves = _load_chunk_leaves(document_id)
+        if not 0 <= first_chunk <= last_chunk < len(leaves):
+            return False, f"Intervalo de blocos inválido (o documento tem {len(leaves)} blocos)."
+
+        if document["storage_mode"] == "detached":
+            # Lê do disco apenas os blocos pedidos
+            if not os.path.isfile(document["file_path"]):
+                return False, f"Arquivo do documento não encontrado: {document['file_path']}"
+            with open(document["file_path"], "rb") as f:
+                f.seek(first_chunk * chunk_size)
+                chunks = [f.read(chunk_size) for _ in range(first_chunk, last_chunk + 1)]
+        else:
+            content = memoryview(decompress_payload(document["document_content"], document["content_codec"]))
+            chunks = [content[i * chunk_size:(i + 1) * chunk_size] for i in range(first_chunk, last_chunk + 1)]
+        proofs = range_proofs(leaves, first_chunk, last_chunk + 1, hash_algorithm)
+
+        failed = verify_chunks(chunks, first_chunk, proofs, root, hash_algorithm)
+        if failed:
+            return False, f"Blocos alterados após a assinatura: {', '.join(map(str, failed))}"
+        return True, f"Blocos {first_chunk} a {last_chunk} verificados com sucesso."
+    except Exception as e:
+        return False, f"Erro ao verificar blocos do documento: {e}"
+
 def get_verification_history(document_id, user_id):
     """
     Obtém histórico de verificações de um documento.
+    Para documentos arquivados, inclui os logs guardados na partição de arquivo.
     """
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        # Verifica se o usuário tem acesso ao documento
-        cursor.execute("SELECT 1 FROM documents WHERE document_id = ? AND (sender_id = ? OR receiver_id = ?)",
-                       (document_id, user_id, user_id))
-        if not cursor.fetchone():
-            return [], "Documento não encontrado ou sem permissão."
+        with archived_document_schema(conn, document_id) as schema:
+            # Verifica se o usuário tem acesso ao documento
+            cursor.execute(f"""
+                SELECT 1 FROM {schema or 'main'}.documents d
+                WHERE d.document_id = ? AND (d.sender_id = ? OR d.receiver_id = ? OR EXISTS (
+                    SELECT 1 FROM {schema or 'main'}.document_deliveries dd
+                    WHERE dd.document_id = d.document_id AND dd.receiver_id = ?))
+            """, (document_id, user_id, user_id, user_id))
+            if not cursor.fetchall():
+                return [], "Documento não encontrado ou sem permissão."
 
-        cursor.execute("""
-            SELECT vl.result, vl.error_message, vl.verified_at,
-                   u.nome as verifier_name, u.email as verifier_email
-            FROM verification_logs vl
-            JOIN users u ON vl.verifier_id = u.user_id
-            WHERE vl.document_id = ?
-            ORDER BY vl.verified_at DESC
-        """, (document_id,))
-        history = []
-        for row in cursor.fetchall():
-            history.append({
-                "result": row["result"],
-                "error_message": row["error_message"],
-                "verified_at": row["verified_at"],
-                "verifier_name": row["verifier_name"],
-                "verifier_email": row["verifier_email"]
-            })
+            logs_source = "main.verification_logs"
+            if schema:
+                columns = "document_id, verifier_id, result, error_message, verified_at"
+                logs_source = (f"(SELECT {columns} FROM main.verification_logs "
+                               f"UNION ALL SELECT {columns} FROM {schema}.verification_logs)")
+
+            cursor.row_factory = row_factory(VerificationEntry)
+            cursor.execute(f"""
+                SELECT vl.result, vl.error_message, vl.verified_at,
+                       u.nome as verifier_name, u.email as verifier_email
+                FROM {logs_source} vl
+                JOIN main.users u ON vl.verifier_id = u.user_id
+                WHERE vl.document_id = ?
+                ORDER BY vl.verified_at DESC
+            """, (document_id,))
+            history = cursor.fetchall()
         return history, None
     finally:
         conn.close()
@@ -333,8 +807,13 @@ def get_document_statistics(user_id):
         cursor.execute("SELECT COUNT(*) as count FROM documents WHERE sender_id = ?", (user_id,))
         sent_count = cursor.fetchone()["count"]
         
-        # Documentos recebidos
-        cursor.execute("SELECT COUNT(*) as count FROM documents WHERE receiver_id = ?", (user_id,))
+        # Documentos recebidos (diretos e entregas de envios para vários destinatários)
+        received = """
+            SELECT status FROM documents WHERE receiver_id = ? AND delivery_mode = 'direct'
+            UNION ALL
+            SELECT status FROM document_deliveries WHERE receiver_id = ?
+        """
+        cursor.execute(f"SELECT COUNT(*) as count FROM ({received})", (user_id, user_id))
         received_count = cursor.fetchone()["count"]
         
         # Documentos verificados (enviados)
@@ -342,7 +821,7 @@ def get_document_statistics(user_id):
         verified_sent = cursor.fetchone()["count"]
         
         # Documentos verificados (recebidos)
-        cursor.execute("SELECT COUNT(*) as count FROM documents WHERE receiver_id = ? AND status = 'verified'", (user_id,))
+        cursor.execute(f"SELECT COUNT(*) as count FROM ({received}) WHERE status = 'verified'", (user_id, user_id))
         verified_received = cursor.fetchone()["count"]
         
         return {
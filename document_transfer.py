@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""
+Exportação e importação de documentos assinados entre instalações.
+
+Cada documento é exportado como um registro JSON autocontido: a linha de
+documents (conteúdo armazenado, hash, assinatura, chaves), a chave de usuário
+referenciada por key_id, as entregas, os logs de verificação e as folhas de
+Merkle. Usuários são referenciados pelo email, já que os user_id mudam de uma
+instalação para outra (importe os usuários antes, com user_import.py).
+
+Formatos:
+- JSONL (.jsonl, ou .jsonl.gz comprimido): um registro por linha;
+- tar (.tar, .tar.gz, .tgz): um membro documentos/<id>.json por documento e,
+  para documentos com assinatura destacada, o próprio arquivo em
+  arquivos/<id>/<nome>, gravado antes do registro.
+
+A exportação lê os documentos com um cursor e grava registro a registro (inclusive
+os que estão nas partições de arquivo), sem carregar o conjunto na memória. A
+importação lê o arquivo como fluxo e insere em lotes, uma transação por lote:
+documentos cujo document_id já existe (no banco principal ou no arquivo) são
+ignorados, e com --verificar as assinaturas são conferidas em um pool de
+processos antes da inserção.
+
+Uso:
+    python document_transfer.py exportar saida.jsonl [--ids ID ...] [--usuario EMAIL] [--desde AAAA-MM-DD] [--ate AAAA-MM-DD]
+    python document_transfer.py importar entrada.jsonl [--lote N] [--verificar] [--processos N] [--arquivos DIR] [--relatorio erros.json]
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import shutil
+import sys
+import tarfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from database import get_db_connection
+from archive import attached_partition
+from compression import decompress_payload
+from package_verifier import package_from_record, verify_package
+from config import SEARCH_INDEX_CONTENT, SEARCH_CONTENT_MAX_BYTES
+
+FORMAT_VERSION = 1
+
+# Colunas de documents que referenciam ids locais: exportadas como emails / chave
+_LOCAL_ID_COLUMNS = ("sender_id", "receiver_id", "key_id", "search_rowid")
+
+def _archive_format(path):
+    """"tar" ou "jsonl", pela extensão do arquivo"""
+    return "tar" if path.endswith((".tar", ".tar.gz", ".tgz")) else "jsonl"
+
+def _document_sources(conn):
+    """Schemas com documentos: o banco principal e cada partição de arquivo existente"""
+    yield "main"
+    partitions = [row[0] for row in conn.execute("SELECT DISTINCT partition FROM archived_documents")]
+    for partition in partitions:
+        with attached_partition(conn, partition) as schema:
+            if schema:
+                yield schema
+
+def _selection(schema, document_ids=None, user_email=None, since=None, until=None):
+    """Cláusula WHERE e parâmetros da seleção de documentos"""
+    conditions, params = [], []
+    if document_ids:
+        conditions.append(f"d.document_id IN ({','.join('?' * len(document_ids))})")
+        params.extend(document_ids)
+    if user_email:
+        conditions.append(f"""(s.email = ? OR r.email = ? OR EXISTS (
+            SELECT 1 FROM {schema}.document_deliveries dd JOIN main.users u ON u.user_id = dd.receiver_id
+            WHERE dd.document_id = d.document_id AND u.email = ?))""")
+        params.extend([user_email] * 3)
+    if since:
+        conditions.append("d.created_at >= ?")
+        params.append(since)
+    if until:
+        conditions.append("d.created_at < ?")
+        params.append(until)
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+def _export_key(conn, key_id, keys):
+    """Chave de usuário do documento, com o email do dono (em cache por key_id)"""
+    if key_id not in keys:
+        row = conn.execute("""
+            SELECT u.email as owner_email, k.public_key, k.private_key_encrypted, k.status,
+                   k.valid_from, k.valid_until, k.created_at
+            FROM main.user_keys k JOIN main.users u ON u.user_id = k.user_id
+            WHERE k.key_id = ?
+        """, (key_id,)).fetchone()
+        keys[key_id] = dict(row) if row else None
+    return keys[key_id]
+
+def iter_export_records(document_ids=None, user_email=None, since=None, until=None):
+    """
+    Registros de exportação dos documentos selecionados, um por documento.
+
+    Yields:
+        dict: {"tipo": "documento", "documento", "remetente", "destinatario",
+               "chave", "entregas", "logs", "blocos"}
+    """
+    conn = get_db_connection()
+    try:
+        keys = {}
+        for schema in _document_sources(conn):
+            where, params = _selection(schema, document_ids, user_email, since, until)
+            documents = conn.execute(f"""
+                SELECT d.*, s.email as sender_email, r.email as receiver_email
+                FROM {schema}.documents d
+                JOIN main.users s ON s.user_id = d.sender_id
+                JOIN main.users r ON r.user_id = d.receiver_id{where}
+            """, params)
+            # Entregas, logs e blocos vêm de um segundo cursor, enquanto o primeiro avança
+            for row in documents:
+                document = dict(row)
+                sender_email = document.pop("sender_email")
+                receiver_email = document.pop("receiver_email")
+                key_id = document["key_id"]
+                for column in _LOCAL_ID_COLUMNS:
+                    document.pop(column, None)
+                document_id = document["document_id"]
+
+                deliveries = [dict(delivery) for delivery in conn.execute(f"""
+                    SELECT u.email as receiver_email, dd.status, dd.verified_at
+                    FROM {schema}.document_deliveries dd JOIN main.users u ON u.user_id = dd.receiver_id
+                    WHERE dd.document_id = ? ORDER BY dd.delivery_id
+                """, (document_id,))]
+                logs = [dict(log) for log in conn.execute(f"""
+                    SELECT u.email as verifier_email, l.result, l.error_message, l.verified_at
+                    FROM {schema}.verification_logs l JOIN main.users u ON u.user_id = l.verifier_id
+                    WHERE l.document_id = ? ORDER BY l.log_id
+                """, (document_id,))]
+                chunks = [leaf.hex() for (leaf,) in conn.execute(
+                    f"SELECT leaf_hash FROM {schema}.document_chunks WHERE document_id = ? ORDER BY chunk_index",
+                    (document_id,))]
+
+                yield {
+                    "tipo": "documento",
+                    "documento": document,
+                    "remetente": sender_email,
+                    "destinatario": receiver_email,
+                    "chave": _export_key(conn, key_id, keys) if key_id is not None else None,
+                    "entregas": deliveries,
+                    "logs": logs,
+                    "blocos": chunks,
+                }
+    finally:
+        conn.close()
+
+def _header():
+    return {"tipo": "cabecalho", "versao": FORMAT_VERSION, "exportado_em": datetime.now().isoformat()}
+
+def _dumps(record):
+    # Datas lidas do SQLite já são texto; default=str cobre datetimes vindos de adaptadores
+    return json.dumps(record, ensure_ascii=False, default=str)
+
+def write_jsonl(records, path):
+    """Grava os registros em JSONL (comprimido com gzip se o caminho terminar em .gz)"""
+    count = 0
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        f.write(_dumps(_header()) + "\n")
+        for record in records:
+            f.write(_dumps(record) + "\n")
+            count += 1
+    return count
+
+def _add_bytes(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+
+def write_tar(records, path):
+    """Grava os registros em um tar (gzip para .tar.gz/.tgz), com os arquivos das assinaturas destacadas"""
+    count = 0
+    mode = "w|gz" if path.endswith((".gz", ".tgz")) else "w|"
+    with tarfile.open(path, mode) as tar:
+        _add_bytes(tar, "cabecalho.json", _dumps(_header()).encode("utf-8"))
+        for record in records:
+            document = record["documento"]
+            file_path = document.get("file_path")
+            if document.get("storage_mode") == "detached" and file_path and os.path.isfile(file_path):
+                tar.add(file_path, arcname=f"arquivos/{document['document_id']}/{os.path.basename(file_path)}",
+                        recursive=False)
+            _add_bytes(tar, f"documentos/{document['document_id']}.json", _dumps(record).encode("utf-8"))
+            count += 1
+    return count
+
+def export_documents(path, document_ids=None, user_email=None, since=None, until=None):
+    """
+    Exporta os documentos selecionados para um arquivo JSONL ou tar.
+
+    Returns:
+        int: Documentos exportados
+    """
+    records = iter_export_records(document_ids, user_email, since, until)
+    if _archive_format(path) == "tar":
+        return write_tar(records, path)
+    return write_jsonl(records, path)
+
+def _check_header(record):
+    if record.get("versao", 0) > FORMAT_VERSION:
+        raise ValueError(f"Versão do arquivo de exportação não suportada: {record.get('versao')}")
+
+def read_jsonl(path):
+    """
+    Lê os registros de um JSONL exportado.
+
+    Yields:
+        tuple: (número da linha, registro ou None se a linha for inválida)
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                yield line_number, None
+                continue
+            if isinstance(record, dict) and record.get("tipo") == "cabecalho":
+                _check_header(record)
+                continue
+            yield line_number, record if isinstance(record, dict) else None
+
+def _safe_name(name):
+    return name not in ("", ".", "..") and "/" not in name and "\\" not in name and os.sep not in name
+
+def _extraction_target(files_root, parts):
+    """
+    Destino de um membro arquivos/<id>/<nome> dentro de files_root, ou None se
+    o membro tentar sair do diretório (id que não é UUID, "..", separadores).
+    """
+    if len(parts) != 3 or not all(_safe_name(part) for part in parts[1:]):
+        return None
+    try:
+        if str(uuid.UUID(parts[1])) != parts[1]:
+            return None
+    except ValueError:
+        return None
+    target = os.path.realpath(os.path.join(files_root, parts[1], parts[2]))
+    if not target.startswith(files_root + os.sep):
+        return None
+    return target
+
+def read_tar(path, files_dir):
+    """
+    Lê os registros de um tar exportado como fluxo, extraindo os arquivos das
+    assinaturas destacadas para files_dir e apontando file_path para eles.
+
+    Membros que não são arquivos regulares são ignorados, e arquivos cujo
+    destino sairia de files_dir são rejeitados como inválidos.
+
+    Yields:
+        tuple: (nome do membro, registro ou None se o membro for inválido)
+    """
+    extracted = {}
+    files_root = os.path.realpath(files_dir)
+    with tarfile.open(path, "r|*") as tar:
+        for member in tar:
+            # Links simbólicos, hardlinks e dispositivos nunca são extraídos
+            if not member.isreg():
+                continue
+            parts = member.name.split("/")
+            if parts[0] == "arquivos":
+                target = _extraction_target(files_root, parts)
+                if target is None:
+                    yield member.name, None
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with tar.extractfile(member) as source, open(target, "wb") as f:
+                    shutil.copyfileobj(source, f)
+                extracted[parts[1]] = target
+                continue
+            try:
+                record = json.loads(tar.extractfile(member).read())
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                yield member.name, None
+                continue
+            if member.name == "cabecalho.json":
+                _check_header(record)
+                continue
+            if isinstance(record, dict) and isinstance(record.get("documento"), dict):
+                target = extracted.pop(record["documento"].get("document_id"), None)
+                if target:
+                    record["documento"]["file_path"] = os.path.abspath(target)
+                    record["documento"]["file_mtime"] = os.path.getmtime(target)
+            yield member.name, record if isinstance(record, dict) else None
+
+def read_archive(path, files_dir=None):
+    """Registros do arquivo exportado, pelo formato da extensão"""
+    if _archive_format(path) == "tar":
+        files_dir = files_dir or os.path.join(os.path.dirname(os.path.abspath(database.DATABASE_NAME)),
+                                              "arquivos_importados")
+        return read_tar(path, files_dir)
+    return read_jsonl(path)
+
+def _verify_record(record):
+    """
+    Verifica a assinatura de um registro exportado (executado no pool de processos).
+
+    A chave usada é a que vem no próprio registro: isso confere a integridade
+    do que foi exportado, mas não autentica o remetente.
+
+    Returns:
+        str: Mensagem de erro, ou None se a assinatura for válida
+    """
+    signature_package, public_key, error = package_from_record(record)
+    if error:
+        return error
+    result, _ = verify_package(signature_package, public_key)
+    return None if result["valid"] else result["error"]
+
+def _record_emails(record):
+    emails = {record["remetente"], record["destinatario"]}
+    emails.update(delivery["receiver_email"] for delivery in record.get("entregas") or ())
+    emails.update(log["verifier_email"] for log in record.get("logs") or ())
+    if record.get("chave"):
+        emails.add(record["chave"]["owner_email"])
+    return emails
+
+def _validate(record):
+    """Mensagem de erro se o registro não tiver os campos mínimos de um documento"""
+    if record is None or record.get("tipo") != "documento":
+        return "Registro mal formado."
+    document = record.get("documento")
+    if not isinstance(document, dict) or not document.get("document_id"):
+        return "Registro sem documento."
+    missing = [field for field in ("document_hash", "signature", "created_at") if not document.get(field)]
+    if missing or not record.get("remetente") or not record.get("destinatario"):
+        return f"Campo(s) obrigatório(s) ausente(s): {', '.join(missing) or 'remetente/destinatário'}."
+    return None
+
+def _existing_documents(conn, document_ids):
+    """Ids do lote já presentes no banco principal ou no arquivo"""
+    placeholders = ",".join("?" * len(document_ids))
+    return {row[0] for row in conn.execute(f"""
+        SELECT document_id FROM documents WHERE document_id IN ({placeholders})
+        UNION SELECT document_id FROM archived_documents WHERE document_id IN ({placeholders})
+    """, document_ids * 2)}
+
+def _resolve_users(conn, emails, users):
+    """Completa o cache email -> user_id com os emails ainda não consultados"""
+    pending = [email for email in emails if email not in users]
+    for first in range(0, len(pending), 500):
+        chunk = pending[first:first + 500]
+        users.update({email: None for email in chunk})
+        users.update((row[0], row[1]) for row in conn.execute(
+            f"SELECT email, user_id FROM users WHERE email IN ({','.join('?' * len(chunk))})", chunk))
+
+def _import_key(conn, key, user_id, keys):
+    """key_id local da chave exportada, inserindo-a se ainda não existir"""
+    cache_key = (user_id, key["public_key"])
+    if cache_key not in keys:
+        row = conn.execute("SELECT key_id FROM user_keys WHERE user_id = ? AND public_key = ?", cache_key).fetchone()
+        if row:
+            keys[cache_key] = row[0]
+        else:
+            # O usuário continua com uma única chave ativa: as importadas entram como rotacionadas
+            status = key["status"]
+            if status == "active" and conn.execute(
+                    "SELECT 1 FROM user_keys WHERE user_id = ? AND status = 'active'", (user_id,)).fetchone():
+                status = "retired"
+            cursor = conn.execute("""
+                INSERT INTO user_keys (user_id, public_key, private_key_encrypted, status, valid_from, valid_until, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (user_id, key["public_key"], key["private_key_encrypted"], status,
+                  key["valid_from"], key["valid_until"], key["created_at"]))
+            keys[cache_key] = cursor.lastrowid
+    return keys[cache_key]
+
+def _insert_batch(conn, batch, users, keys, columns):
+    """Insere os documentos válidos de um lote em uma transação"""
+    documents, deliveries, logs, chunks, contents = [], [], [], [], []
+    for record in batch:
+        document = record["documento"]
+        document_id = document["document_id"]
+        values = {name: document[name] for name in columns if name in document}
+        values.update({
+            "sender_id": users[record["remetente"]],
+            "receiver_id": users[record["destinatario"]],
+            "key_id": _import_key(conn, record["chave"], users[record["chave"]["owner_email"]], keys)
+                      if record.get("chave") else None,
+        })
+        documents.append(values)
+        deliveries.extend((document_id, users[delivery["receiver_email"]], delivery["status"], delivery["verified_at"])
+                          for delivery in record.get("entregas") or ())
+        logs.extend((document_id, users[log["verifier_email"]], log["result"], log["error_message"], log["verified_at"])
+                    for log in record.get("logs") or ())
+        chunks.extend((document_id, index, bytes.fromhex(leaf)) for index, leaf in enumerate(record.get("blocos") or ()))
+        if SEARCH_INDEX_CONTENT and document.get("content_type") == "text" and document.get("storage_mode") != "detached":
+            content = decompress_payload(document["document_content"], document.get("content_codec") or "none")
+            contents.append((bytes(content[:SEARCH_CONTENT_MAX_BYTES]).decode("utf-8", errors="ignore"), document_id))
+
+    # Registros de versões diferentes podem ter colunas diferentes: um INSERT por conjunto de colunas
+    by_columns = {}
+    for values in documents:
+        by_columns.setdefault(tuple(values), []).append(tuple(values.values()))
+    try:
+        for names, rows in by_columns.items():
+            conn.executemany(f"INSERT INTO documents ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", rows)
+        conn.executemany("INSERT INTO document_deliveries (document_id, receiver_id, status, verified_at) VALUES (?, ?, ?, ?)",
+                         deliveries)
+        conn.executemany("""
+            INSERT INTO verification_logs (document_id, verifier_id, result, error_message, verified_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, logs)
+        conn.executemany("INSERT INTO document_chunks (document_id, chunk_index, leaf_hash) VALUES (?, ?, ?)", chunks)
+        conn.executemany("""
+            UPDATE documents_fts SET content = ? WHERE rowid = (SELECT search_rowid FROM documents WHERE document_id = ?)
+        """, contents)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # Chaves inseridas nesta transação foram desfeitas junto com ela
+        keys.clear()
+        raise
+
+def import_documents(records, batch_size=500, verify=False, workers=None):
+    """
+    Importa documentos exportados por export_documents.
+
+    Args:
+        records: Iterável de (posição, registro), como o de read_archive
+        batch_size: Documentos por transação
+        verify: Verifica as assinaturas antes de inserir (em um pool de processos)
+        workers: Processos usados na verificação (padrão: número de CPUs)
+
+    Returns:
+        dict: Quantidades lidas/importadas/ignoradas, tempo e a lista de erros
+    """
+    started = time.perf_counter()
+    result = {"lidos": 0, "importados": 0, "duplicados": 0, "rejeitados": 0}
+    errors = []
+    seen = set()
+    users, keys = {}, {}
+
+    def reject(position, record, error):
+        document = (record or {}).get("documento")
+        document_id = document.get("document_id") if isinstance(document, dict) else None
+        errors.append({"posicao": position, "documento": document_id, "erro": error})
+
+    def import_batch(batch):
+        # Duplicados: repetidos no próprio arquivo ou já presentes no banco
+        existing = _existing_documents(conn, [record["documento"]["document_id"] for _, record in batch])
+        pending = []
+        for position, record in batch:
+            document_id = record["documento"]["document_id"]
+            if document_id in existing or document_id in seen:
+                result["duplicados"] += 1
+                continue
+            seen.add(document_id)
+            pending.append((position, record))
+
+        _resolve_users(conn, {email for _, record in pending for email in _record_emails(record)}, users)
+        resolved = []
+        for position, record in pending:
+            missing = sorted(email for email in _record_emails(record) if users.get(email) is None)
+            if missing:
+                reject(position, record, f"Usuário(s) não cadastrado(s): {', '.join(missing)}.")
+            else:
+                resolved.append((position, record))
+
+        if pool and resolved:
+            chunksize = max(1, len(resolved) // ((workers or os.cpu_count() or 1) * 4))
+            outcomes = pool.map(_verify_record, [record for _, record in resolved], chunksize=chunksize)
+            verified = []
+            for (position, record), error in zip(resolved, outcomes):
+                if error:
+                    reject(position, record, f"Assinatura não confere: {error}")
+                else:
+                    verified.append((position, record))
+            resolved = verified
+
+        if resolved:
+            _insert_batch(conn, [record for _, record in resolved], users, keys, columns)
+            result["importados"] += len(resolved)
+
+    conn = get_db_connection()
+    pool = ProcessPoolExecutor(max_workers=workers) if verify else None
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(documents)")
+                   if row[1] not in _LOCAL_ID_COLUMNS]
+        batch = []
+        for position, record in records:
+            result["lidos"] += 1
+            error = _validate(record)
+            if error:
+                reject(position, record, error)
+                continue
+            batch.append((position, record))
+            if len(batch) == batch_size:
+                import_batch(batch)
+                batch = []
+        if batch:
+            import_batch(batch)
+    finally:
+        if pool:
+            pool.shutdown()
+        conn.close()
+
+    result.update({"rejeitados": len(errors), "duracao_s": time.perf_counter() - started, "erros": errors})
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportação e importação de documentos assinados")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_export = subparsers.add_parser("exportar", help="Exporta documentos para JSONL ou tar")
+    p_export.add_argument("arquivo", help="Arquivo de saída (.jsonl, .jsonl.gz, .tar, .tar.gz)")
+    p_export.add_argument("--ids", nargs="+", help="Exporta apenas estes documentos")
+    p_export.add_argument("--usuario", help="Exporta apenas documentos enviados ou recebidos por este email")
+    p_export.add_argument("--desde", help="Criados a partir desta data (AAAA-MM-DD)")
+    p_export.add_argument("--ate", help="Criados antes desta data (AAAA-MM-DD)")
+
+    p_import = subparsers.add_parser("importar", help="Importa documentos de um arquivo exportado")
+    p_import.add_argument("arquivo", help="Arquivo exportado (.jsonl, .jsonl.gz, .tar, .tar.gz)")
+    p_import.add_argument("--lote", type=int, default=500, help="Documentos por transação")
+    p_import.add_argument("--verificar", action="store_true",
+                          help="Verifica as assinaturas (com a chave do próprio registro) antes de importar")
+    p_import.add_argument("--processos", type=int, help="Processos para a verificação (padrão: número de CPUs)")
+    p_import.add_argument("--arquivos", help="Destino dos arquivos de assinaturas destacadas (tar)")
+    p_import.add_argument("--relatorio", help="Grava o relatório de erros em JSON neste arquivo")
+
+    args = parser.parse_args()
+    database.create_tables()
+
+    if args.comando == "exportar":
+        started = time.perf_counter()
+        count = export_documents(args.arquivo, args.ids, args.usuario, args.desde, args.ate)
+        print(f"{count} documento(s) exportado(s) para {args.arquivo} em {time.perf_counter() - started:.1f}s.")
+        return
+
+    result = import_documents(read_archive(args.arquivo, args.arquivos), args.lote, args.verificar, args.processos)
+    print(f"{result['importados']} de {result['lidos']} documento(s) importado(s) em {result['duracao_s']:.1f}s "
+          f"({result['duplicados']} já existente(s)).")
+    if result["erros"]:
+        print(f"{result['rejeitados']} documento(s) rejeitado(s):")
+        for error in result["erros"][:20]:
+            print(f"  {error['posicao']} ({error['documento']}): {error['erro']}")
+        if len(result["erros"]) > 20:
+            print(f"  ... e mais {len(result['erros']) - 20}")
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump(result["erros"], f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
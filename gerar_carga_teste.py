@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Gerador de carga sintética para o sistema de assinatura digital.
+
+Complementa criar_usuarios_teste.py (três usuários fixos, um register_user por
+vez) criando bancos em escala de produção com inserções em lote:
+
+- N usuários já verificados (bcrypt calculado uma única vez para a senha comum);
+- M documentos com distribuição de tamanho configurável e concentração
+  (skew Zipf) de remetentes e destinatários;
+- K verificações, com atualização de status e logs de verificação.
+
+Por padrão o material criptográfico usa um caminho rápido: um conjunto de pares
+de chaves pré-gerados (com a chave privada criptografada uma vez por par) e um
+conjunto de conteúdos pré-assinados que os documentos compartilham. Todos os
+documentos gerados continuam verificáveis por verify_document.
+
+Uso:
+    python gerar_carga_teste.py gerar --usuarios 10000 --documentos 1000000 --verificacoes 200000
+    python gerar_carga_teste.py carga --operacoes 5000 --mistura recebidos=40,detalhes=20,verificar=20,inserir=10,estatisticas=10
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import bcrypt
+
+import database
+from compression import compress_payload
+from config import DOCUMENT_COMPRESSION, HASH_ALGORITHM
+from crypto.crypto_backend import get_backend
+from crypto.crypto_utils import encrypt_private_key
+from crypto.keygen import generate_document_keys, serialize_key
+from crypto.signature import Signer
+
+SENHA_PADRAO = "123456"
+
+PALAVRAS = ("contrato assinatura documento cliente fornecedor prazo valor cláusula parte "
+            "acordo pagamento entrega serviço termo aditivo vigência rescisão foro").split()
+
+DOCUMENT_COLUMNS = (
+    "document_id", "sender_id", "receiver_id", "document_name", "document_content",
+    "document_hash", "public_key", "private_key_encrypted", "signature", "status",
+    "created_at", "content_codec", "content_type", "hash_algorithm", "digest_mode",
+)
+
+def sample_size(rng, distribution, mean_size, max_size):
+    """Sorteia um tamanho de documento (bytes) com a média aproximada pedida"""
+    if distribution == "fixo":
+        size = mean_size
+    elif distribution == "lognormal":
+        sigma = 1.0
+        size = rng.lognormvariate(math.log(mean_size) - sigma ** 2 / 2, sigma)
+    elif distribution == "pareto":
+        alpha = 1.5
+        size = mean_size * (alpha - 1) / alpha * rng.paretovariate(alpha)
+    else:
+        raise ValueError(f"Distribuição desconhecida: {distribution}")
+    return max(1, min(int(size), max_size))
+
+def make_content(rng, size, binary):
+    """Conteúdo sintético: bytes aleatórios ou texto UTF-8 com palavras do domínio"""
+    if binary:
+        return rng.randbytes(size)
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(PALAVRAS)
+        words.append(word)
+        length += len(word.encode()) + 1
+    return " ".join(words).encode()[:size].decode("utf-8", "ignore").encode()
+
+def zipf_cum_weights(count, skew):
+    """Pesos acumulados Zipf (peso 1/rank^skew); skew = 0 é uniforme"""
+    total = 0.0
+    cumulative = []
+    for rank in range(1, count + 1):
+        total += 1.0 / rank ** skew
+        cumulative.append(total)
+    return cumulative
+
+class KeyPool:
+    """Pares de chaves pré-gerados, com a chave privada já criptografada com a senha padrão"""
+
+    def __init__(self, size, password=SENHA_PADRAO):
+        backend = get_backend()
+        self.keys = []
+        for _ in range(size):
+            public_key, private_key = backend.generate_rsa_keys()
+            self.keys.append({
+                "public_pem": serialize_key(public_key, "PUBLIC"),
+                "private_encrypted": encrypt_private_key(serialize_key(private_key, "PRIVATE"), password),
+                "signer": Signer(private_key, hash_algorithm=HASH_ALGORITHM),
+            })
+
+class SignedContent:
+    """Conteúdo já assinado e no formato armazenado, pronto para ser inserido"""
+    __slots__ = ("stored", "codec", "content_type", "document_hash", "signature", "public_pem", "private_encrypted")
+
+    def __init__(self, content, signer, public_pem, private_encrypted):
+        try:
+            content.decode("utf-8")
+            content_type = "text"
+        except UnicodeDecodeError:
+            content_type = "binary"
+        package = signer.sign_document(content, "", "", content_type)
+        self.stored, self.codec = compress_payload(content, DOCUMENT_COMPRESSION)
+        self.content_type = content_type
+        self.document_hash = package["document_hash"]
+        self.signature = package["signature"]
+        self.public_pem = public_pem
+        self.private_encrypted = private_encrypted
+
+class ContentFactory:
+    """
+    Produz conteúdos assinados para os documentos gerados.
+
+    Com pool_size > 0, um conjunto fixo de conteúdos é assinado uma vez e
+    compartilhado (caminho rápido); com pool_size = 0 cada documento recebe
+    conteúdo próprio. real_keys gera um par de chaves por documento, como o
+    sistema faz (lento: geração RSA + PBKDF2 por documento).
+    """
+
+    def __init__(self, rng, key_pool_size, pool_size, distribution, mean_size, max_size,
+                 binary_fraction, real_keys=False):
+        self.rng = rng
+        self.distribution = distribution
+        self.mean_size = mean_size
+        self.max_size = max_size
+        self.binary_fraction = binary_fraction
+        self.real_keys = real_keys
+        self.key_pool = None if real_keys else KeyPool(key_pool_size)
+        self.pool = [self._new_content() for _ in range(pool_size)]
+
+    def _new_content(self):
+        size = sample_size(self.rng, self.distribution, self.mean_size, self.max_size)
+        content = make_content(self.rng, size, self.rng.random() < self.binary_fraction)
+        if self.real_keys:
+            public_pem, private_encrypted, _, _, private_key = generate_document_keys(SENHA_PADRAO)
+            signer = Signer(private_key, hash_algorithm=HASH_ALGORITHM)
+        else:
+            key = self.rng.choice(self.key_pool.keys)
+            signer, public_pem, private_encrypted = key["signer"], key["public_pem"], key["private_encrypted"]
+        return SignedContent(content, signer, public_pem, private_encrypted)
+
+    def next(self):
+        return self.rng.choice(self.pool) if self.pool else self._new_content()
+
+def _bulk_pragmas(conn):
+    # Geração em massa: sem fsync a cada transação (o banco é descartável até o fim)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA cache_size = -200000")
+
+def create_users(conn, count, batch_size=10000):
+    """
+    Cria usuários verificados em lote. O hash bcrypt da senha padrão é
+    calculado uma vez e compartilhado, pois o bcrypt domina o custo do cadastro.
+
+    Returns:
+        list: IDs de todos os usuários de carga
+    """
+    senha_hash = bcrypt.hashpw(SENHA_PADRAO.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    start = conn.execute("SELECT COUNT(*) FROM users WHERE email LIKE 'carga%@teste.com'").fetchone()[0]
+    for first in range(start, count, batch_size):
+        rows = [(f"Usuário Carga {i}", f"carga{i}@teste.com", senha_hash)
+                for i in range(first, min(first + batch_size, count))]
+        conn.executemany("INSERT OR IGNORE INTO users (nome, email, senha_hash, email_verified) VALUES (?, ?, ?, 1)", rows)
+        conn.commit()
+    return [row[0] for row in conn.execute("SELECT user_id FROM users WHERE email LIKE 'carga%@teste.com' ORDER BY user_id")]
+
+def create_documents(conn, rng, user_ids, count, factory, skew=1.0, days=365, batch_size=5000, progress=None):
+    """
+    Insere documentos em lote, com remetentes e destinatários sorteados com skew Zipf.
+
+    Returns:
+        list: Tuplas (document_id, receiver_id, created_at) dos documentos criados
+    """
+    if len(user_ids) < 2:
+        raise ValueError("São necessários pelo menos dois usuários")
+    cum_weights = zipf_cum_weights(len(user_ids), skew)
+    # Usuários "populares" não devem ser sempre os de menor ID
+    ranked = user_ids[:]
+    rng.shuffle(ranked)
+    now = datetime.now()
+    placeholders = ", ".join("?" * len(DOCUMENT_COLUMNS))
+    sql = f"INSERT INTO documents ({', '.join(DOCUMENT_COLUMNS)}) VALUES ({placeholders})"
+
+    created = []
+    for first in range(0, count, batch_size):
+        rows = []
+        for i in range(first, min(first + batch_size, count)):
+            sender, receiver = rng.choices(ranked, cum_weights=cum_weights, k=2)
+            while receiver == sender:
+                receiver = rng.choices(ranked, cum_weights=cum_weights)[0]
+            signed = factory.next()
+            document_id = str(uuid.uuid4())
+            created_at = now - timedelta(seconds=rng.random() * days * 86400)
+            rows.append((document_id, sender, receiver, f"documento_{i}.dat", signed.stored,
+                         signed.document_hash, signed.public_pem, signed.private_encrypted, signed.signature,
+                         "sent", created_at, signed.codec, signed.content_type, HASH_ALGORITHM, "flat"))
+            created.append((document_id, receiver, created_at))
+        conn.executemany(sql, rows)
+        conn.commit()
+        if progress:
+            progress(len(created), count)
+    return created
+
+def create_verifications(conn, rng, documents, count, rejected_fraction=0.05, batch_size=10000):
+    """Registra verificações (status do documento e log) para documentos sorteados"""
+    now = datetime.now()
+    for first in range(0, count, batch_size):
+        updates = []
+        logs = []
+        for _ in range(first, min(first + batch_size, count)):
+            document_id, receiver_id, created_at = rng.choice(documents)
+            verified_at = created_at + (now - created_at) * rng.random()
+            if rng.random() < rejected_fraction:
+                status, error = "rejected", "Documento foi alterado após a assinatura"
+            else:
+                status, error = "verified", None
+            updates.append((status, verified_at, document_id))
+            logs.append((document_id, receiver_id, status, error, verified_at))
+        conn.executemany("UPDATE documents SET status = ?, verified_at = ? WHERE document_id = ?", updates)
+        conn.executemany("""
+            INSERT INTO verification_logs (document_id, verifier_id, result, error_message, verified_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, logs)
+        conn.commit()
+
+def generate_load(users, documents, verifications, seed=42, skew=1.0, distribution="lognormal",
+                  mean_size=4096, max_size=1024 * 1024, binary_fraction=0.2, key_pool=16,
+                  content_pool=256, real_keys=False, days=365, verbose=True):
+    """
+    Popula o banco configurado em database.DATABASE_NAME.
+
+    Returns:
+        dict: Quantidades criadas e tempo de cada etapa
+    """
+    rng = random.Random(seed)
+    database.create_tables()
+    conn = database.get_db_connection()
+    _bulk_pragmas(conn)
+    timings = {}
+    report = (lambda done, total: print(f"  {done}/{total} documentos", end="\r")) if verbose else None
+    try:
+        start = time.perf_counter()
+        user_ids = create_users(conn, users)
+        timings["usuarios_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        factory = ContentFactory(rng, key_pool, 0 if real_keys else content_pool, distribution,
+                                 mean_size, max_size, binary_fraction, real_keys)
+        timings["material_criptografico_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        created = create_documents(conn, rng, user_ids, documents, factory, skew, days, progress=report)
+        timings["documentos_s"] = time.perf_counter() - start
+        if verbose and documents:
+            print()
+
+        start = time.perf_counter()
+        if created and verifications:
+            create_verifications(conn, rng, created, verifications)
+        timings["verificacoes_s"] = time.perf_counter() - start
+    finally:
+        conn.close()
+    return {"usuarios": len(user_ids), "documentos": len(created), "verificacoes": verifications if created else 0,
+            **timings}
+
+# ---------------------------------------------------------------------------
+# Reprodução de carga mista sobre um banco já populado
+# ---------------------------------------------------------------------------
+
+OPERATIONS = ("enviados", "recebidos", "estatisticas", "detalhes", "historico", "usuarios", "verificar", "inserir")
+
+def parse_mix(text):
+    """Converte "recebidos=40,verificar=20" em pesos por operação"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Operação desconhecida: {name} (opções: {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+def _sample_documents(conn, rng, count):
+    """Sorteia documentos existentes por rowid, sem carregar a tabela inteira"""
+    max_rowid = conn.execute("SELECT MAX(rowid) FROM documents").fetchone()[0] or 0
+    if not max_rowid:
+        return []
+    rowids = [rng.randint(1, max_rowid) for _ in range(count)]
+    rows = []
+    for first in range(0, len(rowids), 500):
+        chunk = rowids[first:first + 500]
+        rows.extend(conn.execute(
+            f"SELECT document_id, receiver_id FROM documents WHERE rowid IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall())
+    return [(row["document_id"], row["receiver_id"]) for row in rows]
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, elapsed):
+    """p50/p99/média (ms) e vazão de cada operação"""
+    summary = {}
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        summary[name] = {
+            "operacoes": len(values),
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "media_ms": sum(values) / len(values) * 1000,
+            "ops_por_s": len(values) / sum(values) if sum(values) else None,
+        }
+    summary["total"] = {"operacoes": sum(len(v) for v in latencies.values()), "duracao_s": elapsed,
+                        "ops_por_s": sum(len(v) for v in latencies.values()) / elapsed if elapsed else None}
+    return summary
+
+def run_workload(operations, mix, seed=7, content_pool=32):
+    """
+    Executa uma sequência de operações sorteadas pelos pesos de `mix`, usando as
+    funções do sistema (document_manager e auth) sobre o banco configurado.
+
+    Returns:
+        dict: Resumo por operação (ver summarize)
+    """
+    rng = random.Random(seed)
+    conn = database.get_db_connection()
+    try:
+        user_ids = [row[0] for row in conn.execute("SELECT user_id FROM users")]
+        documents = _sample_documents(conn, rng, min(operations, 100000))
+    finally:
+        conn.close()
+    if len(user_ids) < 2 or not documents:
+        raise ValueError("Banco sem usuários ou documentos; rode o subcomando 'gerar' antes")
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    factory = None
+    if "inserir" in mix:
+        factory = ContentFactory(rng, 2, content_pool, "lognormal", 4096, 1024 * 1024, 0.2)
+
+    latencies = {name: [] for name in names}
+    started = time.perf_counter()
+    # As funções do sistema imprimem o progresso (ex.: "Verificando assinatura...")
+    with contextlib.redirect_stdout(io.StringIO()):
+        _replay(operations, rng, names, weights, documents, user_ids, factory, latencies)
+    return summarize(latencies, time.perf_counter() - started)
+
+def _replay(operations, rng, names, weights, documents, user_ids, factory, latencies):
+    import auth
+    import document_manager
+
+    for _ in range(operations):
+        name = rng.choices(names, weights)[0]
+        document_id, receiver_id = rng.choice(documents)
+        user_id = rng.choice(user_ids)
+        start = time.perf_counter()
+        if name == "enviados":
+            document_manager.get_sent_documents(user_id)
+        elif name == "recebidos":
+            document_manager.get_received_documents(user_id)
+        elif name == "estatisticas":
+            document_manager.get_document_statistics(user_id)
+        elif name == "detalhes":
+            document_manager.get_document_details(document_id, receiver_id)
+        elif name == "historico":
+            document_manager.get_verification_history(document_id, receiver_id)
+        elif name == "usuarios":
+            auth.get_all_users_except_current(user_id)
+        elif name == "verificar":
+            document_manager.verify_document(document_id, receiver_id)
+        elif name == "inserir":
+            conn = database.get_db_connection()
+            try:
+                create_documents(conn, rng, user_ids, 1, factory, batch_size=1)
+            finally:
+                conn.close()
+        latencies[name].append(time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga sintética")
+    parser.add_argument("--banco", default=database.DATABASE_NAME, help="Arquivo do banco SQLite")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_gen = subparsers.add_parser("gerar", help="Popula o banco com usuários, documentos e verificações")
+    p_gen.add_argument("--usuarios", type=int, default=1000)
+    p_gen.add_argument("--documentos", type=int, default=10000)
+    p_gen.add_argument("--verificacoes", type=int, default=2000)
+    p_gen.add_argument("--distribuicao", choices=("fixo", "lognormal", "pareto"), default="lognormal",
+                       help="Distribuição do tamanho dos documentos")
+    p_gen.add_argument("--tamanho-medio", type=int, default=4096, help="Tamanho médio em bytes")
+    p_gen.add_argument("--tamanho-maximo", type=int, default=1024 * 1024, help="Tamanho máximo em bytes")
+    p_gen.add_argument("--fracao-binaria", type=float, default=0.2, help="Fração de documentos binários")
+    p_gen.add_argument("--skew", type=float, default=1.0,
+                       help="Expoente Zipf da escolha de remetentes/destinatários (0 = uniforme)")
+    p_gen.add_argument("--dias", type=int, default=365, help="Espalha created_at pelos últimos N dias")
+    p_gen.add_argument("--chaves", type=int, default=16, help="Pares de chaves pré-gerados")
+    p_gen.add_argument("--conteudos", type=int, default=256,
+                       help="Conteúdos pré-assinados compartilhados (0 = conteúdo único por documento)")
+    p_gen.add_argument("--chaves-reais", action="store_true",
+                       help="Gera um par de chaves por documento, como o sistema (lento)")
+    p_gen.add_argument("--semente", type=int, default=42)
+
+    p_load = subparsers.add_parser("carga", help="Reproduz uma carga mista de leitura/escrita")
+    p_load.add_argument("--operacoes", type=int, default=1000)
+    p_load.add_argument("--mistura", default="recebidos=30,enviados=15,estatisticas=15,detalhes=15,"
+                                             "historico=10,verificar=10,inserir=5",
+                        help=f"Pesos por operação ({', '.join(OPERATIONS)})")
+    p_load.add_argument("--semente", type=int, default=7)
+    p_load.add_argument("--saida", help="Grava o resumo em JSON neste arquivo")
+
+    args = parser.parse_args()
+    database.DATABASE_NAME = args.banco
+
+    if args.comando == "gerar":
+        result = generate_load(args.usuarios, args.documentos, args.verificacoes, args.semente, args.skew,
+                               args.distribuicao, args.tamanho_medio, args.tamanho_maximo, args.fracao_binaria,
+                               args.chaves, args.conteudos, args.chaves_reais, args.dias)
+        print(json.dumps(result, indent=2))
+        print(f"Senha de todos os usuários de carga: {SENHA_PADRAO}")
+    else:
+        database.create_tables()
+        result = run_workload(args.operacoes, parse_mix(args.mistura), args.semente)
+        print(json.dumps(result, indent=2))
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
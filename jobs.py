@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+"""
+Fila de tarefas longas com retomada a partir de checkpoints.
+
+Assinaturas em lote, verificações em lote, arquivamento e conferência de
+integridade podem levar horas; aqui elas viram tarefas gravadas na tabela
+jobs e executadas por um pool de processos workers, fora do menu.
+
+- Cada tipo de tarefa tem um handler (registrado com @handler) que grava o
+  ponto de retomada em job_checkpoints enquanto avança. Se o worker cair, a
+  tarefa volta para a fila (pelo heartbeat parado há mais de
+  JOB_STALE_SECONDS) e o próximo worker continua do último checkpoint.
+- Os handlers são idempotentes: o item que estava em andamento durante uma
+  interrupção é conferido no banco antes de ser refeito (documento já gravado,
+  verificação já registrada).
+- O progresso (feitos/total) fica em jobs e aparece em "status".
+- "cancelar" marca a tarefa; o handler para no próximo checkpoint. Encerrar os
+  workers (Ctrl+C/SIGTERM) devolve as tarefas em andamento para a fila.
+
+A senha dos remetentes nunca é gravada na fila: o worker a pede ao iniciar
+(--remetentes), ou lê de JOBS_PASSWORD quando há um único remetente.
+
+Uso:
+    python jobs.py assinar --remetente EMAIL --destinatarios EMAIL [EMAIL ...] CAMINHO [CAMINHO ...] [--destacada]
+    python jobs.py verificar --verificador EMAIL [--ids ID ...]
+    python jobs.py arquivar [--dias N] [--lote N]
+    python jobs.py integridade [--lote N]
+    python jobs.py trabalhar [--processos N] [--remetentes EMAIL ...] [--ate-esvaziar]
+    python jobs.py status [JOB_ID]
+    python jobs.py cancelar JOB_ID
+    python jobs.py retomar JOB_ID
+"""
+import argparse
+import base64
+import contextlib
+import getpass
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from database import get_db_connection
+from config import JOB_STALE_SECONDS, JOB_POLL_INTERVAL, ARCHIVE_AFTER_DAYS
+from archive import archive_documents
+from compression import decompress_payload
+from crypto.signature import hash_content, hash_file
+from crypto.merkle import leaf_hashes, leaf_hashes_from_file, merkle_root
+from document_manager import sign_and_send_file, verify_document, find_documents_by_content
+
+# Máximo de ids listados no resultado da conferência de integridade
+MAX_LISTED = 1000
+
+class JobCancelled(Exception):
+    """Cancelamento pedido com "cancelar": a tarefa termina como 'cancelled'"""
+
+class JobInterrupted(Exception):
+    """
+    Worker encerrando, ou tarefa devolvida à fila por heartbeat parado e pega
+    por outro worker: esta execução para e a tarefa é retomada do último checkpoint
+    """
+
+HANDLERS = {}
+
+def handler(kind):
+    """Registra a função como handler das tarefas do tipo kind"""
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+class Job:
+    """Tarefa em execução, como vista pelo handler: parâmetros, checkpoint, progresso e cancelamento"""
+
+    def __init__(self, conn, row, stop, passwords):
+        self.job_id = row["job_id"]
+        self.kind = row["kind"]
+        # Dono desta execução: se a tarefa for devolvida à fila e pega de novo,
+        # worker/attempts mudam e as gravações desta execução deixam de valer
+        self.worker = row["worker"]
+        self.attempts = row["attempts"]
+        self.params = json.loads(row["params"])
+        self.passwords = passwords
+        self._conn = conn
+        self._stop = stop
+        checkpoint = conn.execute("SELECT state FROM job_checkpoints WHERE job_id = ?", (self.job_id,)).fetchone()
+        self.state = json.loads(checkpoint["state"]) if checkpoint else None
+
+    def checkpoint(self, state, done=None, total=None):
+        """
+        Grava o ponto de retomada e, se informado, o progresso, na mesma
+        transação que confirma que esta execução ainda é dona da tarefa.
+
+        Raises:
+            JobInterrupted: se a tarefa foi devolvida à fila e pega por outro worker
+        """
+        now = datetime.now()
+        cursor = self._conn.execute("""
+            UPDATE jobs SET progress_done = COALESCE(?, progress_done),
+                            progress_total = COALESCE(?, progress_total), heartbeat_at = ?
+            WHERE job_id = ? AND status = 'running' AND worker = ? AND attempts = ?
+        """, (done, total if done is not None else None, now, self.job_id, self.worker, self.attempts))
+        if not cursor.rowcount:
+            self._conn.rollback()
+            raise JobInterrupted()
+        self._conn.execute("INSERT OR REPLACE INTO job_checkpoints (job_id, state, updated_at) VALUES (?, ?, ?)",
+                           (self.job_id, json.dumps(state), now))
+        self._conn.commit()
+        self.state = state
+
+    def _owned(self, row):
+        return row is not None and row["status"] == "running" and \
+            (row["worker"], row["attempts"]) == (self.worker, self.attempts)
+
+    def should_stop(self):
+        """True se o cancelamento foi pedido, o worker está encerrando ou a tarefa passou para outro worker"""
+        if self._stop.is_set():
+            return True
+        row = self._conn.execute("SELECT cancel_requested, status, worker, attempts FROM jobs WHERE job_id = ?",
+                                 (self.job_id,)).fetchone()
+        return not self._owned(row) or bool(row["cancel_requested"])
+
+    def check(self):
+        """Interrompe o handler (entre dois checkpoints) se a tarefa deve parar"""
+        if self._stop.is_set():
+            raise JobInterrupted()
+        row = self._conn.execute("SELECT cancel_requested, status, worker, attempts FROM jobs WHERE job_id = ?",
+                                 (self.job_id,)).fetchone()
+        if not self._owned(row):
+            raise JobInterrupted()
+        if row["cancel_requested"]:
+            raise JobCancelled()
+
+def enqueue(kind, params):
+    """
+    Coloca uma tarefa na fila.
+
+    Returns:
+        int: job_id
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {kind}")
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("INSERT INTO jobs (kind, params) VALUES (?, ?)", (kind, json.dumps(params)))
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+def cancel_job(job_id):
+    """
+    Cancela uma tarefa: na fila, na hora; em execução, no próximo checkpoint.
+
+    Returns:
+        tuple: (sucesso, mensagem)
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'pending'",
+                              (datetime.now(), job_id))
+        if cursor.rowcount:
+            conn.commit()
+            return True, f"Tarefa {job_id} cancelada."
+        cursor = conn.execute("UPDATE jobs SET cancel_requested = TRUE WHERE job_id = ? AND status = 'running'", (job_id,))
+        conn.commit()
+        if cursor.rowcount:
+            return True, f"Cancelamento pedido: a tarefa {job_id} para no próximo checkpoint."
+        return False, f"Tarefa {job_id} não encontrada ou já encerrada."
+    finally:
+        conn.close()
+
+def requeue_job(job_id):
+    """
+    Devolve uma tarefa falha ou cancelada para a fila; ela continua do último checkpoint.
+
+    Returns:
+        tuple: (sucesso, mensagem)
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            UPDATE jobs SET status = 'pending', cancel_requested = FALSE, error_message = NULL, finished_at = NULL
+            WHERE job_id = ? AND status IN ('failed', 'cancelled')
+        """, (job_id,))
+        conn.commit()
+        if cursor.rowcount:
+            return True, f"Tarefa {job_id} de volta na fila."
+        return False, f"Tarefa {job_id} não encontrada, ou não está falha nem cancelada."
+    finally:
+        conn.close()
+
+def get_jobs(job_id=None, limit=20):
+    """Tarefas mais recentes (ou uma tarefa), com parâmetros, checkpoint e resultado decodificados"""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(f"""
+            SELECT j.*, c.state FROM jobs j LEFT JOIN job_checkpoints c ON c.job_id = j.job_id
+            {"WHERE j.job_id = ?" if job_id is not None else ""}
+            ORDER BY j.job_id DESC LIMIT ?
+        """, ((job_id,) if job_id is not None else ()) + (limit,)).fetchall()
+    finally:
+        conn.close()
+    jobs = []
+    for row in rows:
+        job = dict(row)
+        for field in ("params", "state", "result"):
+            job[field] = json.loads(job[field]) if job[field] else None
+        jobs.append(job)
+    return jobs
+
+def _claim_job(conn, worker_name):
+    """Pega a próxima tarefa da fila, devolvendo antes as abandonadas por workers encerrados"""
+    now = datetime.now()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("UPDATE jobs SET status = 'pending', worker = NULL WHERE status = 'running' AND heartbeat_at < ?",
+                     (now - timedelta(seconds=JOB_STALE_SECONDS),))
+        row = conn.execute("SELECT job_id FROM jobs WHERE status = 'pending' ORDER BY job_id LIMIT 1").fetchone()
+        if row is not None:
+            conn.execute("""
+                UPDATE jobs SET status = 'running', worker = ?, heartbeat_at = ?, attempts = attempts + 1,
+                                started_at = COALESCE(started_at, ?)
+                WHERE job_id = ?
+            """, (worker_name, now, now, row["job_id"]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if row is None:
+        return None
+    return conn.execute("SELECT * FROM jobs WHERE job_id = ?", (row["job_id"],)).fetchone()
+
+def _heartbeat(job, finished):
+    """Atualiza heartbeat_at enquanto a tarefa roda, mesmo durante itens demorados"""
+    conn = get_db_connection()
+    try:
+        while not finished.wait(JOB_STALE_SECONDS / 3):
+            try:
+                conn.execute("""
+                    UPDATE jobs SET heartbeat_at = ?
+                    WHERE job_id = ? AND status = 'running' AND worker = ? AND attempts = ?
+                """, (datetime.now(), job.job_id, job.worker, job.attempts))
+                conn.commit()
+            except sqlite3.OperationalError:
+                # Banco ocupado: tenta de novo na próxima batida
+                conn.rollback()
+    finally:
+        conn.close()
+
+def run_job(conn, row, stop, passwords=None):
+    """
+    Executa uma tarefa já marcada como 'running' e grava o desfecho.
+
+    Returns:
+        str: Status final ('done', 'failed', 'cancelled' ou 'pending' se interrompida),
+             ou 'lost' se a tarefa passou para outro worker (nada é gravado)
+    """
+    job = Job(conn, row, stop, passwords or {})
+    finished = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job, finished), daemon=True)
+    beat.start()
+    result = error = None
+    try:
+        # Os handlers chamam funções do menu que imprimem o andamento; o log do worker fica limpo
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = HANDLERS[job.kind](job)
+        status = "done"
+    except JobCancelled:
+        status = "cancelled"
+    except JobInterrupted:
+        status = "pending"
+    except Exception as e:
+        status, error = "failed", str(e) or type(e).__name__
+    finally:
+        finished.set()
+        beat.join()
+
+    conn.rollback()
+    cursor = conn.execute("""
+        UPDATE jobs SET status = ?, result = ?, error_message = ?, worker = NULL,
+                        finished_at = CASE WHEN ? = 'pending' THEN NULL ELSE ? END
+        WHERE job_id = ? AND status = 'running' AND worker = ? AND attempts = ?
+    """, (status, json.dumps(result) if result is not None else None, error, status, datetime.now(),
+          job.job_id, job.worker, job.attempts))
+    conn.commit()
+    # Heartbeat parado e tarefa pega por outro worker: o desfecho é o do novo dono
+    return status if cursor.rowcount else "lost"
+
+def _log(message):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+def _worker_loop(worker_name, passwords, stop, until_empty):
+    # Ctrl+C chega a todo o grupo de processos: quem sinaliza o encerramento é o processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    conn = get_db_connection()
+    try:
+        while not stop.is_set():
+            row = _claim_job(conn, worker_name)
+            if row is None:
+                if until_empty:
+                    break
+                stop.wait(JOB_POLL_INTERVAL)
+                continue
+            _log(f"{worker_name}: tarefa {row['job_id']} ({row['kind']}) iniciada")
+            status = run_job(conn, row, stop, passwords)
+            _log(f"{worker_name}: tarefa {row['job_id']} ({row['kind']}) -> {status}")
+    finally:
+        conn.close()
+
+def work(workers=2, passwords=None, until_empty=False):
+    """
+    Roda um pool de processos workers até Ctrl+C/SIGTERM (ou até a fila esvaziar).
+    No encerramento, as tarefas em andamento voltam para a fila no próximo checkpoint.
+    """
+    stop = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=_worker_loop, args=(f"{socket.gethostname()}:{os.getpid()}-{n}",
+                                                           passwords or {}, stop, until_empty))
+        for n in range(workers)
+    ]
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+# ---------------------------------------------------------------------------
+# Handlers
+
+@handler("sign_files")
+def _sign_files(job):
+    """
+    Assina e envia cada arquivo de params["paths"]. O checkpoint marca o item em
+    andamento e quando ele começou; na retomada, se o documento desse item já
+    estiver gravado (mesmo conteúdo, enviado depois da marcação), ele não é
+    assinado de novo.
+    """
+    params = job.params
+    password = job.passwords.get(params["sender_email"])
+    if password is None:
+        raise ValueError(f"Senha de {params['sender_email']} não informada ao worker (--remetentes)")
+    paths = params["paths"]
+    receivers = [tuple(receiver) for receiver in params["receivers"]]
+    state = job.state or {"next": 0, "since": None, "signed": 0, "errors": []}
+
+    current = state["next"]
+    if state["since"] and current < len(paths) and os.path.isfile(paths[current]):
+        documents, _ = find_documents_by_content(params["sender_id"], paths[current])
+        if any(document["role"] == "sent" and str(document["created_at"]) >= state["since"] for document in documents):
+            state.update(next=current + 1, signed=state["signed"] + 1)
+
+    for index in range(state["next"], len(paths)):
+        state.update(next=index, since=str(datetime.now()))
+        job.checkpoint(state, index, len(paths))
+        job.check()
+        success, message, _ = sign_and_send_file(params["sender_id"], params["sender_email"], receivers,
+                                                 paths[index], password, detached=params.get("detached", False))
+        if success:
+            state["signed"] += 1
+        else:
+            state["errors"].append({"arquivo": paths[index], "erro": message})
+
+    state.update(next=len(paths), since=None)
+    job.checkpoint(state, len(paths), len(paths))
+    return {"assinados": state["signed"], "erros": state["errors"]}
+
+# Documentos recebidos pelo verificador (diretos ou por entrega) ainda não verificados
+_PENDING_FOR_VERIFIER = """
+    (d.receiver_id = :verifier AND COALESCE(d.delivery_mode, 'direct') != 'fanout' AND d.status = 'sent')
+    OR EXISTS (SELECT 1 FROM document_deliveries dd
+               WHERE dd.document_id = d.document_id AND dd.receiver_id = :verifier AND dd.status = 'sent')
+"""
+
+def _pending_verifications(conn, verifier_id, after, document_ids, limit):
+    """Próximos documentos a verificar, em ordem de document_id"""
+    if document_ids is not None:
+        return [document_id for document_id in document_ids if document_id > after][:limit]
+    return [row[0] for row in conn.execute(f"""
+        SELECT d.document_id FROM documents d
+        WHERE d.document_id > :after AND ({_PENDING_FOR_VERIFIER})
+        ORDER BY d.document_id LIMIT :limit
+    """, {"after": after, "verifier": verifier_id, "limit": limit})]
+
+@handler("verify_documents")
+def _verify_documents(job, batch_size=100):
+    """
+    Verifica os documentos de params["document_ids"] ou, sem a lista, os
+    recebidos pelo verificador ainda não verificados. O checkpoint guarda o
+    último document_id processado; um documento que já tem verificação deste
+    verificador desde o início da tarefa não é verificado de novo.
+    """
+    verifier_id = job.params["verifier_id"]
+    document_ids = sorted(job.params["document_ids"]) if job.params.get("document_ids") else None
+    conn = get_db_connection()
+    try:
+        state = job.state
+        if state is None:
+            if document_ids is not None:
+                total = len(document_ids)
+            else:
+                total = conn.execute(f"SELECT COUNT(*) FROM documents d WHERE {_PENDING_FOR_VERIFIER}",
+                                     {"verifier": verifier_id}).fetchone()[0]
+            state = {"after": "", "since": str(datetime.now()), "total": total, "done": 0,
+                     "valid": 0, "invalid": 0, "skipped": 0}
+            job.checkpoint(state, 0, total)
+
+        while True:
+            job.check()
+            batch = _pending_verifications(conn, verifier_id, state["after"], document_ids, batch_size)
+            if not batch:
+                break
+            for document_id in batch:
+                already = conn.execute("""
+                    SELECT 1 FROM verification_logs WHERE document_id = ? AND verifier_id = ? AND verified_at >= ?
+                """, (document_id, verifier_id, state["since"])).fetchone()
+                if already:
+                    state["skipped"] += 1
+                else:
+                    success, _ = verify_document(document_id, verifier_id)
+                    state["valid" if success else "invalid"] += 1
+                state["done"] += 1
+            state["after"] = batch[-1]
+            job.checkpoint(state, state["done"], state["total"])
+    finally:
+        conn.close()
+    return {"verificados": state["done"], "validos": state["valid"], "invalidos": state["invalid"],
+            "ja_verificados": state["skipped"]}
+
+def _run_moved(run_id):
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT moved_count FROM archive_runs WHERE run_id = ?", (run_id,)).fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+@handler("archive")
+def _archive(job):
+    """
+    Arquivamento (archive.archive_documents) com o run_id no checkpoint: a
+    retomada continua a mesma execução, com o mesmo limite de data. O progresso
+    é o moved_count da execução, que já conta os lotes de tentativas anteriores.
+    """
+    state = job.state or {"run_id": None}
+
+    def progress(run_id, moved):
+        job.checkpoint({"run_id": run_id}, _run_moved(run_id))
+
+    archive_documents(job.params.get("days", ARCHIVE_AFTER_DAYS), job.params.get("batch_size", 500),
+                      state["run_id"], progress, job.should_stop)
+    job.check()
+    run_id = job.state["run_id"]
+    return {"movidos": _run_moved(run_id), "run_id": run_id}
+
+def _stored_digest(row):
+    """Recalcula o document_hash a partir do conteúdo armazenado (ou do arquivo, se destacado)"""
+    hash_algorithm = row["hash_algorithm"] or "SHA3-256"
+    merkle = row["digest_mode"] == "merkle"
+    if row["storage_mode"] == "detached":
+        if not row["file_path"] or not os.path.isfile(row["file_path"]):
+            return None
+        if merkle:
+            digest = merkle_root(leaf_hashes_from_file(row["file_path"], row["chunk_size"], hash_algorithm), hash_algorithm)
+        else:
+            digest = hash_file(row["file_path"], hash_algorithm)
+    else:
+        content = decompress_payload(row["document_content"], row["content_codec"])
+        if merkle:
+            digest = merkle_root(leaf_hashes(content, row["chunk_size"], hash_algorithm), hash_algorithm)
+        else:
+            digest = hash_content(content, hash_algorithm)
+    return base64.b64encode(digest).decode()
+
+@handler("rehash")
+def _rehash(job, batch_size=200):
+    """
+    Conferência de integridade: recalcula o hash de cada documento do banco
+    principal e compara com o document_hash assinado, sem verificar as
+    assinaturas. Só leitura; o checkpoint guarda o último search_rowid conferido
+    (estável, ao contrário do rowid implícito de documents).
+    """
+    batch_size = job.params.get("batch_size", batch_size)
+    conn = get_db_connection()
+    try:
+        state = job.state
+        if state is None:
+            total = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            state = {"after": 0, "total": total, "done": 0, "altered": 0, "missing": 0, "altered_ids": [], "missing_ids": []}
+            job.checkpoint(state, 0, total)
+
+        while True:
+            job.check()
+            rows = conn.execute("""
+                SELECT search_rowid, document_id, document_content, content_codec, document_hash, hash_algorithm,
+                       digest_mode, chunk_size, storage_mode, file_path
+                FROM documents WHERE search_rowid > ? ORDER BY search_rowid LIMIT ?
+            """, (state["after"], batch_size)).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                digest = _stored_digest(row)
+                if digest is None:
+                    state["missing"] += 1
+                    if len(state["missing_ids"]) < MAX_LISTED:
+                        state["missing_ids"].append(row["document_id"])
+                elif digest != row["document_hash"]:
+                    state["altered"] += 1
+                    if len(state["altered_ids"]) < MAX_LISTED:
+                        state["altered_ids"].append(row["document_id"])
+            state["done"] += len(rows)
+            state["after"] = rows[-1]["search_rowid"]
+            job.checkpoint(state, state["done"], max(state["total"], state["done"]))
+    finally:
+        conn.close()
+    return {"conferidos": state["done"], "alterados": state["altered"], "arquivos_ausentes": state["missing"],
+            "ids_alterados": state["altered_ids"], "ids_ausentes": state["missing_ids"]}
+
+# ---------------------------------------------------------------------------
+# Linha de comando
+
+def _resolve_users(emails):
+    """user_id dos usuários verificados, por email"""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(f"""
+            SELECT email, user_id FROM users WHERE email IN ({",".join("?" * len(emails))}) AND email_verified = TRUE
+        """, emails).fetchall()
+    finally:
+        conn.close()
+    return {row["email"]: row["user_id"] for row in rows}
+
+def _expand_paths(paths):
+    """Arquivos informados e os arquivos (não ocultos) dos diretórios informados"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if not name.startswith(".") and os.path.isfile(os.path.join(path, name)))
+        else:
+            files.append(path)
+    return [os.path.abspath(path) for path in files]
+
+def _print_job(job):
+    total = f"/{job['progress_total']}" if job["progress_total"] is not None else ""
+    print(f"  #{job['job_id']} {job['kind']} {job['status']} {job['progress_done']}{total} "
+          f"tentativas={job['attempts']} criada={job['created_at']}"
+          + (" (cancelamento pedido)" if job["cancel_requested"] and job["status"] == "running" else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description="Fila de tarefas longas com retomada")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    p_sign = subparsers.add_parser("assinar", help="Enfileira a assinatura e envio de arquivos")
+    p_sign.add_argument("caminhos", nargs="+", help="Arquivos ou diretórios")
+    p_sign.add_argument("--remetente", required=True, help="Email do remetente")
+    p_sign.add_argument("--destinatarios", nargs="+", required=True, help="Emails dos destinatários")
+    p_sign.add_argument("--destacada", action="store_true", help="Assinatura destacada")
+
+    p_verify = subparsers.add_parser("verificar", help="Enfileira a verificação de documentos")
+    p_verify.add_argument("--verificador", required=True, help="Email de quem verifica")
+    p_verify.add_argument("--ids", nargs="+", help="Documentos (padrão: os recebidos ainda não verificados)")
+
+    p_archive = subparsers.add_parser("arquivar", help="Enfileira o arquivamento de documentos antigos")
+    p_archive.add_argument("--dias", type=int, default=ARCHIVE_AFTER_DAYS, help="Idade mínima em dias desde a verificação")
+    p_archive.add_argument("--lote", type=int, default=500, help="Documentos por transação")
+
+    p_rehash = subparsers.add_parser("integridade", help="Enfileira a conferência dos hashes armazenados")
+    p_rehash.add_argument("--lote", type=int, default=200, help="Documentos por checkpoint")
+
+    p_work = subparsers.add_parser("trabalhar", help="Executa as tarefas da fila")
+    p_work.add_argument("--processos", type=int, default=2, help="Processos workers")
+    p_work.add_argument("--remetentes", nargs="+", default=[], help="Remetentes cujas senhas o worker pede (tarefas de assinatura)")
+    p_work.add_argument("--ate-esvaziar", action="store_true", help="Encerra quando não houver tarefas na fila")
+
+    p_status = subparsers.add_parser("status", help="Mostra as tarefas recentes ou uma tarefa")
+    p_status.add_argument("job_id", type=int, nargs="?")
+
+    p_cancel = subparsers.add_parser("cancelar", help="Cancela uma tarefa")
+    p_cancel.add_argument("job_id", type=int)
+
+    p_requeue = subparsers.add_parser("retomar", help="Devolve uma tarefa falha ou cancelada para a fila")
+    p_requeue.add_argument("job_id", type=int)
+
+    args = parser.parse_args()
+    database.create_tables()
+
+    if args.comando == "assinar":
+        emails = list(dict.fromkeys(args.destinatarios))
+        users = _resolve_users([args.remetente] + emails)
+        missing = [email for email in [args.remetente] + emails if email not in users]
+        if missing:
+            print(f"❌ Usuário(s) não cadastrado(s) ou não verificado(s): {', '.join(missing)}")
+            sys.exit(1)
+        paths = _expand_paths(args.caminhos)
+        job_id = enqueue("sign_files", {
+            "sender_id": users[args.remetente], "sender_email": args.remetente,
+            "receivers": [(users[email], email) for email in emails], "paths": paths, "detached": args.destacada,
+        })
+        print(f"Tarefa {job_id} enfileirada: {len(paths)} arquivo(s).")
+    elif args.comando == "verificar":
+        users = _resolve_users([args.verificador])
+        if args.verificador not in users:
+            print(f"❌ Usuário não cadastrado ou não verificado: {args.verificador}")
+            sys.exit(1)
+        job_id = enqueue("verify_documents", {"verifier_id": users[args.verificador], "document_ids": args.ids})
+        print(f"Tarefa {job_id} enfileirada.")
+    elif args.comando == "arquivar":
+        job_id = enqueue("archive", {"days": args.dias, "batch_size": args.lote})
+        print(f"Tarefa {job_id} enfileirada.")
+    elif args.comando == "integridade":
+        job_id = enqueue("rehash", {"batch_size": args.lote})
+        print(f"Tarefa {job_id} enfileirada.")
+    elif args.comando == "trabalhar":
+        passwords = {}
+        if len(args.remetentes) == 1 and os.environ.get("JOBS_PASSWORD"):
+            passwords[args.remetentes[0]] = os.environ["JOBS_PASSWORD"]
+        else:
+            for email in args.remetentes:
+                passwords[email] = getpass.getpass(f"Senha de {email}: ")
+        _log(f"{args.processos} worker(s) iniciado(s)")
+        work(args.processos, passwords, args.ate_esvaziar)
+        _log("Workers encerrados.")
+    elif args.comando == "status":
+        jobs = get_jobs(args.job_id)
+        if not jobs:
+            print("Nenhuma tarefa encontrada.")
+            return
+        print("Tarefas:")
+        for job in jobs:
+            _print_job(job)
+        if args.job_id is not None:
+            job = jobs[0]
+            print(json.dumps({"params": job["params"], "checkpoint": job["state"], "resultado": job["result"],
+                              "erro": job["error_message"]}, indent=2, ensure_ascii=False))
+    else:
+        success, message = (cancel_job if args.comando == "cancelar" else requeue_job)(args.job_id)
+        print(("✅ " if success else "❌ ") + message)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Auditoria de chaves RSA fracas por MDC em lote (batch GCD).
+
+Duas chaves cujos módulos compartilham um primo (RNG com pouca entropia, bug em
+generate_prime) são fatoradas por um simples gcd(n1, n2). Comparar todos os
+pares custa O(n²); aqui os módulos passam por uma árvore de produtos e uma
+árvore de restos (Bernstein), em tempo quase linear quando a aritmética
+também é (veja gmpy2 abaixo):
+
+    P = n1 · n2 · ... · nk          (árvore de produtos)
+    r_i = P mod n_i²                (árvore de restos)
+    gcd(r_i / n_i, n_i) > 1         => n_i compartilha um fator com outro módulo
+
+Cada nível das árvores é gravado em um arquivo temporário e lido em sequência
+para montar o seguinte, mas os nós perto da raiz têm o tamanho do produto de
+todos os módulos da árvore (256 bytes por módulo de 2048 bits). Por isso cada
+árvore tem no máximo --lote módulos, o que limita a memória: com mais módulos,
+cada árvore é auditada internamente e contra o produto de cada árvore
+anterior (guardado em disco), e uma segunda passada calcula o gcd de cada
+módulo com o produto dos fatores encontrados, marcando também os parceiros
+das árvores anteriores. Com k árvores são k(k-1)/2 reduções cruzadas: o tempo
+só é quase linear enquanto todos os módulos cabem em uma árvore, então use o
+maior lote que a memória permitir.
+
+São auditadas as chaves públicas de documents (inclusive nas partições de
+arquivo) e de user_keys; documentos assinados por uma chave de usuário fraca
+também são listados. Cada módulo entra uma única vez na árvore, mesmo gravado
+em mais de uma origem (um módulo repetido teria gcd n consigo mesmo); os
+módulos repetidos são relatados à parte.
+
+Com o pacote opcional gmpy2 (multiplicação e divisão quase lineares) cada
+árvore pode ter centenas de milhares de módulos. Com int do Python a multiplicação é
+a de Karatsuba e os restos grandes usam divisão recursiva apoiada nela: o
+custo fica subquadrático, mas os níveis do topo, com inteiros enormes, passam
+a dominar o tempo e o lote padrão é bem menor; para volumes grandes
+instale gmpy2.
+
+Uso:
+    python key_audit.py [--lote N] [--limite N] [--saida relatorio.json]
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from database import get_db_connection
+from archive import attached_partition
+from crypto.keygen import deserialize_key
+
+try:
+    import gmpy2
+    _to_int, _gcd = gmpy2.mpz, gmpy2.gcd
+except ImportError:
+    gmpy2 = None
+    _to_int, _gcd = int, math.gcd
+
+# Módulos por árvore: a raiz de uma árvore cheia tem cerca de 16 MB com gmpy2 e
+# 512 KB com int do Python (módulos de 2048 bits)
+DEFAULT_CHUNK_SIZE = 65536 if gmpy2 else 2048
+
+_LENGTH = struct.Struct(">Q")
+
+# Acima deste tamanho (bits), o resto com int do Python usa a divisão recursiva
+# de Burnikel-Ziegler, que se apoia na multiplicação de Karatsuba, em vez da
+# divisão quadrática do CPython
+_RECURSIVE_DIV_BITS = 1 << 14
+_DIV_LIMIT = 4000
+
+def _div2n1n(a, b, n):
+    """(a // b, a % b) para a < b·2^n, com b de n bits"""
+    if a.bit_length() - n <= _DIV_LIMIT:
+        return divmod(a, b)
+    pad = n & 1
+    if pad:
+        a, b, n = a << 1, b << 1, n + 1
+    half_n = n >> 1
+    mask = (1 << half_n) - 1
+    b1, b2 = b >> half_n, b & mask
+    q1, r = _div3n2n(a >> n, (a >> half_n) & mask, b, b1, b2, half_n)
+    q2, r = _div3n2n(r, a & mask, b, b1, b2, half_n)
+    if pad:
+        r >>= 1
+    return q1 << half_n | q2, r
+
+def _div3n2n(a12, a3, b, b1, b2, n):
+    if a12 >> n == b1:
+        q, r = (1 << n) - 1, a12 - (b1 << n) + b1
+    else:
+        q, r = _div2n1n(a12, b1, n)
+    r = (r << n | a3) - q * b2
+    while r < 0:
+        q -= 1
+        r += b
+    return q, r
+
+def _mod(a, b):
+    """a % b para inteiros positivos"""
+    n = b.bit_length()
+    if gmpy2 or n <= _RECURSIVE_DIV_BITS or a < b:
+        return a % b
+    digits = []
+    while a:
+        digits.append(a & ((1 << n) - 1))
+        a >>= n
+    r = 0
+    for digit in reversed(digits):
+        _, r = _div2n1n((r << n) | digit, b, n)
+    return r
+
+def _write_int(f, value):
+    value = int(value)
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    f.write(_LENGTH.pack(len(data)))
+    f.write(data)
+
+def _read_ints(f):
+    """Inteiros gravados por _write_int, do início do arquivo"""
+    f.seek(0)
+    while True:
+        header = f.read(_LENGTH.size)
+        if not header:
+            return
+        (length,) = _LENGTH.unpack(header)
+        yield _to_int(int.from_bytes(f.read(length), "big"))
+
+def _spill(values):
+    """Grava os inteiros em um arquivo temporário e devolve (arquivo, quantidade)"""
+    f = tempfile.TemporaryFile()
+    count = 0
+    for value in values:
+        _write_int(f, value)
+        count += 1
+    return f, count
+
+def _pair_products(values):
+    values = iter(values)
+    for left in values:
+        right = next(values, None)
+        yield left if right is None else left * right
+
+def _reduce_level(parents, nodes, squared=True):
+    """Resto do nó pai por n² (ou n) de cada nó do nível (dois filhos por pai)"""
+    for i, node in enumerate(nodes):
+        if i % 2 == 0:
+            parent = next(parents)
+        yield _mod(parent, node * node if squared else node)
+
+def product_tree(moduli, progress=None):
+    """
+    Árvore de produtos sobre os módulos, com cada nível gravado em um arquivo
+    temporário: só dois nós por vez ficam na memória.
+
+    Returns:
+        list: (arquivo, quantidade de nós) por nível, das folhas até a raiz
+    """
+    levels = [_spill(moduli)]
+    while levels[-1][1] > 1:
+        levels.append(_spill(_pair_products(_read_ints(levels[-1][0]))))
+        if progress:
+            progress("árvore de produtos", len(levels) - 1)
+    return levels
+
+def _descend(remainders, levels, squared, progress=None):
+    """
+    Árvore de restos: desce os restos do nível da raiz (arquivo remainders) até
+    as folhas, nível a nível em disco. Devolve o arquivo com o resto de cada folha.
+    """
+    root = levels[-1][0]
+    for depth in range(len(levels) - 2, -1, -1):
+        reduced, _ = _spill(_reduce_level(_read_ints(remainders), _read_ints(levels[depth][0]), squared))
+        if remainders is not root:
+            remainders.close()
+        remainders = reduced
+        if progress:
+            progress("árvore de restos", len(levels) - 1 - depth)
+    return remainders
+
+def batch_gcd(levels, progress=None):
+    """
+    gcd de cada módulo com o produto de todos os outros da árvore, pela árvore
+    de restos descendo da raiz P até as folhas: gcd((P mod n²) / n, n).
+
+    Yields:
+        tuple: (módulo, gcd), na ordem dos módulos
+    """
+    leaves, count = levels[0]
+    if count < 2:
+        yield from ((n, 1) for n in _read_ints(leaves))
+        return
+    # Na raiz, P mod P² = P: o próprio arquivo da raiz serve de resto
+    remainders = _descend(levels[-1][0], levels, True, progress)
+    try:
+        for r, n in zip(_read_ints(remainders), _read_ints(leaves)):
+            yield n, _gcd(r // n, n)
+    finally:
+        remainders.close()
+
+def cross_gcd(product, levels, progress=None):
+    """
+    gcd de cada módulo da árvore com product (ex.: o produto dos módulos de
+    outra árvore), pela árvore de restos: gcd(product mod n, n).
+
+    Yields:
+        tuple: (módulo, gcd), na ordem dos módulos
+    """
+    root = next(_read_ints(levels[-1][0]))
+    top, _ = _spill([_mod(product, root)])
+    remainders = _descend(top, levels, False, progress)
+    try:
+        for r, n in zip(_read_ints(remainders), _read_ints(levels[0][0])):
+            yield n, _gcd(r, n)
+    finally:
+        remainders.close()
+
+def _public_key_groups(conn):
+    """
+    Chaves públicas armazenadas, agrupadas por texto idêntico.
+
+    Yields:
+        tuple: (origem "document" ou "user_key", texto da chave, lista de ids)
+    """
+    sources = [("document", "main.documents", "document_id"), ("user_key", "main.user_keys", "key_id")]
+    for source, table, id_column in sources:
+        for row in conn.execute(f"""
+            SELECT public_key, group_concat({id_column}) FROM {table}
+            WHERE public_key != '' GROUP BY public_key
+        """):
+            yield source, row[0], row[1].split(",")
+
+    partitions = [row[0] for row in conn.execute("SELECT DISTINCT partition FROM archived_documents")]
+    for partition in partitions:
+        with attached_partition(conn, partition) as schema:
+            if not schema:
+                continue
+            rows = conn.execute(f"""
+                SELECT public_key, group_concat(document_id) FROM {schema}.documents
+                WHERE public_key != '' GROUP BY public_key
+            """).fetchall()
+        for public_key, ids in rows:
+            yield "document", public_key, ids.split(",")
+
+def _iter_moduli(conn, report=None, limit=0):
+    """Módulos únicos por origem; com report, registra as chaves lidas e as inválidas"""
+    for source, public_key, ids in _public_key_groups(conn):
+        try:
+            modulus, _ = deserialize_key(public_key, "PUBLIC")
+        except (ValueError, IndexError):
+            if report is None:
+                continue
+            report["chaves_invalidas"] += len(ids)
+            if len(report["exemplos_invalidas"]) < limit:
+                report["exemplos_invalidas"].append({"origem": source, "ids": ids[:10]})
+            continue
+        if report is not None:
+            report["chaves"] += len(ids)
+        yield source, ids, _to_int(modulus)
+
+def _load_moduli(conn, report, limit, progress=None):
+    """
+    Grava os módulos em um banco temporário (em disco), uma folha por módulo
+    distinto entre todas as origens, com a origem e os ids das chaves que o usam.
+    Registra no relatório os módulos únicos e os gravados mais de uma vez.
+
+    Returns:
+        sqlite3.Connection: Banco com as tabelas leaves (leaf, modulus) e owners (leaf, source, ids, keys)
+    """
+    store = sqlite3.connect("")
+    store.execute("CREATE TABLE leaves (leaf INTEGER PRIMARY KEY, modulus BLOB NOT NULL UNIQUE)")
+    store.execute("CREATE TABLE owners (leaf INTEGER NOT NULL, source TEXT NOT NULL, ids TEXT NOT NULL, keys INTEGER NOT NULL)")
+    for source, ids, modulus in _iter_moduli(conn, report, limit):
+        modulus = int(modulus)
+        data = modulus.to_bytes((modulus.bit_length() + 7) // 8, "big")
+        row = store.execute("SELECT leaf FROM leaves WHERE modulus = ?", (data,)).fetchone()
+        if row:
+            leaf = row[0]
+        else:
+            leaf = store.execute("INSERT INTO leaves (modulus) VALUES (?)", (data,)).lastrowid
+            report["modulos_unicos"] += 1
+            if progress and report["modulos_unicos"] % 10000 == 0:
+                progress("módulos lidos", report["modulos_unicos"])
+        store.execute("INSERT INTO owners (leaf, source, ids, keys) VALUES (?, ?, ?, ?)",
+                      (leaf, source, json.dumps(ids), len(ids)))
+    store.execute("CREATE INDEX owners_leaf ON owners (leaf)")
+    store.commit()
+
+    for leaf, keys in store.execute("SELECT leaf, SUM(keys) FROM owners GROUP BY leaf HAVING SUM(keys) > 1").fetchall():
+        report["modulos_repetidos"] += 1
+        if len(report["exemplos_repetidos"]) < limit:
+            owners = _leaf_owners(store, leaf)
+            report["exemplos_repetidos"].append({
+                "origem": ", ".join(sorted({source for source, _ in owners})),
+                "ids": [key_id for _, ids in owners for key_id in ids][:10],
+                "ocorrencias": keys,
+            })
+    return store
+
+def _leaf_owners(store, leaf):
+    """(origem, ids) das chaves que usam o módulo da folha"""
+    return [(source, json.loads(ids)) for source, ids in
+            store.execute("SELECT source, ids FROM owners WHERE leaf = ? ORDER BY rowid", (leaf,))]
+
+def _stored_moduli(store, first_leaf, count):
+    """Módulos das folhas first_leaf a first_leaf + count - 1"""
+    for (data,) in store.execute("SELECT modulus FROM leaves WHERE leaf >= ? ORDER BY leaf LIMIT ?",
+                                 (first_leaf, count)):
+        yield _to_int(int.from_bytes(data, "big"))
+
+def _chunk_trees(store, chunk_size, progress=None):
+    """
+    Árvore de produtos de cada lote de folhas, uma por vez.
+
+    Yields:
+        tuple: (número da primeira folha do lote, níveis da árvore)
+    """
+    (count,) = store.execute("SELECT COUNT(*) FROM leaves").fetchone()
+    for first_leaf in range(1, count + 1, chunk_size):
+        levels = product_tree(_stored_moduli(store, first_leaf, chunk_size), progress)
+        try:
+            yield first_leaf, levels
+        finally:
+            for f, _ in levels:
+                f.close()
+
+def audit_keys(chunk_size=DEFAULT_CHUNK_SIZE, limit=50, progress=None):
+    """
+    Audita todas as chaves públicas armazenadas.
+
+    Args:
+        chunk_size: Máximo de módulos por árvore (limita a memória, veja o início do módulo)
+        limit: Máximo de exemplos de módulos repetidos e chaves inválidas no relatório
+        progress: Função chamada com (etapa, quantidade) durante a auditoria
+
+    Returns:
+        dict: Relatório com as chaves fracas, os documentos afetados e a vazão
+    """
+    started = time.perf_counter()
+    report = {"chaves": 0, "modulos_unicos": 0, "modulos_repetidos": 0, "exemplos_repetidos": [],
+              "chaves_invalidas": 0, "exemplos_invalidas": [], "lotes": 0, "niveis": 0}
+    # Folha -> gcd do módulo com o produto de todos os outros
+    found = {}
+    factors = set()
+
+    conn = get_db_connection()
+    store = None
+    try:
+        store = _load_moduli(conn, report, limit, progress)
+
+        # Passada 1: MDC em lote dentro de cada árvore e contra os produtos das árvores anteriores
+        with tempfile.TemporaryFile() as products:
+            for first_leaf, levels in _chunk_trees(store, chunk_size, progress):
+                report["lotes"] += 1
+                report["niveis"] = max(report["niveis"], len(levels))
+                for leaf, (modulus, g) in enumerate(batch_gcd(levels, progress), first_leaf):
+                    if g != 1:
+                        found[leaf] = g
+                        factors.add(g)
+                # Um módulo pode compartilhar primos diferentes com árvores diferentes: todos contam
+                for product in _read_ints(products):
+                    for modulus, g in cross_gcd(product, levels):
+                        if g != 1:
+                            factors.add(g)
+                products.seek(0, os.SEEK_END)
+                _write_int(products, next(_read_ints(levels[-1][0])))
+                if progress:
+                    progress("lotes auditados", report["lotes"])
+
+        # Passada 2 (só com mais de uma árvore): o gcd com o produto dos fatores
+        # encontrados marca também os parceiros das árvores anteriores
+        if report["lotes"] > 1:
+            found = {}
+            if factors:
+                shared = math.prod(factors)
+                for first_leaf, levels in _chunk_trees(store, chunk_size):
+                    for leaf, (modulus, g) in enumerate(cross_gcd(shared, levels), first_leaf):
+                        if g != 1:
+                            found[leaf] = g
+
+        weak = []
+        for leaf in sorted(found):
+            g = found[leaf]
+            (modulus,) = _stored_moduli(store, leaf, 1)
+            # Com os dois primos compartilhados (g == n), o fator isolado não é conhecido
+            factor_bits = int(g).bit_length() if g != modulus else None
+            weak.extend({"origem": source, "ids": ids, "fator_bits": factor_bits}
+                        for source, ids in _leaf_owners(store, leaf))
+
+        affected = [document_id for item in weak if item["origem"] == "document" for document_id in item["ids"]]
+        weak_key_ids = [key_id for item in weak if item["origem"] == "user_key" for key_id in item["ids"]]
+        for first in range(0, len(weak_key_ids), 500):
+            key_ids = weak_key_ids[first:first + 500]
+            affected.extend(row[0] for row in conn.execute(
+                f"SELECT document_id FROM documents WHERE key_id IN ({','.join('?' * len(key_ids))})", key_ids))
+    finally:
+        if store:
+            store.close()
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    report.update({
+        "chaves_fracas": weak,
+        "documentos_afetados": affected,
+        "aritmetica": "gmpy2" if gmpy2 else "int",
+        "duracao_s": elapsed,
+        "modulos_por_s": report["modulos_unicos"] / elapsed if elapsed else None,
+    })
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Auditoria de chaves RSA com fatores compartilhados")
+    parser.add_argument("--lote", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Máximo de módulos por árvore (limita a memória)")
+    parser.add_argument("--limite", type=int, default=50, help="Exemplos de repetidas/inválidas no relatório")
+    parser.add_argument("--saida", help="Grava o relatório em JSON neste arquivo")
+    args = parser.parse_args()
+
+    database.create_tables()
+    report = audit_keys(args.lote, args.limite, progress=lambda stage, done: print(f"  {stage}: {done}      ", end="\r"))
+    print()
+    print(f"{report['chaves']} chave(s), {report['modulos_unicos']} módulo(s) único(s) em {report['lotes']} árvore(s) de até {report['niveis']} nível(is): "
+          f"{report['duracao_s']:.1f}s ({report['modulos_por_s'] or 0:.0f} módulos/s, aritmética {report['aritmetica']})")
+    if report["modulos_repetidos"]:
+        print(f"{report['modulos_repetidos']} módulo(s) gravado(s) mais de uma vez.")
+    if report["chaves_invalidas"]:
+        print(f"{report['chaves_invalidas']} chave(s) que não puderam ser lidas.")
+    if report["chaves_fracas"]:
+        print(f"❌ {len(report['chaves_fracas'])} chave(s) com fator compartilhado; "
+              f"{len(report['documentos_afetados'])} documento(s) afetado(s):")
+        for document_id in report["documentos_afetados"][:20]:
+            print(f"  {document_id}")
+        if len(report["documentos_afetados"]) > 20:
+            print(f"  ... e mais {len(report['documentos_afetados']) - 20}")
+    else:
+        print("✅ Nenhum fator compartilhado encontrado.")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Chaves de assinatura de longa duração, uma por usuário (KEY_MODE = "user").
+
+Em vez de gerar um par RSA por documento, cada usuário tem uma chave ativa
+guardada em user_keys, com período de validade. Documentos assinados nesse
+modo referenciam a chave por key_id e não repetem a chave pública nem a
+chave privada criptografada na própria linha.
+
+Ao rotacionar, a chave anterior é marcada como "retired": deixa de assinar,
+mas continua verificando os documentos que assinou dentro da validade.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from database import get_db_connection
+from crypto.keygen import serialize_key, deserialize_key
+from crypto.crypto_utils import encrypt_private_key, decrypt_private_key
+from crypto.crypto_backend import get_backend
+from config import USER_KEY_VALIDITY_DAYS
+import metrics
+
+def create_user_key(user_id, user_password, validity_days=USER_KEY_VALIDITY_DAYS):
+    """
+    Gera uma nova chave de assinatura para o usuário e aposenta a chave ativa anterior.
+
+    Returns:
+        tuple: (key_id, public_key_tuple, private_key_tuple)
+    """
+    public_key_tuple, private_key_tuple = get_backend().generate_rsa_keys()
+    private_key_encrypted = encrypt_private_key(serialize_key(private_key_tuple, "PRIVATE"), user_password)
+    valid_from = datetime.now()
+    valid_until = valid_from + timedelta(days=validity_days)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("UPDATE user_keys SET status = 'retired' WHERE user_id = ? AND status = 'active'", (user_id,))
+        cursor.execute("""
+            INSERT INTO user_keys (user_id, public_key, private_key_encrypted, status, valid_from, valid_until)
+            VALUES (?, ?, ?, 'active', ?, ?)
+        """, (user_id, serialize_key(public_key_tuple, "PUBLIC"), private_key_encrypted, valid_from, valid_until))
+        conn.commit()
+        return cursor.lastrowid, public_key_tuple, private_key_tuple
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def rotate_user_key(user_id, user_password, validity_days=USER_KEY_VALIDITY_DAYS):
+    """
+    Rotaciona a chave de assinatura do usuário.
+
+    Returns:
+        tuple: (sucesso, mensagem)
+    """
+    # Confirma a senha com a chave atual antes de aposentá-la
+    current = _get_active_key_row(user_id)
+    if current:
+        try:
+            decrypt_private_key(current["private_key_encrypted"], user_password)
+        except ValueError as e:
+            return False, f"Erro de segurança: {e}."
+    try:
+        key_id, _, _ = create_user_key(user_id, user_password, validity_days)
+    except Exception as e:
+        return False, f"Erro ao gerar nova chave: {e}"
+    return True, f"Nova chave de assinatura gerada (ID {key_id}), válida por {validity_days} dias."
+
+def _get_active_key_row(user_id):
+    conn = get_db_connection()
+    try:
+        return conn.execute("""
+            SELECT key_id, private_key_encrypted, valid_until FROM user_keys
+            WHERE user_id = ? AND status = 'active' AND valid_until > ?
+            ORDER BY key_id DESC LIMIT 1
+        """, (user_id, datetime.now())).fetchone()
+    finally:
+        conn.close()
+
+@metrics.timed("sign.keygen")
+def get_signing_key(user_id, user_password):
+    """
+    Retorna a chave ativa do usuário, gerando uma na primeira assinatura
+    ou quando a anterior tiver expirado.
+
+    Returns:
+        tuple: (key_id, private_key_tuple)
+
+    Raises:
+        ValueError: Se a senha não descriptografar a chave ativa
+    """
+    row = _get_active_key_row(user_id)
+    if row is None:
+        key_id, _, private_key_tuple = create_user_key(user_id, user_password)
+        return key_id, private_key_tuple
+    private_key_pem = decrypt_private_key(row["private_key_encrypted"], user_password)
+    return row["key_id"], deserialize_key(private_key_pem, "PRIVATE")
+
+def get_user_public_key(key_id):
+    """
+    Chave pública já desserializada e validade de uma chave de usuário.
+    A chave pública e o período de validade não mudam depois de criados,
+    então o resultado fica em cache por key_id; key_ids não encontrados não
+    entram no cache, para que uma chave criada depois seja vista.
+
+    Returns:
+        tuple: (user_id, public_key_tuple, valid_from, valid_until), ou None
+    """
+    try:
+        return _load_user_public_key(key_id)
+    except KeyError:
+        return None
+
+def clear_user_key_cache():
+    """Esvazia o cache de get_user_public_key"""
+    _load_user_public_key.cache_clear()
+
+@lru_cache(maxsize=1024)
+def _load_user_public_key(key_id):
+    # KeyError em vez de None: o lru_cache não guarda exceções
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT user_id, public_key, valid_from, valid_until FROM user_keys WHERE key_id = ?",
+                           (key_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise KeyError(key_id)
+    return row["user_id"], deserialize_key(row["public_key"], "PUBLIC"), row["valid_from"], row["valid_until"]
@@ -3,6 +3,8 @@ import os
 import secrets
 import uuid
 from crypto.crypto_utils import generate_prime, gcd, mod_inverse, encrypt_private_key
+from crypto.crypto_backend import get_backend
+import metrics
 
 # Gera um par de chaves RSA (pública e privada)
 def generate_rsa_keys(bits=2048):
@@ -54,6 +56,7 @@ def deserialize_key(key_str, key_type):
     n, exp = [int(x.split(":")[1]) for x in base64.b64decode(lines[1]).decode().split(",")]
     return (n, exp)
 
+@metrics.timed("sign.keygen")
 def generate_document_keys(user_password):
     """
     Gera par de chaves RSA específico para um documento.
@@ -61,7 +64,9 @@ def generate_document_keys(user_password):
     """
     document_id = str(uuid.uuid4())
     
-    public_key_tuple, private_key_tuple = generate_rsa_keys()
+    # Usa o backend configurado (Python puro ou OpenSSL); o formato das chaves é o mesmo
+    with metrics.span("crypto.rsa_keygen"):
+        public_key_tuple, private_key_tuple = get_backend().generate_rsa_keys()
     
     public_key_pem = serialize_key(public_key_tuple, "PUBLIC")
     private_key_pem = serialize_key(private_key_tuple, "PRIVATE")
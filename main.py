@@ -1,14 +1,21 @@
+import argparse
 import os
 import sys
 import time
-from auth import register_user, login_user, verify_email_code, get_all_users_except_current
+from auth import register_user, login_user, verify_email_code, search_users
 from document_manager import (
-    sign_and_send_document, get_sent_documents, get_received_documents, 
+    sign_and_send_document, sign_and_send_to_many, get_sent_documents, get_received_documents, 
     verify_document, get_document_details, get_verification_history,
-    get_document_statistics
+    get_document_statistics, find_documents_by_content
 )
+from file_selector import get_file_path
+from key_manager import rotate_user_key
+from config import KEY_MODE
+import database
+import metrics
 
 CURRENT_USER = None
+RECIPIENT_PAGE_SIZE = 10
 
 def clear_screen():
     """Limpa a tela do terminal"""
@@ -123,6 +130,8 @@ def main_menu():
     while True:
         clear_screen()
         stats = get_document_statistics(CURRENT_USER['user_id'])
+        # Rotação de chave só existe com chaves de assinatura por usuário
+        key_option = "\n5. 🔑 Gerar Nova Chave de Assinatura" if KEY_MODE == "user" else ""
         
         print_header(f"MENU PRINCIPAL - {CURRENT_USER['nome']}")
         print(f"""
@@ -136,6 +145,7 @@ def main_menu():
 1. 📝 Assinar e Enviar Documento
 2. 📤 Ver Documentos Enviados
 3. 📥 Ver Documentos Recebidos
+4. 🔎 Procurar Documento pelo Arquivo{key_option}
 0. 🚪 Sair do Sistema
 """)
         choice = get_user_input("Escolha uma opção: ").strip()
@@ -146,12 +156,69 @@ def main_menu():
             handle_view_sent_documents()
         elif choice == "3":
             handle_view_received_documents()
+        elif choice == "4":
+            handle_find_by_content()
+        elif choice == "5" and KEY_MODE == "user":
+            handle_rotate_user_key()
         elif choice == "0":
             display_message("Saindo do sistema. Até logo!", "info")
             sys.exit()
         else:
             display_message("Opção inválida. Tente novamente.", "error")
 
+def handle_rotate_user_key():
+    """Gera uma nova chave de assinatura pessoal, aposentando a atual"""
+    clear_screen()
+    print_header("NOVA CHAVE DE ASSINATURA")
+    
+    user_password = get_user_input("Sua senha: ", sensitive=True).strip()
+    if not user_password:
+        display_message("Senha é obrigatória.", "error")
+        return
+    
+    success, message = rotate_user_key(CURRENT_USER["user_id"], user_password)
+    display_message(message, "success" if success else "error")
+
+def select_recipients():
+    """Busca destinatários pelo início do nome ou do email, uma página por vez"""
+    selected = {}
+    while True:
+        if selected:
+            print("\nSelecionados: " + ", ".join(f"{user['nome']} ({user['email']})" for user in selected.values()))
+        query = get_user_input("\nBuscar destinatário (início do nome ou email; Enter para concluir): ").strip()
+        if not query:
+            return list(selected.values())
+
+        cursor = None
+        while True:
+            users, next_cursor = search_users(query, CURRENT_USER["user_id"], RECIPIENT_PAGE_SIZE, cursor)
+            if not users:
+                print("Nenhum usuário encontrado.")
+                break
+            print("\n📋 DESTINATÁRIOS ENCONTRADOS:")
+            for i, user in enumerate(users):
+                print(f"{i+1}. {user['nome']} ({user['email']})")
+
+            more = ", 'm' para mais resultados" if next_cursor else ""
+            choice = get_user_input(f"Escolha o(s) número(s), separados por vírgula{more} "
+                                    "ou Enter para nova busca: ").strip().lower()
+            if choice == "m" and next_cursor:
+                cursor = next_cursor
+                continue
+            if not choice:
+                break
+            try:
+                choices = [int(number) for number in choice.split(",")]
+            except ValueError:
+                print("Digite um número válido.")
+                continue
+            if not all(1 <= number <= len(users) for number in choices):
+                print("Escolha inválida. Tente novamente.")
+                continue
+            for number in choices:
+                selected[users[number - 1]["user_id"]] = users[number - 1]
+            break
+
 def handle_sign_and_send_document():
     """Gerencia assinatura e envio de documento"""
     clear_screen()
@@ -167,42 +234,44 @@ def handle_sign_and_send_document():
         display_message("Senha é obrigatória.", "error")
         return
 
-    # Lista usuários disponíveis
-    users = get_all_users_except_current(CURRENT_USER["user_id"])
-    if not users:
-        display_message("Não há outros usuários cadastrados para enviar documentos.", "warning")
+    # Vários destinatários podem ser escolhidos de uma vez: o documento é assinado uma única vez
+    selected_receivers = select_recipients()
+    if not selected_receivers:
+        display_message("Nenhum destinatário selecionado.", "warning")
         return
 
-    print("\n📋 DESTINATÁRIOS DISPONÍVEIS:")
-    for i, user in enumerate(users):
-        print(f"{i+1}. {user['nome']} ({user['email']})")
-    
-    while True:
-        try:
-            receiver_choice = int(get_user_input("\nEscolha o número do destinatário: "))
-            if 1 <= receiver_choice <= len(users):
-                selected_receiver = users[receiver_choice - 1]
-                break
-            else:
-                print("Escolha inválida. Tente novamente.")
-        except ValueError:
-            print("Digite um número válido.")
-
-    print(f"\n📤 Enviando para: {selected_receiver['nome']} ({selected_receiver['email']})")
+    for receiver in selected_receivers:
+        print(f"\n📤 Enviando para: {receiver['nome']} ({receiver['email']})")
     
     # Pergunta sobre interface gráfica
     use_gui_input = get_user_input("Usar interface gráfica para seleção de arquivo? (s/n): ").strip().lower()
     use_gui = use_gui_input in ['s', 'sim', 'y', 'yes']
 
-    success, message = sign_and_send_document(
-        CURRENT_USER["user_id"],
-        CURRENT_USER["email"],
-        selected_receiver["user_id"],
-        selected_receiver["email"],
-        document_name,
-        user_password,
-        use_gui=use_gui
-    )
+    # Assinatura destacada: para arquivos grandes, que permanecem no disco
+    detached_input = get_user_input("Assinatura destacada (o arquivo não é copiado para o banco)? (s/n): ").strip().lower()
+    detached = detached_input in ['s', 'sim', 'y', 'yes']
+
+    if len(selected_receivers) > 1:
+        success, message = sign_and_send_to_many(
+            CURRENT_USER["user_id"],
+            CURRENT_USER["email"],
+            [(receiver["user_id"], receiver["email"]) for receiver in selected_receivers],
+            document_name,
+            user_password,
+            use_gui=use_gui,
+            detached=detached
+        )
+    else:
+        success, message = sign_and_send_document(
+            CURRENT_USER["user_id"],
+            CURRENT_USER["email"],
+            selected_receivers[0]["user_id"],
+            selected_receivers[0]["email"],
+            document_name,
+            user_password,
+            use_gui=use_gui,
+            detached=detached
+        )
     
     display_message(message, "success" if success else "error")
 
@@ -267,6 +336,42 @@ def handle_view_received_documents():
         except ValueError:
             print("Digite um número válido.")
 
+def handle_find_by_content():
+    """Procura documentos enviados ou recebidos com o mesmo conteúdo de um arquivo local"""
+    clear_screen()
+    print_header("PROCURAR DOCUMENTO PELO ARQUIVO")
+
+    use_gui_input = get_user_input("Usar interface gráfica para seleção de arquivo? (s/n): ").strip().lower()
+    path = get_file_path(use_gui=use_gui_input in ['s', 'sim', 'y', 'yes'])
+    if not path:
+        display_message("Seleção de arquivo cancelada.", "warning")
+        return
+
+    documents, error = find_documents_by_content(CURRENT_USER["user_id"], path)
+    if error:
+        display_message(error, "error")
+        return
+    if not documents:
+        display_message("Este arquivo não foi assinado nem recebido por você.", "info")
+        return
+
+    print(f"\n🔎 {len(documents)} DOCUMENTO(S) COM ESTE CONTEÚDO:\n")
+    for i, doc in enumerate(documents):
+        status_icon = "✅" if doc['status'] == 'verified' else "📄" if doc['status'] == 'sent' else "❌"
+        print(f"{i+1}. {status_icon} {doc['document_name']}")
+        if doc['role'] == 'sent':
+            print(f"   📧 Para: {doc['receiver_name']} ({doc['receiver_email']})")
+        else:
+            print(f"   📧 De: {doc['sender_name']} ({doc['sender_email']})")
+        print(f"   📅 Enviado: {doc['created_at']}")
+        print(f"   📊 Status: {doc['status'].upper()}")
+        for log in doc['history']:
+            result = "✅ VÁLIDA" if log['result'] == 'verified' else "❌ INVÁLIDA"
+            print(f"   {result} em {log['verified_at']} por {log['verifier_name']}")
+        print(f"   🆔 ID: {doc['document_id']}")
+        print()
+    input("Pressione Enter para continuar...")
+
 def handle_verify_document(document_id):
     """Verifica um documento específico"""
     clear_screen()
@@ -282,11 +387,14 @@ def handle_verify_document(document_id):
     print(f"📅 Data de envio: {doc_details['created_at']}")
     print(f"📊 Status atual: {doc_details['status'].upper()}")
     
-    # Mostra prévia do conteúdo
-    content_preview = doc_details["document_content"][:200]
-    if len(doc_details["document_content"]) > 200:
-        content_preview += "..."
-    print(f"\n📝 Prévia do conteúdo:\n{content_preview}")
+    # Mostra prévia do conteúdo (ou o arquivo, em assinaturas destacadas)
+    if doc_details["storage_mode"] == "detached":
+        print(f"\n📁 Arquivo (assinatura destacada): {doc_details['file_path']} ({doc_details['file_size']} bytes)")
+    else:
+        content_preview = doc_details["document_content"][:200]
+        if len(doc_details["document_content"]) > 200:
+            content_preview += "..."
+        print(f"\n📝 Prévia do conteúdo:\n{content_preview}")
 
     confirm = get_user_input("\n🔍 Deseja verificar a assinatura deste documento? (s/n): ").strip().lower()
     if confirm in ['s', 'sim', 'y', 'yes']:
@@ -334,7 +442,30 @@ def show_system_info():
 """)
     input("Pressione Enter para continuar...")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sistema de assinatura digital RSA-PSS")
+    parser.add_argument("--profile", action="store_true",
+                        help="Coleta tempos de cada etapa de assinatura, verificação, login e banco")
+    parser.add_argument("--metricas-arquivo", default="metricas.json",
+                        help="Arquivo onde as métricas são gravadas ao sair (.prom para o formato Prometheus)")
+    parser.add_argument("--metricas-porta", type=int,
+                        help="Publica as métricas em http://127.0.0.1:PORTA/metrics enquanto o sistema roda")
+    parser.add_argument("--db-diagnostico", action="store_true",
+                        help="Mede as consultas SQL, registra as lentas com o plano e aponta varreduras completas")
+    parser.add_argument("--db-lenta-ms", type=float,
+                        help="Limite em ms para uma consulta ser registrada como lenta")
+    parser.add_argument("--db-log", default="db_diagnostico.log",
+                        help="Arquivo do log de consultas lentas e varreduras completas")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.profile:
+        metrics.enable()
+        if args.metricas_porta:
+            metrics.serve(args.metricas_porta)
+    if args.db_diagnostico:
+        database.enable_diagnostics(args.db_lenta_ms, args.db_log)
     try:
         # Garante que as tabelas do banco de dados existam
         from database import create_tables
@@ -356,4 +487,11 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"\nErro inesperado: {e}")
         sys.exit(1)
+    finally:
+        if args.profile:
+            metrics.write(args.metricas_arquivo)
+            print(f"Métricas gravadas em {args.metricas_arquivo}")
+        if args.db_diagnostico:
+            print("\n📊 CONSULTAS SQL:")
+            print(database.format_query_report())
 
@@ -0,0 +1,143 @@
+"""
+Hash em árvore de Merkle para documentos grandes.
+
+O conteúdo é dividido em blocos de tamanho fixo; cada bloco gera uma folha
+H(0x00 || bloco) e cada nó interno é H(0x01 || esquerda || direita). Um nó
+sem par em um nível sobe inalterado para o nível seguinte. A raiz substitui
+o hash plano como document_hash assinado, o que permite:
+
+- calcular as folhas em paralelo, em vários processos;
+- verificar apenas um intervalo de blocos, com provas de inclusão obtidas
+  das folhas guardadas junto ao documento.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from crypto.signature import get_hash_function, DEFAULT_HASH_ALGORITHM
+import metrics
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+def leaf_hash(chunk, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    hash_object = get_hash_function(hash_algorithm)(LEAF_PREFIX)
+    hash_object.update(chunk)
+    return hash_object.digest()
+
+def node_hash(left, right, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    return get_hash_function(hash_algorithm)(NODE_PREFIX + left + right).digest()
+
+def chunk_count(size, chunk_size):
+    # Um documento vazio ainda tem uma folha (do bloco vazio)
+    return max(1, (size + chunk_size - 1) // chunk_size)
+
+def _hash_buffer_range(buffer, first, last, chunk_size, hash_algorithm):
+    return [leaf_hash(buffer[i * chunk_size:(i + 1) * chunk_size], hash_algorithm)
+            for i in range(first, last)]
+
+def _hash_file_range(path, first, last, chunk_size, hash_algorithm):
+    """Executado nos processos de trabalho: calcula as folhas dos blocos [first, last)"""
+    leaves = []
+    with open(path, "rb") as f:
+        f.seek(first * chunk_size)
+        for _ in range(first, last):
+            leaves.append(leaf_hash(f.read(chunk_size), hash_algorithm))
+    return leaves
+
+def _split(total, workers):
+    step = (total + workers - 1) // workers
+    return [(start, min(start + step, total)) for start in range(0, total, step)]
+
+@metrics.timed("crypto.merkle_leaves")
+def leaf_hashes(data, chunk_size=DEFAULT_CHUNK_SIZE, hash_algorithm=DEFAULT_HASH_ALGORITHM, workers=None):
+    """
+    Folhas de um conteúdo em memória. O hashlib libera o GIL em blocos grandes,
+    então threads bastam para paralelizar sem copiar o buffer para outros processos.
+    """
+    buffer = memoryview(data)
+    total = chunk_count(len(buffer), chunk_size)
+    workers = min(workers or os.cpu_count() or 1, total)
+    if workers <= 1:
+        return _hash_buffer_range(buffer, 0, total, chunk_size, hash_algorithm)
+    with ThreadPoolExecutor(workers) as pool:
+        parts = pool.map(lambda r: _hash_buffer_range(buffer, r[0], r[1], chunk_size, hash_algorithm),
+                         _split(total, workers))
+        return [leaf for part in parts for leaf in part]
+
+@metrics.timed("crypto.merkle_leaves")
+def leaf_hashes_from_file(path, chunk_size=DEFAULT_CHUNK_SIZE, hash_algorithm=DEFAULT_HASH_ALGORITHM, workers=None):
+    """Folhas de um arquivo, calculadas em paralelo por intervalos de blocos em vários processos"""
+    total = chunk_count(os.path.getsize(path), chunk_size)
+    workers = min(workers or os.cpu_count() or 1, total)
+    if workers <= 1:
+        return _hash_file_range(path, 0, total, chunk_size, hash_algorithm)
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_hash_file_range, path, first, last, chunk_size, hash_algorithm)
+                   for first, last in _split(total, workers)]
+        return [leaf for future in futures for leaf in future.result()]
+
+def tree_levels(leaves, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """Todos os níveis da árvore, das folhas (nível 0) até a raiz"""
+    level = list(leaves)
+    if not level:
+        raise ValueError("A árvore precisa de pelo menos uma folha")
+    levels = [level]
+    while len(level) > 1:
+        next_level = [node_hash(level[i], level[i + 1], hash_algorithm) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            next_level.append(level[-1])
+        level = next_level
+        levels.append(level)
+    return levels
+
+def merkle_root(leaves, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    return tree_levels(leaves, hash_algorithm)[-1][0]
+
+def _proof_from_levels(levels, index):
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(("L" if sibling < index else "R", level[sibling]))
+        index //= 2
+    return proof
+
+def inclusion_proof(leaves, index, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Prova de inclusão da folha `index`: lista de (lado, hash do irmão) da folha até a raiz,
+    com lado "L" quando o irmão fica à esquerda e "R" quando fica à direita.
+    """
+    return range_proofs(leaves, index, index + 1, hash_algorithm)[index]
+
+def range_proofs(leaves, first, last, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """Provas de inclusão dos blocos [first, last), montando a árvore uma única vez"""
+    if not 0 <= first < last <= len(leaves):
+        raise IndexError("Intervalo de blocos inválido")
+    levels = tree_levels(leaves, hash_algorithm)
+    return {index: _proof_from_levels(levels, index) for index in range(first, last)}
+
+def verify_inclusion(leaf, proof, root, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """Confere se a folha, combinada com os irmãos da prova, reproduz a raiz assinada"""
+    current = leaf
+    for side, sibling in proof:
+        if side == "L":
+            current = node_hash(sibling, current, hash_algorithm)
+        else:
+            current = node_hash(current, sibling, hash_algorithm)
+    return current == root
+
+def verify_chunks(chunks, first, proofs, root, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Verifica blocos consecutivos a partir do índice `first`.
+
+    Returns:
+        list: Índices dos blocos que não conferem com a raiz (vazia se todos conferem)
+    """
+    failed = []
+    for offset, chunk in enumerate(chunks):
+        index = first + offset
+        if not verify_inclusion(leaf_hash(chunk, hash_algorithm), proofs[index], root, hash_algorithm):
+            failed.append(index)
+    return failed
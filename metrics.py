@@ -0,0 +1,188 @@
+"""
+Rastreamento e métricas do fluxo de assinatura e verificação.
+
+Trechos do código são marcados com spans nomeados:
+
+    with metrics.span("sign.keygen"):
+        ...
+
+ou com o decorador @metrics.timed("auth.bcrypt"). Cada span alimenta um
+histograma de latência em memória, exportado como JSON ou no formato de
+exposição de texto do Prometheus, para um arquivo ou um endpoint HTTP local.
+
+A coleta começa desligada (ativada por --profile em main.py ou pela variável
+de ambiente PROFILE=1); desligada, um span custa apenas a checagem de um flag.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites superiores dos buckets, em segundos (o último bucket, +Inf, é implícito)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.environ.get("PROFILE", "") not in ("", "0")
+_lock = threading.Lock()
+_histograms = {}
+_NOOP = nullcontext()
+
+class Histogram:
+    """Histograma de latências com buckets fixos, no modelo do Prometheus"""
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q):
+        """Estimativa do quantil pelo limite superior do bucket que o contém"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_s": self.total,
+            "mean_s": self.total / self.count if self.count else None,
+            "min_s": self.min,
+            "max_s": self.max,
+            "p50_s": self.quantile(0.5),
+            "p99_s": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(BUCKETS + ("+Inf",), self.buckets)},
+        }
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+def observe(name, seconds):
+    """Registra uma duração (em segundos) no histograma do span"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+def span(name):
+    """Mede o bloco do with; com a coleta desligada, devolve um contexto vazio"""
+    if not _enabled:
+        return _NOOP
+    return _Span(name)
+
+def timed(name):
+    """Decorador que mede cada chamada da função como um span"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def snapshot():
+    """Resumo de todos os spans registrados até agora"""
+    with _lock:
+        return {name: histogram.to_dict() for name, histogram in sorted(_histograms.items())}
+
+def to_json():
+    return json.dumps(snapshot(), indent=2)
+
+def to_prometheus():
+    """Histogramas no formato de exposição de texto do Prometheus"""
+    lines = [
+        "# HELP span_duration_seconds Duração dos spans do sistema de assinatura",
+        "# TYPE span_duration_seconds histogram",
+    ]
+    with _lock:
+        items = sorted(_histograms.items())
+        for name, histogram in items:
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), histogram.buckets):
+                cumulative += count
+                lines.append(f'span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'span_duration_seconds_sum{{span="{name}"}} {histogram.total}')
+            lines.append(f'span_duration_seconds_count{{span="{name}"}} {histogram.count}')
+    return "\n".join(lines) + "\n"
+
+def write(path):
+    """Grava as métricas no arquivo; ".prom" e ".txt" usam o formato do Prometheus, o resto JSON"""
+    content = to_prometheus() if path.endswith((".prom", ".txt")) else to_json()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = to_prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = to_json(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        # Não polui o terminal da aplicação com o log de cada requisição
+        pass
+
+def serve(port, host="127.0.0.1"):
+    """
+    Publica as métricas em http://host:port/metrics (Prometheus) e /metrics.json,
+    em uma thread em segundo plano. Retorna o servidor (use shutdown() para parar).
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Verificador offline de pacotes de assinatura.
+
+Permite que quem recebe nossos pacotes confira as assinaturas sem acesso ao
+banco: nada aqui abre database.db. Entradas aceitas (arquivos, ou diretórios
+percorridos recursivamente):
+
+- pacotes de assinatura em JSON (.json), como os gerados por
+  sign_document_content e sign_detached_file;
+- registros exportados por document_transfer.py (.jsonl, .jsonl.gz, ou os
+  documentos/<id>.json de um tar já extraído).
+
+Com --chave, todos os pacotes são verificados somente contra essa chave, que
+é o que autentica o remetente. Sem --chave é usada a chave que o próprio
+pacote traz: isso só confere a integridade (qualquer um pode assinar de novo
+com outra chave e trocá-la no pacote), e o resultado é marcado como
+"chave do próprio pacote (não autenticada)".
+
+Nas assinaturas destacadas o arquivo é procurado no file_path do pacote e,
+se não estiver lá, ao lado do pacote (ou em arquivos/<id>/ de um tar
+extraído). Esses arquivos são mapeados na memória (mmap) em vez de lidos,
+então o tamanho deles não pesa na memória dos processos.
+
+Os pacotes são verificados em um pool de processos, com um número limitado de
+pacotes em andamento, e o relatório mostra o resultado por arquivo e a vazão.
+
+Uso:
+    python package_verifier.py CAMINHO [CAMINHO ...] [--chave chave.pub] [--processos N] [--saida relatorio.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from compression import decompress_payload
+from crypto.verification import verify_signed_document, verify_mapped_file
+
+PACKAGE_EXTENSIONS = (".json", ".jsonl", ".jsonl.gz")
+
+UNAUTHENTICATED_KEY = "chave do próprio pacote (não autenticada)"
+
+def package_from_record(record, public_key=None):
+    """
+    Pacote de assinatura e chave pública de um registro de document_transfer.
+
+    Args:
+        record: Registro exportado
+        public_key: Chave confiável; se informada, a chave do registro é ignorada
+
+    Returns:
+        tuple: (pacote, chave pública, mensagem de erro ou None)
+    """
+    document = record["documento"]
+    key = record.get("chave")
+    if public_key is None:
+        public_key = key["public_key"] if key else document.get("public_key")
+    if key and key["public_key"] == public_key:
+        # O período de validade só vale para a chave a que ele se refere
+        if not key["valid_from"] <= str(document["created_at"]) <= key["valid_until"]:
+            return None, None, "Documento assinado fora do período de validade da chave"
+
+    signature_package = {
+        "document_id": document["document_id"],
+        "document_hash": document["document_hash"],
+        "signature": document["signature"],
+        "sender_email": record.get("remetente"),
+        "receiver_email": record.get("destinatario"),
+        "timestamp": document["created_at"],
+        "content_type": document.get("content_type"),
+        "algorithm": "RSA-PSS",
+        "hash_algorithm": document.get("hash_algorithm") or "SHA3-256",
+        "digest_mode": document.get("digest_mode") or "flat",
+        "chunk_size": document.get("chunk_size"),
+    }
+    if document.get("storage_mode") == "detached":
+        signature_package.update({"file_path": document.get("file_path"), "file_size": document.get("file_size")})
+    else:
+        signature_package.update({"document_content": document["document_content"],
+                                  "content_codec": document.get("content_codec")})
+    return signature_package, public_key, None
+
+def _locate_file(signature_package, base_dir=None):
+    """Arquivo de uma assinatura destacada: o file_path original ou uma cópia ao lado do pacote"""
+    file_path = signature_package.get("file_path")
+    if not file_path:
+        return None
+    candidates = [file_path]
+    if base_dir:
+        name = os.path.basename(file_path)
+        candidates.append(os.path.join(base_dir, name))
+        if signature_package.get("document_id"):
+            candidates.append(os.path.join(base_dir, os.pardir, "arquivos",
+                                           os.path.basename(signature_package["document_id"]), name))
+    return next((path for path in candidates if os.path.isfile(path)), None)
+
+def verify_package(signature_package, public_key, base_dir=None):
+    """
+    Verifica um pacote de assinatura, embutido ou destacado.
+
+    Returns:
+        tuple: (resultado no formato de verify_signed_document, bytes verificados)
+    """
+    if "document_content" in signature_package:
+        content = decompress_payload(signature_package["document_content"], signature_package.get("content_codec"))
+        return verify_signed_document(signature_package, public_key, content), len(content)
+
+    path = _locate_file(signature_package, base_dir)
+    if path is None:
+        return {"valid": False, "error": f"Arquivo não encontrado: {signature_package.get('file_path')}",
+                "details": None}, 0
+    return verify_mapped_file(signature_package, public_key, path), os.path.getsize(path)
+
+def _verify_item(item):
+    """Verifica um item de _iter_items (executado no pool de processos)"""
+    label, signature_package, public_key, base_dir, error, authenticated = item
+    started = time.perf_counter()
+    size = 0
+    if error is None and not public_key:
+        error = "Chave pública não informada (--chave, ou campo public_key do pacote)"
+    if error is None:
+        try:
+            result, size = verify_package(signature_package, public_key, base_dir)
+            error = None if result["valid"] else result["error"]
+        except Exception as e:
+            error = f"Erro ao verificar documento: {e}"
+    return {
+        "pacote": label,
+        "valido": error is None,
+        "erro": error,
+        "remetente": (signature_package or {}).get("sender_email"),
+        "chave": "informada" if authenticated else UNAUTHENTICATED_KEY,
+        "bytes": size,
+        "duracao_s": time.perf_counter() - started,
+    }
+
+def _package_item(label, data, public_key, base_dir):
+    """
+    Item de verificação de um objeto JSON lido: registro exportado ou pacote avulso.
+
+    A chave informada (public_key) sempre prevalece; a do pacote só é usada
+    quando nenhuma foi informada, e o item fica marcado como não autenticado.
+    """
+    authenticated = public_key is not None
+    if not isinstance(data, dict):
+        return label, None, None, base_dir, "Formato não reconhecido.", authenticated
+    if data.get("tipo") == "documento" and isinstance(data.get("documento"), dict):
+        try:
+            signature_package, record_key, error = package_from_record(data, public_key)
+        except KeyError as e:
+            return label, None, None, base_dir, f"Registro sem o campo {e}.", authenticated
+        return label, signature_package, record_key, base_dir, error, authenticated
+    if "signature" in data and "document_hash" in data:
+        return label, data, public_key or data.get("public_key"), base_dir, None, authenticated
+    return label, None, None, base_dir, "Formato não reconhecido.", authenticated
+
+def _iter_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(PACKAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def _iter_items(paths, public_key=None):
+    """
+    Itens a verificar, um por pacote, lidos sob demanda.
+
+    Yields:
+        tuple: (rótulo, pacote, chave pública, diretório do pacote, erro ou None,
+                se a chave foi informada pelo operador)
+    """
+    for path in _iter_files(paths):
+        base_dir = os.path.dirname(os.path.abspath(path))
+        if path.endswith((".jsonl", ".jsonl.gz")):
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rt", encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    label = f"{path}:{line_number}"
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        yield label, None, None, base_dir, "Linha mal formada.", public_key is not None
+                        continue
+                    if isinstance(data, dict) and data.get("tipo") == "cabecalho":
+                        continue
+                    yield _package_item(label, data, public_key, base_dir)
+            continue
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError) as e:
+            yield path, None, None, base_dir, f"Arquivo ilegível: {e}", public_key is not None
+            continue
+        yield _package_item(path, data, public_key, base_dir)
+
+def _bounded_map(pool, function, items, limit):
+    """Como pool.map, mas sem submeter mais que limit itens à frente dos resultados já lidos"""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(function, item))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def verify_packages(paths, public_key=None, workers=None, on_result=None):
+    """
+    Verifica os pacotes dos caminhos informados em um pool de processos.
+
+    Args:
+        paths: Arquivos de pacote ou diretórios
+        public_key: Chave pública confiável; se informada, é a única usada. Sem ela
+            vale a chave de cada pacote, que não autentica o remetente
+        workers: Processos (padrão: número de CPUs)
+        on_result: Função chamada com o resultado de cada pacote, na ordem de entrada
+
+    Returns:
+        dict: Totais, vazão e o resultado de cada pacote
+    """
+    started = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in _bounded_map(pool, _verify_item, _iter_items(paths, public_key), workers * 4):
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+    elapsed = time.perf_counter() - started
+    total_bytes = sum(result["bytes"] for result in results)
+    valid = sum(result["valido"] for result in results)
+    return {
+        "pacotes": len(results),
+        "validos": valid,
+        "invalidos": len(results) - valid,
+        "bytes": total_bytes,
+        "duracao_s": elapsed,
+        "pacotes_por_s": len(results) / elapsed if elapsed else None,
+        "mb_por_s": total_bytes / (1024 * 1024) / elapsed if elapsed else None,
+        "resultados": results,
+    }
+
+def _print_result(result):
+    if result["valido"]:
+        warning = "" if result["chave"] == "informada" else f" ⚠️ {UNAUTHENTICATED_KEY}"
+        print(f"✅ {result['pacote']}: assinatura válida ({result['remetente'] or 'remetente não informado'}, "
+              f"{result['bytes']} bytes, {result['duracao_s'] * 1000:.1f} ms){warning}")
+    else:
+        print(f"❌ {result['pacote']}: {result['erro']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificação offline de pacotes de assinatura")
+    parser.add_argument("caminhos", nargs="+", help="Pacotes (.json, .jsonl, .jsonl.gz) ou diretórios")
+    parser.add_argument("--chave", help="Arquivo com a chave pública confiável do remetente; "
+                        "sem ela vale a chave de cada pacote, que não autentica o remetente")
+    parser.add_argument("--processos", type=int, help="Processos de verificação (padrão: número de CPUs)")
+    parser.add_argument("--saida", help="Grava o relatório em JSON neste arquivo")
+    args = parser.parse_args()
+
+    public_key = None
+    if args.chave:
+        with open(args.chave, encoding="utf-8") as f:
+            public_key = f.read().strip()
+
+    if public_key is None:
+        print(f"⚠️ --chave não informada: cada pacote será verificado com a {UNAUTHENTICATED_KEY}.\n")
+    report = verify_packages(args.caminhos, public_key, args.processos, on_result=_print_result)
+    print(f"\n{report['pacotes']} pacote(s): {report['validos']} válido(s), {report['invalidos']} inválido(s) "
+          f"em {report['duracao_s']:.2f}s ({report['pacotes_por_s'] or 0:.1f} pacotes/s, "
+          f"{report['mb_por_s'] or 0:.1f} MB/s)")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    sys.exit(1 if report["invalidos"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Registros compactos devolvidos pelas funções de listagem.
+
+Cada registro guarda seus campos em __slots__ (sem __dict__ por instância) e é
+montado direto pelo row factory do cursor, sem passar por sqlite3.Row e por um
+dicionário copiado campo a campo. O acesso por nome continua funcionando como
+nos dicionários de antes (doc["status"]), além de doc.status.
+
+As consultas que usam row_factory(Classe) selecionam as colunas na mesma ordem
+de __slots__.
+"""
+
+class Record:
+    """Base dos registros: campos em __slots__, acessíveis como atributo ou por chave"""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except (AttributeError, TypeError):
+            raise KeyError(name) from None
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def keys(self):
+        return self.__slots__
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+def row_factory(record_class):
+    """Row factory de cursor que monta registros da classe a partir de cada linha"""
+    def factory(cursor, row):
+        return record_class(*row)
+    return factory
+
+class UserSummary(Record):
+    __slots__ = ("user_id", "nome", "email")
+
+class SentDocument(Record):
+    __slots__ = ("document_id", "document_name", "receiver_name", "receiver_email",
+                 "status", "created_at", "verified_at")
+
+class ReceivedDocument(Record):
+    __slots__ = ("document_id", "document_name", "sender_name", "sender_email",
+                 "status", "created_at", "verified_at")
+
+class DocumentSearchResult(Record):
+    __slots__ = ("document_id", "document_name", "sender_name", "sender_email",
+                 "receiver_name", "receiver_email", "status", "created_at", "verified_at")
+
+class VerificationEntry(Record):
+    __slots__ = ("result", "error_message", "verified_at", "verifier_name", "verifier_email")
@@ -1,21 +1,65 @@
 import hashlib
+import os
 import secrets
 import base64
 import json
 from datetime import datetime
+from crypto.crypto_utils import mod_inverse
+from crypto.keygen import deserialize_key
+from crypto.crypto_backend import get_backend
+import metrics
+
+# Algoritmos de hash aceitos no campo "hash_algorithm" do pacote de assinatura.
+# O mesmo algoritmo é usado no hash do conteúdo, no MGF1 e no hash de m'.
+# Todos produzem 32 bytes, mantendo o layout PSS.
+HASH_ALGORITHMS = {
+    "SHA3-256": hashlib.sha3_256,
+    "SHA-256": hashlib.sha256,
+    "BLAKE2b-256": lambda data=b"": hashlib.blake2b(data, digest_size=32),
+}
+DEFAULT_HASH_ALGORITHM = "SHA3-256"
+
+# Tamanho dos blocos lidos ao calcular o hash de arquivos em disco
+FILE_BLOCK_SIZE = 1024 * 1024
+
+# Retorna o construtor hashlib de um algoritmo suportado
+def get_hash_function(hash_algorithm):
+    try:
+        return HASH_ALGORITHMS[hash_algorithm or DEFAULT_HASH_ALGORITHM]
+    except KeyError:
+        raise ValueError(f"Algoritmo de hash não suportado: {hash_algorithm}")
 
 # Gera o hash SHA3-256 da mensagem de entrada (em bytes)
 def sha3_256_hash(msg):
     if isinstance(msg, str):
-        return hashlib.sha3_256(msg.encode()).digest()
-    return hashlib.sha3_256(msg).digest()
+        msg = msg.encode()
+    return get_backend().sha3_256(msg)
+
+# Gera o hash da mensagem com o algoritmo escolhido
+@metrics.timed("crypto.hash")
+def hash_content(msg, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    if hash_algorithm in (None, "SHA3-256"):
+        return sha3_256_hash(msg)
+    if isinstance(msg, str):
+        msg = msg.encode()
+    return get_hash_function(hash_algorithm)(msg).digest()
+
+# Gera o hash de um arquivo lendo-o em blocos, sem carregá-lo inteiro na memória
+@metrics.timed("crypto.hash_file")
+def hash_file(path, hash_algorithm=DEFAULT_HASH_ALGORITHM, block_size=FILE_BLOCK_SIZE):
+    hash_object = get_hash_function(hash_algorithm)()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            hash_object.update(block)
+    return hash_object.digest()
 
-# Máscara determinística baseada em SHA3-256, usada no esquema PSS (Mask Generation Function 1)
-def mgf1(seed, mask_len, h_len):
+# Máscara determinística baseada no hash escolhido, usada no esquema PSS (Mask Generation Function 1)
+def mgf1(seed, mask_len, h_len, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    hash_function = get_hash_function(hash_algorithm)
     T = b""
     # Gera blocos de hash até alcançar o comprimento desejado
     for i in range((mask_len + h_len - 1) // h_len):
-        T += hashlib.sha3_256(seed + i.to_bytes(4, "big")).digest()
+        T += hash_function(seed + i.to_bytes(4, "big")).digest()
     return T[:mask_len]
 
 # Aplica operação XOR byte a byte entre dois blocos de bytes
@@ -23,7 +67,7 @@ def xor_bytes(b1, b2):
     return bytes(x ^ y for x, y in zip(b1, b2))
 
 # Codifica a mensagem usando o esquema PSS (Probabilistic Signature Scheme)
-def pss_encode(m_hash, em_len, salt_len=32):
+def pss_encode(m_hash, em_len, salt_len=32, em_bits=None):
     h_len = len(m_hash)
 
     # Verifica se o tamanho é suficiente para o encoding
@@ -46,13 +90,17 @@ def pss_encode(m_hash, em_len, salt_len=32):
     # Aplica máscara sobre DB
     masked_db = xor_bytes(db, mgf1(h, len(db), h_len))
 
+    # Zera os bits mais altos (8*em_len - em_bits), garantindo EM < n (RFC 8017, 9.1.1)
+    if em_bits is not None:
+        masked_db = bytes([masked_db[0] & (0xFF >> (8 * em_len - em_bits))]) + masked_db[1:]
+
     # Concatena partes finais: maskedDB || H || 0xbc
     return masked_db + h + b"\xbc"
 
 # Realiza a assinatura da mensagem com chave privada usando RSA-PSS
 def rsa_pss_sign(message, private_key, em_len, salt_len=32):
     # Codifica a mensagem com PSS
-    em = pss_encode(sha3_256_hash(message), em_len, salt_len)
+    em = pss_encode(sha3_256_hash(message), em_len, salt_len, private_key[0].bit_length() - 1)
 
     # Converte para inteiro e aplica operação RSA: sig = em^d mod n
     return pow(int.from_bytes(em, "big"), private_key[1], private_key[0])
@@ -61,32 +109,204 @@ def rsa_pss_sign(message, private_key, em_len, salt_len=32):
 def format_signature(sig_int, em_len):
     return base64.b64encode(sig_int.to_bytes(em_len, "big")).decode()
 
-def sign_document_content(document_content, private_key, sender_email, receiver_email):
+def sign_digest(m_hash, private_key, salt_len=32, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Assina um hash já calculado (pré-hash), sem reprocessar o conteúdo.
+    Retorna a assinatura em Base64.
+    """
+    return Signer(private_key, salt_len, hash_algorithm=hash_algorithm).sign_digest(m_hash)
+
+@metrics.timed("sign.hash_and_sign")
+def sign_document_content(document_content, private_key, sender_email, receiver_email, content_type=None,
+                          hash_algorithm=DEFAULT_HASH_ALGORITHM, digest_mode="flat", chunk_size=None, leaves=None):
     """
     Assina o conteúdo de um documento e retorna pacote completo
     """
-    # Calcula hash do documento
-    document_hash = sha3_256_hash(document_content)
-    
-    # Calcula tamanho da assinatura baseado na chave
-    em_len = (private_key[0].bit_length() + 7) // 8
-    
-    # Gera assinatura
-    signature_int = rsa_pss_sign(document_content, private_key, em_len)
-    signature_b64 = format_signature(signature_int, em_len)
-    
-    # Cria pacote de assinatura
-    signature_package = {
-        "document_content": base64.b64encode(document_content.encode()).decode(),
-        "document_hash": base64.b64encode(document_hash).decode(),
-        "signature": signature_b64,
-        "sender_email": sender_email,
-        "receiver_email": receiver_email,
-        "timestamp": datetime.now().isoformat(),
-        "algorithm": "RSA-PSS",
-        "hash_algorithm": "SHA3-256"
-    }
-    
-    return signature_package
+    return Signer(private_key, hash_algorithm=hash_algorithm).sign_document(
+        document_content, sender_email, receiver_email, content_type, digest_mode, chunk_size, leaves
+    )
+
+@metrics.timed("sign.hash_and_sign")
+def sign_detached_file(path, private_key, sender_email, receiver_email, content_type=None,
+                       hash_algorithm=DEFAULT_HASH_ALGORITHM, digest_mode="flat", chunk_size=None, leaves=None):
+    """
+    Assina um arquivo no disco sem copiar o conteúdo para o pacote (assinatura destacada)
+    """
+    return Signer(private_key, hash_algorithm=hash_algorithm).sign_file(
+        path, sender_email, receiver_email, content_type, digest_mode, chunk_size, leaves
+    )
+
+class Signer:
+    """
+    Assinador RSA-PSS reutilizável.
+
+    Valida a chave privada uma única vez e pré-calcula em_len, o layout do
+    bloco PSS e, quando os primos p e q são informados, os parâmetros do
+    Teorema Chinês do Resto (CRT), que tornam a exponenciação ~3x mais rápida.
+    Com um backend acelerado (ver crypto_backend), a assinatura é delegada a ele.
+    """
+    __slots__ = ("n", "d", "k", "em_len", "salt_len", "h_len", "hash_algorithm",
+                 "_ps", "_db_len", "_top_mask", "_crt", "_backend")
+
+    def __init__(self, private_key, salt_len=32, primes=None, backend=None, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+        """
+        Args:
+            private_key: Tupla (n, d) ou chave privada serializada
+            salt_len: Tamanho do salt PSS em bytes
+            primes: Tupla opcional (p, q) com os fatores de n
+            backend: Backend criptográfico (padrão: o configurado em CRYPTO_BACKEND)
+            hash_algorithm: Algoritmo de hash padrão (ver HASH_ALGORITHMS)
+        """
+        if isinstance(private_key, str):
+            private_key = deserialize_key(private_key, "PRIVATE")
+        n, d = private_key
+        if n <= 0 or not 0 < d < n:
+            raise ValueError("Chave privada inválida")
+
+        self.n = n
+        self.d = d
+        self.salt_len = salt_len
+        self.hash_algorithm = hash_algorithm
+        self.h_len = get_hash_function(hash_algorithm)().digest_size
+        self._backend = backend or get_backend()
+
+        # k: tamanho da assinatura; em_len: tamanho do EM, com em_bits = bits(n) - 1
+        em_bits = n.bit_length() - 1
+        self.k = (n.bit_length() + 7) // 8
+        self.em_len = (em_bits + 7) // 8
+        self._top_mask = 0xFF >> (8 * self.em_len - em_bits)
+
+        # Layout do EM: maskedDB (PS || 0x01 || salt) || H || 0xbc
+        if self.em_len < self.h_len + salt_len + 2:
+            raise ValueError("EM too short")
+        self._db_len = self.em_len - self.h_len - 1
+        self._ps = b"\x00" * (self._db_len - salt_len - 1)
+
+        self._crt = None
+        if primes is not None:
+            p, q = primes
+            if p * q != n:
+                raise ValueError("Os primos informados não correspondem ao módulo da chave")
+            # dp = d mod (p-1), dq = d mod (q-1), q_inv = q^-1 mod p
+            self._crt = (p, q, d % (p - 1), d % (q - 1), mod_inverse(q, p))
+
+    def _private_op(self, m):
+        if self._crt is None:
+            return pow(m, self.d, self.n)
+        p, q, dp, dq, q_inv = self._crt
+        m1 = pow(m, dp, p)
+        m2 = pow(m, dq, q)
+        return m2 + q * ((q_inv * (m1 - m2)) % p)
+
+    @metrics.timed("crypto.rsa_sign")
+    def sign_digest(self, m_hash, hash_algorithm=None):
+        """Assina um hash já calculado e retorna a assinatura em Base64"""
+        hash_algorithm = hash_algorithm or self.hash_algorithm
+        if len(m_hash) != self.h_len:
+            raise ValueError("Tamanho de hash inválido")
+        if self._backend.accelerated:
+            return self._backend.sign_digest(m_hash, (self.n, self.d), self.salt_len, hash_algorithm)
+        salt = secrets.token_bytes(self.salt_len)
+        h = get_hash_function(hash_algorithm)(b"\x00" * 8 + m_hash + salt).digest()
+        db = self._ps + b"\x01" + salt
+        masked_db = xor_bytes(db, mgf1(h, self._db_len, self.h_len, hash_algorithm))
+        # Zera os bits excedentes para que EM < n
+        em = bytes([masked_db[0] & self._top_mask]) + masked_db[1:] + h + b"\xbc"
+        return format_signature(self._private_op(int.from_bytes(em, "big")), self.k)
+
+    def sign(self, message):
+        """Assina a mensagem (str ou bytes) e retorna a assinatura em Base64"""
+        return self.sign_digest(hash_content(message, self.hash_algorithm))
+
+    def sign_many(self, messages):
+        """Assina várias mensagens com a mesma chave, retornando as assinaturas em Base64"""
+        return [self.sign(message) for message in messages]
+
+    def sign_document(self, document_content, sender_email, receiver_email, content_type=None,
+                      digest_mode="flat", chunk_size=None, leaves=None):
+        """
+        Assina o conteúdo de um documento e retorna o pacote de assinatura.
+
+        Args:
+            document_content: Conteúdo em str (texto) ou bytes
+            content_type: "text" ou "binary"; se omitido, é deduzido do tipo do conteúdo.
+                          Fica registrado no pacote para a verificação não precisar adivinhar.
+            digest_mode: "flat" (hash único do conteúdo) ou "merkle" (raiz da árvore de
+                         Merkle dos blocos de chunk_size bytes, ver merkle.py)
+            leaves: Folhas da árvore já calculadas (ex.: em paralelo a partir do arquivo)
+        """
+        if isinstance(document_content, str):
+            document_content = document_content.encode()
+            content_type = content_type or "text"
+        content_type = content_type or "binary"
+
+        # Calcula hash do documento (única passada sobre o conteúdo)
+        if digest_mode == "merkle":
+            from crypto.merkle import DEFAULT_CHUNK_SIZE, leaf_hashes, merkle_root
+            chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+            if leaves is None:
+                leaves = leaf_hashes(document_content, chunk_size, self.hash_algorithm)
+            document_hash = merkle_root(leaves, self.hash_algorithm)
+        elif digest_mode == "flat":
+            document_hash = hash_content(document_content, self.hash_algorithm)
+        else:
+            raise ValueError(f"Modo de hash desconhecido: {digest_mode}")
+        
+        # Gera assinatura a partir do mesmo hash
+        signature_b64 = self.sign_digest(document_hash)
+        
+        # Cria pacote de assinatura
+        signature_package = {
+            "document_content": base64.b64encode(document_content).decode(),
+            "content_type": content_type,
+            "document_hash": base64.b64encode(document_hash).decode(),
+            "signature": signature_b64,
+            "sender_email": sender_email,
+            "receiver_email": receiver_email,
+            "timestamp": datetime.now().isoformat(),
+            "algorithm": "RSA-PSS",
+            "hash_algorithm": self.hash_algorithm,
+            "digest_mode": digest_mode
+        }
+        if digest_mode == "merkle":
+            signature_package["chunk_size"] = chunk_size
+        
+        return signature_package
+
+    def sign_file(self, path, sender_email, receiver_email, content_type=None,
+                  digest_mode="flat", chunk_size=None, leaves=None):
+        """
+        Assina um arquivo no disco em modo destacado: o hash é calculado lendo o
+        arquivo em blocos e o pacote guarda apenas o caminho, o tamanho e a data
+        de modificação, em vez do conteúdo.
+        """
+        if digest_mode == "merkle":
+            from crypto.merkle import DEFAULT_CHUNK_SIZE, leaf_hashes_from_file, merkle_root
+            chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+            if leaves is None:
+                leaves = leaf_hashes_from_file(path, chunk_size, self.hash_algorithm)
+            document_hash = merkle_root(leaves, self.hash_algorithm)
+        elif digest_mode == "flat":
+            document_hash = hash_file(path, self.hash_algorithm)
+        else:
+            raise ValueError(f"Modo de hash desconhecido: {digest_mode}")
 
+        stat = os.stat(path)
+        signature_package = {
+            "file_path": os.path.abspath(path),
+            "file_size": stat.st_size,
+            "file_mtime": stat.st_mtime,
+            "content_type": content_type or "binary",
+            "document_hash": base64.b64encode(document_hash).decode(),
+            "signature": self.sign_digest(document_hash),
+            "sender_email": sender_email,
+            "receiver_email": receiver_email,
+            "timestamp": datetime.now().isoformat(),
+            "algorithm": "RSA-PSS",
+            "hash_algorithm": self.hash_algorithm,
+            "digest_mode": digest_mode
+        }
+        if digest_mode == "merkle":
+            signature_package["chunk_size"] = chunk_size
 
+        return signature_package
@@ -0,0 +1,58 @@
+"""
+Configuração comum dos testes.
+
+Os módulos importam os utilitários criptográficos como o pacote "crypto"
+(crypto.keygen, crypto.signature, ...), cujos módulos são os próprios arquivos
+da raiz do repositório. Quando esse pacote não está instalado, a raiz é
+registrada com esse nome para que os imports funcionem como no projeto.
+"""
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+if importlib.util.find_spec("crypto") is None:
+    package = types.ModuleType("crypto")
+    package.__path__ = [ROOT]
+    sys.modules["crypto"] = package
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Banco de dados novo e vazio em um diretório temporário."""
+    import database
+
+    monkeypatch.setattr(database, "DATABASE_NAME", str(tmp_path / "test.db"))
+    database.create_tables()
+    return database
+
+
+@pytest.fixture(scope="session")
+def password_hash():
+    """Hash bcrypt da senha "senha", calculado uma vez por sessão"""
+    import auth
+
+    return auth.hash_password("senha")
+
+
+@pytest.fixture
+def make_user(db, password_hash):
+    """Cadastra um usuário com a senha "senha" e o email já verificado; devolve o user_id"""
+    def make(nome, email):
+        conn = db.get_db_connection()
+        try:
+            user_id = conn.execute("INSERT INTO users (nome, email, senha_hash, email_verified) VALUES (?, ?, ?, TRUE)",
+                                   (nome, email, password_hash)).lastrowid
+            conn.commit()
+        finally:
+            conn.close()
+        return user_id
+
+    return make
@@ -0,0 +1,49 @@
+import base64
+import hashlib
+
+import pytest
+
+pytest.importorskip("cryptography")
+from crypto import crypto_backend
+from crypto.signature import pss_encode
+
+
+@pytest.fixture(scope="module")
+def openssl():
+    return crypto_backend.get_backend("openssl")
+
+
+@pytest.fixture(scope="module")
+def keys(openssl):
+    return openssl.generate_rsa_keys(2048)
+
+
+def _legacy_signature(m_hash, private_key):
+    """Assinatura no formato antigo: EM com os bits altos não zerados"""
+    n, d = private_key
+    em_len = (n.bit_length() - 1 + 7) // 8
+    while True:
+        em = int.from_bytes(pss_encode(m_hash, em_len), "big")
+        if em >> (n.bit_length() - 1) and em < n:
+            return base64.b64encode(pow(em, d, n).to_bytes(em_len, "big")).decode()
+
+
+def test_verify_digest_aceita_assinatura_antiga(openssl, keys):
+    public_key, private_key = keys
+    m_hash = hashlib.sha3_256(b"documento").digest()
+
+    assert openssl.verify_digest(m_hash, _legacy_signature(m_hash, private_key), public_key)
+
+
+def test_verify_digest_rejeita_sem_reverificar_em_python(openssl, keys, monkeypatch):
+    public_key, private_key = keys
+    m_hash = hashlib.sha3_256(b"documento").digest()
+    signature = openssl.sign_digest(m_hash, private_key)
+    other = hashlib.sha3_256(b"outro documento").digest()
+
+    calls = []
+    monkeypatch.setattr(crypto_backend._PURE_PYTHON, "verify_digest", lambda *args: calls.append(args))
+
+    assert openssl.verify_digest(m_hash, signature, public_key)
+    assert not openssl.verify_digest(other, signature, public_key)
+    assert calls == []
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+
+import document_manager
+
+
+@pytest.fixture
+def fanout(db, make_user):
+    """Documento de envio múltiplo gravado direto no banco, com três entregas"""
+    sender = make_user("Remetente", "remetente@x")
+    receivers = [make_user(f"Destinatário {i}", f"dest{i}@x") for i in range(3)]
+    conn = db.get_db_connection()
+    try:
+        conn.execute("""
+            INSERT INTO documents (document_id, sender_id, receiver_id, document_name, document_content,
+                                   document_hash, public_key, private_key_encrypted, signature, delivery_mode)
+            VALUES ('doc', ?, ?, 'contrato', '', '', '', '', '', 'fanout')
+        """, (sender, receivers[0]))
+        conn.executemany("INSERT INTO document_deliveries (document_id, receiver_id) VALUES ('doc', ?)",
+                         [(receiver,) for receiver in receivers])
+        conn.commit()
+    finally:
+        conn.close()
+    return db, sender, receivers
+
+
+def _verify(db, receiver_id, status, verified_at):
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        document_manager._update_delivery_status(cursor, "doc", receiver_id, status, verified_at)
+        conn.commit()
+        return tuple(conn.execute("SELECT status, verified_at FROM documents WHERE document_id = 'doc'").fetchone())
+    finally:
+        conn.close()
+
+
+def test_documento_so_fica_verificado_com_todas_as_entregas(fanout):
+    db, _, receivers = fanout
+    times = [datetime(2026, 1, day) for day in (3, 1, 2)]
+
+    assert _verify(db, receivers[0], "verified", times[0]) == ("sent", str(times[0]))
+    assert _verify(db, receivers[1], "verified", times[1]) == ("sent", str(times[0]))
+    # Com todas verificadas, vale a verificação mais recente
+    assert _verify(db, receivers[2], "verified", times[2]) == ("verified", str(times[0]))
+
+
+def test_uma_entrega_rejeitada_rejeita_o_documento(fanout):
+    db, _, receivers = fanout
+    now = datetime(2026, 1, 1)
+
+    assert _verify(db, receivers[1], "rejected", now)[0] == "rejected"
+    assert _verify(db, receivers[0], "verified", now)[0] == "rejected"
+    assert _verify(db, receivers[2], "verified", now)[0] == "rejected"
+    # A nova verificação do destinatário que rejeitou libera o documento
+    assert _verify(db, receivers[1], "verified", now)[0] == "verified"
+
+
+def test_verificacao_de_quem_nao_e_destinatario_nao_altera_status(fanout):
+    db, sender, _ = fanout
+
+    assert _verify(db, sender, "rejected", datetime(2026, 1, 1)) == ("sent", None)
+
+
+def test_envio_multiplo_e_verificacao_por_destinatario(make_user, tmp_path):
+    sender = make_user("Remetente", "remetente@x")
+    first, second = make_user("B", "b@x"), make_user("C", "c@x")
+    path = tmp_path / "contrato.txt"
+    path.write_text("conteúdo do contrato", encoding="utf-8")
+
+    ok, message, document_id = document_manager.sign_and_send_file(
+        sender, "remetente@x", [(first, "b@x"), (second, "c@x"), (first, "b@x")], str(path), "senha")
+    assert ok, message
+
+    def statuses():
+        received = {user: {d["document_id"]: d["status"] for d in document_manager.get_received_documents(user)}
+                    for user in (first, second)}
+        return received[first][document_id], received[second][document_id]
+
+    assert statuses() == ("sent", "sent")
+    assert document_manager.verify_document(document_id, first)[0]
+    assert statuses() == ("verified", "sent")
+    assert document_manager.get_document_details(document_id, sender)["status"] == "sent"
+    assert document_manager.verify_document(document_id, second)[0]
+    assert statuses() == ("verified", "verified")
+    assert document_manager.get_document_details(document_id, sender)["status"] == "verified"
@@ -0,0 +1,41 @@
+import io
+import os
+import tarfile
+import uuid
+
+import document_transfer
+
+
+def _add(tar, name, data=b"conteudo", kind=tarfile.REGTYPE, linkname=""):
+    info = tarfile.TarInfo(name)
+    info.type = kind
+    info.linkname = linkname
+    info.size = len(data) if kind == tarfile.REGTYPE else 0
+    tar.addfile(info, io.BytesIO(data) if kind == tarfile.REGTYPE else None)
+
+
+def test_read_tar_rejeita_membros_fora_do_diretorio(tmp_path):
+    files_dir = tmp_path / "importados"
+    victim = tmp_path / "database.db"
+    victim.write_bytes(b"original")
+    document_id = str(uuid.uuid4())
+
+    archive = tmp_path / "malicioso.tar"
+    with tarfile.open(archive, "w") as tar:
+        _add(tar, "arquivos/../database.db", b"atacante")
+        _add(tar, "arquivos/../../database.db", b"atacante")
+        _add(tar, f"arquivos/{document_id}/..", b"atacante")
+        _add(tar, "arquivos/nao-e-uuid/doc.txt", b"atacante")
+        _add(tar, f"arquivos/{document_id}/link", kind=tarfile.SYMTYPE, linkname=str(victim))
+        _add(tar, f"arquivos/{document_id}/hard", kind=tarfile.LNKTYPE, linkname="database.db")
+        _add(tar, f"arquivos/{document_id}/doc.txt", b"legitimo")
+
+    results = list(document_transfer.read_tar(str(archive), str(files_dir)))
+
+    assert victim.read_bytes() == b"original"
+    rejected = {name for name, record in results if record is None}
+    assert rejected == {"arquivos/../database.db", "arquivos/../../database.db",
+                        f"arquivos/{document_id}/..", "arquivos/nao-e-uuid/doc.txt"}
+    assert sorted(os.listdir(files_dir)) == [document_id]
+    assert os.listdir(files_dir / document_id) == ["doc.txt"]
+    assert (files_dir / document_id / "doc.txt").read_bytes() == b"legitimo"
@@ -0,0 +1,129 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    """Fila vazia com o tipo de tarefa "items", que processa params["items"] com um checkpoint por item"""
+    processed = []
+    hooks = {}
+
+    def items(job):
+        state = job.state or {"next": 0}
+        for index in range(state["next"], len(job.params["items"])):
+            job.checkpoint({"next": index}, index, len(job.params["items"]))
+            job.check()
+            if index in hooks:
+                hooks.pop(index)(job)
+            processed.append(job.params["items"][index])
+        job.checkpoint({"next": len(job.params["items"])}, len(job.params["items"]))
+        return {"processados": len(job.params["items"])}
+
+    monkeypatch.setitem(jobs.HANDLERS, "items", items)
+    conn = db.get_db_connection()
+    yield conn, processed, hooks
+    conn.close()
+
+
+def _job(conn, job_id):
+    return conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+
+
+def _make_stale(conn, job_id):
+    conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (datetime.now() - timedelta(days=1), job_id))
+    conn.commit()
+
+
+def test_claim_pega_as_tarefas_em_ordem(queue):
+    conn, _, _ = queue
+    first, second = jobs.enqueue("items", {"items": []}), jobs.enqueue("items", {"items": []})
+
+    row = jobs._claim_job(conn, "w1")
+    assert (row["job_id"], row["status"], row["worker"], row["attempts"]) == (first, "running", "w1", 1)
+    assert jobs._claim_job(conn, "w2")["job_id"] == second
+    assert jobs._claim_job(conn, "w3") is None
+
+    # Heartbeat parado: a tarefa volta para a fila e é pega por outro worker
+    _make_stale(conn, first)
+    row = jobs._claim_job(conn, "w3")
+    assert (row["job_id"], row["worker"], row["attempts"]) == (first, "w3", 2)
+
+
+def test_tarefa_interrompida_continua_do_checkpoint(queue):
+    conn, processed, hooks = queue
+    job_id = jobs.enqueue("items", {"items": ["a", "b", "c", "d"]})
+    stop = threading.Event()
+    hooks[2] = lambda job: stop.set()
+
+    assert jobs.run_job(conn, jobs._claim_job(conn, "w1"), stop) == "pending"
+    row = _job(conn, job_id)
+    assert (row["status"], row["worker"], row["progress_done"]) == ("pending", None, 3)
+
+    # A retomada começa no item do último checkpoint, sem repetir nem pular itens
+    assert jobs.run_job(conn, jobs._claim_job(conn, "w2"), threading.Event()) == "done"
+    assert processed == ["a", "b", "c", "d"]
+    job = jobs.get_jobs(job_id)[0]
+    assert (job["status"], job["attempts"], job["result"]) == ("done", 2, {"processados": 4})
+
+
+def test_worker_que_perdeu_a_tarefa_nao_grava(db, queue):
+    conn, processed, hooks = queue
+    job_id = jobs.enqueue("items", {"items": ["a", "b", "c"]})
+    other = db.get_db_connection()
+    taken = {}
+
+    def take_over(job):
+        # O heartbeat de w1 para e w2 pega a tarefa enquanto w1 processa o item 1
+        _make_stale(other, job_id)
+        taken["row"] = jobs._claim_job(other, "w2")
+
+    hooks[1] = take_over
+    try:
+        assert jobs.run_job(conn, jobs._claim_job(conn, "w1"), threading.Event()) == "lost"
+        row = _job(conn, job_id)
+        assert (row["status"], row["worker"], row["attempts"]) == ("running", "w2", 2)
+        # O checkpoint de w1 depois da troca de dono não foi gravado
+        assert jobs.get_jobs(job_id)[0]["state"] == {"next": 1}
+
+        assert jobs.run_job(other, taken["row"], threading.Event()) == "done"
+    finally:
+        other.close()
+    assert processed == ["a", "b", "b", "c"]
+    assert _job(conn, job_id)["status"] == "done"
+
+
+def test_checkpoint_de_dono_antigo_e_recusado(db, queue):
+    conn, _, _ = queue
+    job_id = jobs.enqueue("items", {"items": ["a"]})
+    old = jobs.Job(conn, jobs._claim_job(conn, "w1"), threading.Event(), {})
+    _make_stale(conn, job_id)
+    jobs._claim_job(conn, "w2")
+
+    assert old.should_stop()
+    with pytest.raises(jobs.JobInterrupted):
+        old.check()
+    with pytest.raises(jobs.JobInterrupted):
+        old.checkpoint({"next": 1}, 1, 1)
+    assert jobs.get_jobs(job_id)[0]["state"] is None
+
+
+def test_cancelamento_e_retomada(queue):
+    conn, processed, hooks = queue
+    job_id = jobs.enqueue("items", {"items": ["a", "b", "c"]})
+    hooks[0] = lambda job: jobs.cancel_job(job_id)
+
+    assert jobs.run_job(conn, jobs._claim_job(conn, "w1"), threading.Event()) == "cancelled"
+    assert processed == ["a"]
+    assert jobs.cancel_job(job_id)[0] is False
+
+    assert jobs.requeue_job(job_id)[0]
+    assert jobs.run_job(conn, jobs._claim_job(conn, "w1"), threading.Event()) == "done"
+    assert processed == ["a", "b", "c"]
+
+    pending = jobs.enqueue("items", {"items": ["x"]})
+    assert jobs.cancel_job(pending)[0]
+    assert jobs._claim_job(conn, "w1") is None
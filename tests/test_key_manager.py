@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import document_manager
+import key_manager
+from crypto import crypto_backend
+
+
+@pytest.fixture(autouse=True)
+def isolated_keys(monkeypatch):
+    # A geração de chaves em Python puro é lenta; com o pacote cryptography
+    # instalado, as chaves de usuário são geradas pelo backend do OpenSSL
+    try:
+        openssl = crypto_backend.get_backend("openssl")
+    except ImportError:
+        openssl = None
+    if openssl:
+        monkeypatch.setattr(key_manager, "get_backend", lambda: openssl)
+    key_manager.clear_user_key_cache()
+    yield
+    key_manager.clear_user_key_cache()
+
+
+def _key_rows(db, user_id):
+    conn = db.get_db_connection()
+    try:
+        return [tuple(row) for row in conn.execute(
+            "SELECT key_id, status FROM user_keys WHERE user_id = ? ORDER BY key_id", (user_id,))]
+    finally:
+        conn.close()
+
+
+def _set_validity(db, key_id, valid_from, valid_until):
+    conn = db.get_db_connection()
+    try:
+        conn.execute("UPDATE user_keys SET valid_from = ?, valid_until = ? WHERE key_id = ?",
+                     (valid_from, valid_until, key_id))
+        conn.commit()
+    finally:
+        conn.close()
+    key_manager.clear_user_key_cache()
+
+
+def test_chave_criada_na_primeira_assinatura_e_reutilizada(db, make_user):
+    user = make_user("A", "a@x")
+
+    key_id, private_key = key_manager.get_signing_key(user, "senha")
+    assert key_manager.get_signing_key(user, "senha") == (key_id, private_key)
+    assert _key_rows(db, user) == [(key_id, "active")]
+    with pytest.raises(ValueError):
+        key_manager.get_signing_key(user, "outra senha")
+
+
+def test_rotacao_aposenta_a_chave_anterior(db, make_user):
+    user = make_user("A", "a@x")
+    old_key_id, _ = key_manager.get_signing_key(user, "senha")
+
+    ok, _ = key_manager.rotate_user_key(user, "outra senha")
+    assert not ok
+    assert _key_rows(db, user) == [(old_key_id, "active")]
+
+    ok, _ = key_manager.rotate_user_key(user, "senha")
+    assert ok
+    (_, retired), (new_key_id, active) = _key_rows(db, user)
+    assert (retired, active) == ("retired", "active")
+    assert key_manager.get_signing_key(user, "senha")[0] == new_key_id
+    # A chave aposentada continua disponível para verificar o que assinou
+    assert key_manager.get_user_public_key(old_key_id)[0] == user
+
+
+def test_chave_expirada_e_substituida(db, make_user):
+    user = make_user("A", "a@x")
+    old_key_id, _ = key_manager.get_signing_key(user, "senha")
+    _set_validity(db, old_key_id, datetime.now() - timedelta(days=400), datetime.now() - timedelta(days=35))
+
+    new_key_id, _ = key_manager.get_signing_key(user, "senha")
+    assert new_key_id != old_key_id
+    assert _key_rows(db, user) == [(old_key_id, "retired"), (new_key_id, "active")]
+
+
+def test_chave_inexistente_nao_fica_em_cache(db, make_user):
+    user = make_user("A", "a@x")
+    assert key_manager.get_user_public_key(1) is None
+
+    key_id, _ = key_manager.get_signing_key(user, "senha")
+    assert key_id == 1
+    assert key_manager.get_user_public_key(1)[0] == user
+
+
+def test_documento_verificado_com_a_chave_valida_na_data_de_envio(db, make_user, tmp_path, monkeypatch):
+    monkeypatch.setattr(document_manager, "KEY_MODE", "user")
+    sender, receiver, other = make_user("A", "a@x"), make_user("B", "b@x"), make_user("C", "c@x")
+    path = tmp_path / "contrato.txt"
+    path.write_text("conteúdo do contrato", encoding="utf-8")
+
+    def send():
+        ok, message, document_id = document_manager.sign_and_send_file(
+            sender, "a@x", [(receiver, "b@x")], str(path), "senha")
+        assert ok, message
+        return document_id
+
+    old_document = send()
+    assert key_manager.rotate_user_key(sender, "senha")[0]
+    new_document = send()
+    details = {document_id: document_manager.get_document_details(document_id, receiver)
+               for document_id in (old_document, new_document)}
+    assert details[old_document]["key_id"] != details[new_document]["key_id"]
+    assert not details[old_document]["public_key"]
+
+    # A rotação não invalida os documentos assinados com a chave anterior
+    assert document_manager.verify_document(old_document, receiver)[0]
+    assert document_manager.verify_document(new_document, receiver)[0]
+
+    # Fora da validade da chave na data de envio, o documento é rejeitado
+    key_id = details[old_document]["key_id"]
+    _set_validity(db, key_id, datetime.now() + timedelta(days=1), datetime.now() + timedelta(days=2))
+    ok, message = document_manager.verify_document(old_document, receiver)
+    assert not ok and "fora do período de validade" in message
+
+    # A chave precisa pertencer ao remetente
+    conn = db.get_db_connection()
+    conn.execute("UPDATE user_keys SET user_id = ? WHERE key_id = ?", (other, details[new_document]["key_id"]))
+    conn.commit()
+    conn.close()
+    key_manager.clear_user_key_cache()
+    ok, message = document_manager.verify_document(new_document, receiver)
+    assert not ok and "não encontrada" in message
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from crypto.merkle import (leaf_hash, leaf_hashes, leaf_hashes_from_file, merkle_root, inclusion_proof,
+                           range_proofs, verify_chunks)
+
+CHUNK_SIZE = 16
+
+
+def _chunks(data):
+    return [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+
+
+@pytest.mark.parametrize("blocks", [1, 2, 5, 8, 13])
+def test_range_proofs_verificam_qualquer_intervalo(blocks):
+    chunks = _chunks(os.urandom(blocks * CHUNK_SIZE))
+    leaves = leaf_hashes(b"".join(chunks), CHUNK_SIZE, workers=1)
+    root = merkle_root(leaves)
+
+    for first in range(blocks):
+        for last in range(first + 1, blocks + 1):
+            proofs = range_proofs(leaves, first, last)
+            assert sorted(proofs) == list(range(first, last))
+            assert all(proofs[i] == inclusion_proof(leaves, i) for i in proofs)
+            assert verify_chunks(chunks[first:last], first, proofs, root) == []
+
+
+def test_verify_chunks_aponta_blocos_alterados():
+    chunks = _chunks(os.urandom(7 * CHUNK_SIZE))
+    leaves = [leaf_hash(chunk) for chunk in chunks]
+    root = merkle_root(leaves)
+    proofs = range_proofs(leaves, 2, 6)
+
+    altered = list(chunks[2:6])
+    altered[1] = b"x" * CHUNK_SIZE
+    altered[3] = altered[3][:-1]
+    assert verify_chunks(altered, 2, proofs, root) == [3, 5]
+
+    # Blocos corretos, mas fora da posição provada
+    assert verify_chunks(chunks[3:7], 2, proofs, root) == [2, 3, 4, 5]
+
+
+def test_verify_chunks_rejeita_outra_raiz():
+    chunks = _chunks(os.urandom(4 * CHUNK_SIZE))
+    leaves = [leaf_hash(chunk) for chunk in chunks]
+    proofs = range_proofs(leaves, 0, 4)
+    other_root = merkle_root([leaf_hash(b"outro")] + leaves[1:])
+
+    assert verify_chunks(chunks, 0, proofs, other_root) == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize("first, last", [(-1, 2), (2, 2), (3, 1), (0, 6)])
+def test_range_proofs_rejeita_intervalo_invalido(first, last):
+    leaves = [leaf_hash(bytes([i])) for i in range(5)]
+    with pytest.raises(IndexError):
+        range_proofs(leaves, first, last)
+
+
+def test_folhas_em_paralelo_iguais_as_sequenciais(tmp_path):
+    data = os.urandom(9 * CHUNK_SIZE + 3)
+    path = tmp_path / "dados.bin"
+    path.write_bytes(data)
+
+    expected = [leaf_hash(chunk) for chunk in _chunks(data)]
+    assert leaf_hashes(data, CHUNK_SIZE, workers=4) == expected
+    assert leaf_hashes_from_file(str(path), CHUNK_SIZE, workers=2) == expected
+    # Conteúdo vazio ainda tem uma folha
+    assert leaf_hashes(b"", CHUNK_SIZE) == [leaf_hash(b"")]
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Importação de usuários em lote a partir de CSV ou JSONL.
+
+register_user trata um usuário por chamada (consulta o email, calcula o bcrypt,
+insere e confirma), o que leva horas para um diretório de dezenas de milhares
+de pessoas. Aqui:
+
+- os emails do arquivo são comparados com os já cadastrados em uma única
+  consulta (tabela temporária + índice único de users.email);
+- o bcrypt é calculado em um pool de processos;
+- as linhas de users são inseridas com executemany, uma transação por lote.
+
+Cada linha rejeitada entra no relatório de erros com o número da linha.
+Usuários importados sem --verificados recebem o código de verificação no
+primeiro login, como já acontece em login_user.
+
+Formato (CSV com cabeçalho, ou um objeto JSON por linha):
+    nome,email,senha
+
+Uso:
+    python user_import.py usuarios.csv [--verificados] [--processos N] [--lote N] [--relatorio erros.json]
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from database import get_db_connection
+from auth import hash_password
+
+REQUIRED_FIELDS = ("nome", "email", "senha")
+
+def read_records(path, file_format=None):
+    """
+    Lê os registros do arquivo, detectando o formato pela extensão.
+
+    Yields:
+        tuple: (número da linha, dicionário do registro ou None se a linha for inválida)
+    """
+    file_format = file_format or ("jsonl" if path.endswith((".jsonl", ".json")) else "csv")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if file_format == "csv":
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else None
+
+def _validate(record):
+    """Retorna (nome, email, senha) normalizados ou a mensagem de erro"""
+    if record is None:
+        return None, "Linha mal formada."
+    values = {field: str(record.get(field) or "").strip() for field in REQUIRED_FIELDS}
+    missing = [field for field in REQUIRED_FIELDS if not values[field]]
+    if missing:
+        return None, f"Campo(s) obrigatório(s) ausente(s): {', '.join(missing)}."
+    if "@" not in values["email"]:
+        return None, "Email inválido."
+    # A senha não passa pelo strip: espaços podem fazer parte dela
+    return (values["nome"], values["email"], str(record["senha"])), None
+
+def _existing_emails(conn, emails):
+    """Emails do lote que já estão cadastrados, em uma consulta pelo índice de users.email"""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_emails (email TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM import_emails")
+    conn.executemany("INSERT OR IGNORE INTO import_emails (email) VALUES (?)", ((email,) for email in emails))
+    existing = {row[0] for row in conn.execute(
+        "SELECT i.email FROM import_emails i JOIN users u ON u.email = i.email")}
+    conn.execute("DELETE FROM import_emails")
+    return existing
+
+def _insert_batch(conn, rows, verified, errors):
+    """
+    Insere um lote em uma transação. Se o lote falhar (ex.: email cadastrado por
+    outro processo durante a importação), refaz linha a linha para apontar o erro.
+
+    Returns:
+        int: Usuários inseridos
+    """
+    sql = "INSERT INTO users (nome, email, senha_hash, email_verified) VALUES (?, ?, ?, ?)"
+    try:
+        conn.executemany(sql, [(nome, email, senha_hash, verified) for _, nome, email, senha_hash in rows])
+        conn.commit()
+        return len(rows)
+    except sqlite3.IntegrityError:
+        conn.rollback()
+
+    inserted = 0
+    for line_number, nome, email, senha_hash in rows:
+        try:
+            conn.execute(sql, (nome, email, senha_hash, verified))
+            inserted += 1
+        except sqlite3.IntegrityError as e:
+            errors.append({"linha": line_number, "email": email, "erro": f"Erro ao inserir: {e}"})
+    conn.commit()
+    return inserted
+
+def import_users(records, verified=False, workers=None, batch_size=1000):
+    """
+    Importa usuários em lote.
+
+    Args:
+        records: Iterável de (número da linha, registro), como o de read_records
+        verified: Marca os usuários como já verificados (email_verified = TRUE)
+        workers: Processos usados no bcrypt (padrão: número de CPUs)
+        batch_size: Usuários por transação
+
+    Returns:
+        dict: Quantidades lidas/importadas, tempo e a lista de erros por linha
+    """
+    started = time.perf_counter()
+    errors = []
+    valid = []
+    seen = {}
+    total = 0
+    for line_number, record in records:
+        total += 1
+        values, error = _validate(record)
+        if error is None and values[1] in seen:
+            error = f"Email repetido no arquivo (linha {seen[values[1]]})."
+        if error:
+            errors.append({"linha": line_number, "email": (record or {}).get("email"), "erro": error})
+            continue
+        seen[values[1]] = line_number
+        valid.append((line_number, *values))
+
+    imported = 0
+    conn = get_db_connection()
+    try:
+        existing = _existing_emails(conn, seen)
+        pending = []
+        for line_number, nome, email, senha in valid:
+            if email in existing:
+                errors.append({"linha": line_number, "email": email, "erro": "Email já cadastrado."})
+            else:
+                pending.append((line_number, nome, email, senha))
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, batch_size // ((workers or os.cpu_count() or 1) * 4))
+            for first in range(0, len(pending), batch_size):
+                batch = pending[first:first + batch_size]
+                hashes = pool.map(hash_password, [senha for _, _, _, senha in batch], chunksize=chunksize)
+                rows = [(line_number, nome, email, senha_hash)
+                        for (line_number, nome, email, _), senha_hash in zip(batch, hashes)]
+                imported += _insert_batch(conn, rows, verified, errors)
+    finally:
+        conn.close()
+
+    errors.sort(key=lambda error: error["linha"])
+    return {"lidos": total, "importados": imported, "rejeitados": len(errors),
+            "duracao_s": time.perf_counter() - started, "erros": errors}
+
+def main():
+    parser = argparse.ArgumentParser(description="Importação de usuários em lote")
+    parser.add_argument("arquivo", help="Arquivo CSV ou JSONL com nome, email e senha")
+    parser.add_argument("--formato", choices=("csv", "jsonl"), help="Padrão: pela extensão do arquivo")
+    parser.add_argument("--verificados", action="store_true", help="Importa os usuários já verificados")
+    parser.add_argument("--processos", type=int, help="Processos para o bcrypt (padrão: número de CPUs)")
+    parser.add_argument("--lote", type=int, default=1000, help="Usuários por transação")
+    parser.add_argument("--relatorio", help="Grava o relatório de erros em JSON neste arquivo")
+    args = parser.parse_args()
+
+    database.create_tables()
+    result = import_users(read_records(args.arquivo, args.formato), args.verificados, args.processos, args.lote)
+
+    print(f"{result['importados']} de {result['lidos']} usuário(s) importado(s) em {result['duracao_s']:.1f}s.")
+    if result["erros"]:
+        print(f"{result['rejeitados']} linha(s) rejeitada(s):")
+        for error in result["erros"][:20]:
+            print(f"  linha {error['linha']} ({error['email']}): {error['erro']}")
+        if len(result["erros"]) > 20:
+            print(f"  ... e mais {len(result['erros']) - 20}")
+    if args.relatorio:
+        with open(args.relatorio, "w", encoding="utf-8") as f:
+            json.dump(result["erros"], f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -1,114 +1,346 @@
 import base64
 import hashlib
 import json
+import mmap
+import os
 from datetime import datetime
-from crypto.signature import sha3_256_hash, xor_bytes, mgf1
+from crypto.signature import (
+    sha3_256_hash, hash_content, hash_file, get_hash_function, xor_bytes, mgf1, DEFAULT_HASH_ALGORITHM
+)
 from crypto.keygen import deserialize_key
+from crypto.merkle import leaf_hashes, leaf_hashes_from_file, merkle_root
+from crypto.crypto_backend import get_backend
+import metrics
 
 def parse_signature(b64_sig):
     return int.from_bytes(base64.b64decode(b64_sig), "big")
 
+def verify_digest(m_hash, b64_sig, public_key, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+    """
+    Verifica a assinatura (Base64) de um hash já calculado (pré-hash).
+    public_key pode ser a tupla (n, e) ou a chave serializada.
+    """
+    return Verifier(public_key).verify_digest(m_hash, b64_sig, hash_algorithm)
+
 def rsa_pss_verify(message, b64_sig, public_key, em_len):
-    sig_int = parse_signature(b64_sig)
-    em = pow(sig_int, public_key[1], public_key[0]).to_bytes(em_len, "big")
-    h_len = 32
+    # em_len é mantido por compatibilidade; o Verifier o calcula a partir da chave
+    return verify_digest(sha3_256_hash(message), b64_sig, public_key)
 
-    if em[-1] != 0xbc:
-        return False
-    h = em[-h_len-1:-1]
-    masked_db = em[:em_len - h_len - 1]
-    db = xor_bytes(masked_db, mgf1(h, len(masked_db), h_len))
+def verify_signed_document(signature_package, public_key_pem, content=None):
+    """
+    Verifica um documento assinado usando o pacote de assinatura.
 
+    Args:
+        signature_package: Pacote gerado por sign_document_content
+        public_key_pem: Chave pública serializada
+        content: Conteúdo já decodificado (bytes ou memoryview). Quando informado,
+                 o campo "document_content" do pacote não é decodificado.
+    """
     try:
-        sep_index = db.index(b"\x01")
-    except ValueError:
-        return False
+        verifier = Verifier(public_key_pem)
+    except Exception as e:
+        return {
+            "valid": False,
+            "error": f"Erro ao verificar documento: {str(e)}",
+            "details": None
+        }
+    return verifier.verify_package(signature_package, content)
 
-    if any(b != 0 for b in db[:sep_index]):
-        return False
+def verify_detached_file(signature_package, public_key_pem, path=None):
+    """
+    Verifica uma assinatura destacada lendo o arquivo direto do disco.
 
-    salt = db[sep_index+1:]
-    m_hash = sha3_256_hash(message)
-    m_prime = b"\x00" * 8 + m_hash + salt
-    return h == hashlib.sha3_256(m_prime).digest()
+    Args:
+        signature_package: Pacote gerado por sign_detached_file
+        public_key_pem: Chave pública serializada
+        path: Caminho do arquivo, se ele tiver sido movido desde a assinatura
+    """
+    try:
+        verifier = Verifier(public_key_pem)
+    except Exception as e:
+        return {
+            "valid": False,
+            "error": f"Erro ao verificar documento: {str(e)}",
+            "details": None
+        }
+    return verifier.verify_file(signature_package, path)
 
-def verify_signed_document(signature_package, public_key_pem):
+def verify_mapped_file(signature_package, public_key_pem, path=None):
     """
-    Verifica um documento assinado usando o pacote de assinatura
+    Verifica uma assinatura destacada mapeando o arquivo na memória (mmap).
+
+    Args:
+        signature_package: Pacote gerado por sign_detached_file
+        public_key_pem: Chave pública serializada
+        path: Caminho do arquivo, se ele tiver sido movido desde a assinatura
     """
     try:
-        # Extrai dados do pacote
-        document_content_b64 = signature_package["document_content"]
-        document_hash_b64 = signature_package["document_hash"]
-        signature_b64 = signature_package["signature"]
-        
-        # Decodifica conteúdo do documento
+        verifier = Verifier(public_key_pem)
+    except Exception as e:
+        return {
+            "valid": False,
+            "error": f"Erro ao verificar documento: {str(e)}",
+            "details": None
+        }
+    return verifier.verify_mapped(signature_package, path)
+
+class Verifier:
+    """
+    Verificador RSA-PSS reutilizável.
+
+    Desserializa e valida a chave pública uma única vez e pré-calcula em_len
+    e o layout do bloco PSS, para verificar muitas assinaturas da mesma chave.
+    Com um backend acelerado (ver crypto_backend), a verificação é delegada a ele.
+    """
+    __slots__ = ("n", "e", "em_len", "h_len", "_db_len", "_top_mask", "_backend")
+
+    def __init__(self, public_key, backend=None):
+        """
+        Args:
+            public_key: Tupla (n, e) ou chave pública serializada
+            backend: Backend criptográfico (padrão: o configurado em CRYPTO_BACKEND)
+        """
+        if isinstance(public_key, str):
+            public_key = deserialize_key(public_key, "PUBLIC")
+        n, e = public_key
+        if n <= 0 or not 1 < e < n:
+            raise ValueError("Chave pública inválida")
+
+        self.n = n
+        self.e = e
+        self.h_len = hashlib.sha3_256().digest_size
+        self._backend = backend or get_backend()
+
+        em_bits = n.bit_length() - 1
+        self.em_len = (em_bits + 7) // 8
+        self._db_len = self.em_len - self.h_len - 1
+        self._top_mask = 0xFF >> (8 * self.em_len - em_bits)
+
+    @metrics.timed("crypto.rsa_verify")
+    def verify_digest(self, m_hash, b64_sig, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+        """Verifica a assinatura (Base64) de um hash já calculado com o algoritmo informado"""
+        hash_function = get_hash_function(hash_algorithm)
+        if len(m_hash) != self.h_len:
+            return False
+        if self._backend.accelerated:
+            return self._backend.verify_digest(m_hash, b64_sig, (self.n, self.e), hash_algorithm)
+        sig_int = parse_signature(b64_sig)
+        if sig_int >= self.n:
+            return False
+        em_int = pow(sig_int, self.e, self.n)
+        if em_int.bit_length() > 8 * self.em_len:
+            return False
+        em = em_int.to_bytes(self.em_len, "big")
+
+        if em[-1] != 0xbc:
+            return False
+        h = em[self._db_len:-1]
+        db = xor_bytes(em[:self._db_len], mgf1(h, self._db_len, self.h_len, hash_algorithm))
+        # Ignora os bits excedentes zerados pelo assinante (RFC 8017, 9.1.2). Assinaturas
+        # antigas não zeravam esses bits e continuam aceitas, pois o DB original começa com 0x00
+        db = bytes([db[0] & self._top_mask]) + db[1:]
+
+        sep_index = db.find(b"\x01")
+        if sep_index < 0 or any(db[:sep_index]):
+            return False
+
+        salt = db[sep_index+1:]
+        return h == hash_function(b"\x00" * 8 + m_hash + salt).digest()
+
+    def verify(self, message, b64_sig, hash_algorithm=DEFAULT_HASH_ALGORITHM):
+        """Verifica a assinatura (Base64) de uma mensagem (str ou bytes)"""
+        return self.verify_digest(hash_content(message, hash_algorithm), b64_sig, hash_algorithm)
+
+    def verify_many(self, items):
+        """
+        Verifica vários itens da mesma chave: pacotes de assinatura, pares
+        (mensagem, assinatura) ou trios (mensagem, assinatura, hash_algorithm).
+        O hash de cada item segue o algoritmo dele, como em verify_package;
+        sem algoritmo informado, SHA3-256.
+
+        Returns:
+            list: True ou False para cada item
+        """
+        results = []
+        for item in items:
+            if isinstance(item, dict):
+                results.append(self.verify_package(item)["valid"])
+                continue
+            message, b64_sig, *hash_algorithm = item
+            results.append(self.verify(message, b64_sig, (hash_algorithm or [None])[0] or DEFAULT_HASH_ALGORITHM))
+        return results
+
+    @metrics.timed("verify.check")
+    def verify_package(self, signature_package, content=None):
+        """
+        Verifica um pacote de assinatura e retorna o resultado detalhado.
+
+        O conteúdo é decodificado uma única vez para um memoryview, usado tanto
+        no cálculo do hash quanto na verificação da assinatura.
+        """
         try:
-            document_content = base64.b64decode(document_content_b64).decode('utf-8')
-        except UnicodeDecodeError:
-            # Se não conseguir decodificar como UTF-8, trata como binário
-            document_content_bytes = base64.b64decode(document_content_b64)
-            # Para verificação, usa o conteúdo em base64 como string
-            document_content = document_content_b64
-        
-        # Deserializa chave pública
-        public_key = deserialize_key(public_key_pem, "PUBLIC")
-        
-        # Calcula tamanho da assinatura
-        em_len = (public_key[0].bit_length() + 7) // 8
-        
-        # Verifica integridade do documento
-        if isinstance(document_content, str) and document_content == document_content_b64:
-            # Conteúdo binário - usa os bytes originais para hash
-            calculated_hash = sha3_256_hash(base64.b64decode(document_content_b64))
-        else:
-            # Conteúdo texto - usa a string para hash
-            calculated_hash = sha3_256_hash(document_content)
-            
-        stored_hash = base64.b64decode(document_hash_b64)
-        
-        if calculated_hash != stored_hash:
+            # Decodifica o conteúdo uma única vez (ou usa o buffer já fornecido)
+            if content is None:
+                content = base64.b64decode(signature_package["document_content"])
+            buffer = memoryview(content)
+
+            # O algoritmo registrado no pacote define o hash
+            hash_algorithm = _package_hash_algorithm(signature_package)
+
+            # Verifica integridade do documento (hash plano ou raiz de Merkle dos blocos)
+            if signature_package.get("digest_mode") == "merkle":
+                leaves = leaf_hashes(buffer, signature_package["chunk_size"], hash_algorithm)
+                calculated_hash = merkle_root(leaves, hash_algorithm)
+            else:
+                calculated_hash = hash_content(buffer, hash_algorithm)
+
+            return self._check_hash(signature_package, calculated_hash, hash_algorithm,
+                                    _content_preview(buffer, signature_package.get("content_type")))
+
+        except Exception as e:
             return {
                 "valid": False,
-                "error": "Documento foi alterado após a assinatura",
+                "error": f"Erro ao verificar documento: {str(e)}",
                 "details": None
             }
-        
-        # Para verificação da assinatura, usa o conteúdo original
-        if isinstance(document_content, str) and document_content == document_content_b64:
-            # Conteúdo binário - converte para string base64 para assinatura
-            content_for_signature = document_content_b64
-        else:
-            # Conteúdo texto
-            content_for_signature = document_content
-        
-        # Verifica assinatura
-        is_valid = rsa_pss_verify(content_for_signature, signature_b64, public_key, em_len)
-        
-        if is_valid:
+
+    @metrics.timed("verify.check")
+    def verify_file(self, signature_package, path=None):
+        """
+        Verifica um pacote de assinatura destacada contra o arquivo no disco.
+
+        O arquivo é lido em blocos (ou por intervalos de blocos, em paralelo, no
+        modo Merkle), então a memória usada não depende do tamanho do arquivo.
+
+        Args:
+            path: Caminho do arquivo (padrão: o "file_path" registrado no pacote)
+        """
+        try:
+            path = path or signature_package["file_path"]
+            if not os.path.isfile(path):
+                return {
+                    "valid": False,
+                    "error": f"Arquivo não encontrado: {path}",
+                    "details": None
+                }
+
+            # Um tamanho diferente já indica alteração, sem precisar ler o arquivo
+            expected_size = signature_package.get("file_size")
+            if expected_size is not None and os.path.getsize(path) != expected_size:
+                return {
+                    "valid": False,
+                    "error": "Documento foi alterado após a assinatura",
+                    "details": None
+                }
+
+            hash_algorithm = _package_hash_algorithm(signature_package)
+            if signature_package.get("digest_mode") == "merkle":
+                leaves = leaf_hashes_from_file(path, signature_package["chunk_size"], hash_algorithm)
+                calculated_hash = merkle_root(leaves, hash_algorithm)
+            else:
+                calculated_hash = hash_file(path, hash_algorithm)
+
+            return self._check_hash(signature_package, calculated_hash, hash_algorithm, f"Arquivo: {path}")
+
+        except Exception as e:
             return {
-                "valid": True,
-                "error": None,
-                "details": {
-                    "sender_email": signature_package.get("sender_email"),
-                    "timestamp": signature_package.get("timestamp"),
-                    "document_content": document_content if isinstance(document_content, str) and document_content != document_content_b64 else "Conteúdo binário",
-                    "algorithm": signature_package.get("algorithm", "RSA-PSS"),
-                    "hash_algorithm": signature_package.get("hash_algorithm", "SHA3-256")
+                "valid": False,
+                "error": f"Erro ao verificar documento: {str(e)}",
+                "details": None
+            }
+
+    @metrics.timed("verify.check")
+    def verify_mapped(self, signature_package, path=None):
+        """
+        Como verify_file, mas o hash é calculado sobre o arquivo mapeado na memória:
+        as páginas são lidas sob demanda pelo sistema, sem cópias para buffers do
+        processo, e o conteúdo nunca é carregado inteiro.
+        """
+        try:
+            path = path or signature_package["file_path"]
+            if not os.path.isfile(path):
+                return {
+                    "valid": False,
+                    "error": f"Arquivo não encontrado: {path}",
+                    "details": None
+                }
+
+            expected_size = signature_package.get("file_size")
+            if expected_size is not None and os.path.getsize(path) != expected_size:
+                return {
+                    "valid": False,
+                    "error": "Documento foi alterado após a assinatura",
+                    "details": None
                 }
+
+            hash_algorithm = _package_hash_algorithm(signature_package)
+            calculated_hash = _mapped_digest(path, signature_package, hash_algorithm)
+            return self._check_hash(signature_package, calculated_hash, hash_algorithm, f"Arquivo: {path}")
+
+        except Exception as e:
+            return {
+                "valid": False,
+                "error": f"Erro ao verificar documento: {str(e)}",
+                "details": None
             }
-        else:
+
+    def _check_hash(self, signature_package, calculated_hash, hash_algorithm, preview):
+        """Compara o hash calculado com o do pacote e verifica a assinatura sobre ele"""
+        stored_hash = base64.b64decode(signature_package["document_hash"])
+
+        if calculated_hash != stored_hash:
+            return {
+                "valid": False,
+                "error": "Documento foi alterado após a assinatura",
+                "details": None
+            }
+
+        # Verifica a assinatura sobre o mesmo hash, sem reprocessar o conteúdo
+        if not self.verify_digest(calculated_hash, signature_package["signature"], hash_algorithm):
             return {
                 "valid": False,
                 "error": "Assinatura digital inválida",
                 "details": None
             }
-            
-    except Exception as e:
+
         return {
-            "valid": False,
-            "error": f"Erro ao verificar documento: {str(e)}",
-            "details": None
+            "valid": True,
+            "error": None,
+            "details": {
+                "sender_email": signature_package.get("sender_email"),
+                "timestamp": signature_package.get("timestamp"),
+                "document_content": preview,
+                "algorithm": signature_package.get("algorithm", "RSA-PSS"),
+                "hash_algorithm": hash_algorithm
+            }
         }
 
+def _mapped_digest(path, signature_package, hash_algorithm):
+    """Hash plano ou raiz de Merkle de um arquivo mapeado na memória"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Arquivos vazios não podem ser mapeados
+            content = b""
+        else:
+            content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if signature_package.get("digest_mode") == "merkle":
+                return merkle_root(leaf_hashes(content, signature_package["chunk_size"], hash_algorithm), hash_algorithm)
+            return hash_content(content, hash_algorithm)
+        finally:
+            if isinstance(content, mmap.mmap):
+                content.close()
 
+def _package_hash_algorithm(signature_package):
+    """Algoritmo de hash registrado no pacote; pacotes antigos usam SHA3-256"""
+    return signature_package.get("hash_algorithm") or DEFAULT_HASH_ALGORITHM
+
+def _content_preview(buffer, content_type):
+    """Conteúdo exibido no resultado: o texto, ou um aviso para conteúdo binário"""
+    if content_type == "binary":
+        return "Conteúdo binário"
+    try:
+        return str(buffer, "utf-8")
+    except UnicodeDecodeError:
+        # Pacotes antigos não registram o tipo do conteúdo
+        return "Conteúdo binário"
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Pasta monitorada: assina e envia automaticamente os arquivos deixados em um diretório.
+
+O serviço consulta a pasta a cada --intervalo segundos e mantém, na tabela
+watched_files, o tamanho, a data de modificação e o hash SHA3-256 de cada
+arquivo já processado:
+
+- arquivos com o mesmo tamanho e data de modificação do índice são ignorados
+  sem serem lidos;
+- arquivos cuja data mudou mas cujo conteúdo (hash) é o mesmo só têm o índice
+  atualizado;
+- arquivos novos ou alterados são assinados e enviados aos destinatários
+  configurados por document_manager.sign_and_send_file.
+
+A varredura só lista a pasta: o hash e a assinatura rodam em um pool de
+processos (--processos), e arquivos removidos ou ilegíveis no meio do caminho
+são registrados no log e ficam para a próxima varredura. No máximo --fila
+arquivos ficam em andamento: com a fila cheia, a varredura espera uma
+assinatura terminar antes de continuar (contrapressão). Arquivos ocultos,
+temporários (.tmp, .part, ~) ou modificados há menos de --estabilidade
+segundos (ainda sendo copiados) ficam para a próxima varredura.
+
+Antes de ir para o pool, o arquivo é marcado como 'signing' no índice. Se o
+serviço for interrompido no meio da assinatura, ao reiniciar ele procura o
+documento pelo conteúdo (find_documents_by_content) e só assina de novo se ele
+não tiver sido gravado (nem for o conteúdo já assinado antes). Arquivos que falharam não são repetidos até mudarem (ou
+com --repetir-erros).
+
+A senha do remetente é pedida no início, ou lida de WATCH_PASSWORD quando o
+serviço roda sem terminal.
+
+Uso:
+    python watch_folder.py PASTA --remetente EMAIL --destinatarios EMAIL [EMAIL ...]
+        [--intervalo S] [--processos N] [--fila N] [--destacada] [--recursivo]
+        [--estabilidade S] [--repetir-erros] [--uma-vez]
+"""
+import argparse
+import contextlib
+import getpass
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import database
+from database import get_db_connection
+from auth import login_user
+from crypto.signature import hash_file
+from document_manager import sign_and_send_file, find_documents_by_content
+
+TEMPORARY_SUFFIXES = (".tmp", ".part", ".crdownload", "~")
+
+def _log(message):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {message}", flush=True)
+
+def _scan(folder, recursive=False, settle=2.0):
+    """
+    Arquivos prontos para processar na pasta.
+
+    Yields:
+        tuple: (caminho absoluto, os.stat_result)
+    """
+    now = time.time()
+    pending = [folder]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            _log(f"⚠️ {directory}: {e}")
+            continue
+        for entry in entries:
+            if entry.name.startswith(".") or entry.name.endswith(TEMPORARY_SUFFIXES):
+                continue
+            # Arquivos removidos, renomeados ou sem permissão desde a listagem ficam para a próxima varredura
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError as e:
+                _log(f"⚠️ {entry.path}: {e}")
+                continue
+            # Arquivo ainda sendo escrito (ou vazio): fica para a próxima varredura
+            if stat.st_size == 0 or now - stat.st_mtime < settle:
+                continue
+            yield os.path.abspath(entry.path), stat
+
+def load_index(conn):
+    """Índice persistido: caminho -> (tamanho, mtime, hash, status, document_id)"""
+    return {row["path"]: (row["size"], row["mtime"], row["digest"], row["status"], row["document_id"])
+            for row in conn.execute("SELECT path, size, mtime, digest, status, document_id FROM watched_files")}
+
+def _save_entry(conn, path, size, mtime, digest, status, document_id=None, error_message=None):
+    conn.execute("""
+        INSERT OR REPLACE INTO watched_files (path, size, mtime, digest, status, document_id, error_message, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (path, size, mtime, digest, status, document_id, error_message, datetime.now()))
+    conn.commit()
+
+def _file_digest(path):
+    """Hash SHA3-256 do arquivo, ou None se ele não puder ser lido"""
+    try:
+        return hash_file(path, "SHA3-256").hex()
+    except OSError:
+        return None
+
+def recover_interrupted(conn, sender_id):
+    """
+    Resolve os arquivos que ficaram em 'signing' por uma interrupção: se o
+    documento chegou a ser gravado (mesmo conteúdo, enviado depois da marcação),
+    ou se o conteúdo é o que já estava assinado (a entrada guarda o hash e o
+    documento anteriores), o arquivo é dado como assinado; senão a entrada é
+    removida e ele é assinado de novo.
+
+    Returns:
+        tuple: (recuperados, reenfileirados)
+    """
+    recovered = requeued = 0
+    rows = conn.execute("""
+        SELECT path, size, mtime, digest, document_id, updated_at FROM watched_files WHERE status = 'signing'
+    """).fetchall()
+    for row in rows:
+        documents = []
+        digest = _file_digest(row["path"])
+        if digest is not None:
+            try:
+                documents, _ = find_documents_by_content(sender_id, row["path"])
+            except OSError:
+                documents = []
+        documents = [document for document in documents
+                     if document["role"] == "sent" and str(document["created_at"]) >= str(row["updated_at"])]
+        if documents:
+            _save_entry(conn, row["path"], row["size"], row["mtime"], digest, "signed", documents[0]["document_id"])
+            recovered += 1
+        elif row["document_id"] and digest == row["digest"]:
+            _save_entry(conn, row["path"], row["size"], row["mtime"], digest, "signed", row["document_id"])
+            recovered += 1
+        else:
+            conn.execute("DELETE FROM watched_files WHERE path = ?", (row["path"],))
+            conn.commit()
+            requeued += 1
+    return recovered, requeued
+
+_worker = {}
+
+def _init_worker(sender_id, sender_email, receivers, password, detached):
+    # Ctrl+C chega a todo o grupo de processos: quem encerra o pool é o processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker.update(sender_id=sender_id, sender_email=sender_email, receivers=receivers,
+                   password=password, detached=detached)
+
+def _sign_worker(path, signed_digest=None):
+    """
+    Calcula o hash e assina um arquivo no processo do pool; as mensagens de
+    progresso de document_manager são descartadas.
+
+    Args:
+        signed_digest: Hash do conteúdo já assinado, se houver; com o mesmo hash
+                       o arquivo não é assinado de novo
+
+    Returns:
+        tuple: (situação "signed", "unchanged", "error" ou "missing", hash, mensagem, document_id)
+    """
+    try:
+        digest = hash_file(path, "SHA3-256").hex()
+    except OSError as e:
+        return "missing", None, str(e), None
+    if digest == signed_digest:
+        return "unchanged", digest, None, None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        success, message, document_id = sign_and_send_file(
+            _worker["sender_id"], _worker["sender_email"], _worker["receivers"], path,
+            _worker["password"], detached=_worker["detached"])
+    return ("signed" if success else "error"), digest, message, document_id
+
+def watch(folder, sender, receivers, password, workers=2, queue_size=None, detached=False, interval=5.0,
+          settle=2.0, recursive=False, once=False, stop=None):
+    """
+    Monitora a pasta até stop ser sinalizado (ou por uma única varredura, com once).
+
+    Args:
+        sender: Dicionário do remetente autenticado (user_id, email)
+        receivers: Lista de tuplas (user_id, email) dos destinatários
+        workers: Processos de assinatura
+        queue_size: Máximo de arquivos em andamento (padrão: 2 por processo)
+
+    Returns:
+        dict: Contagem de arquivos assinados, inalterados e com erro
+    """
+    folder = os.path.abspath(folder)
+    queue_size = queue_size or workers * 2
+    stop = stop or threading.Event()
+    totals = {"assinados": 0, "inalterados": 0, "erros": 0}
+
+    conn = get_db_connection()
+    try:
+        recovered, requeued = recover_interrupted(conn, sender["user_id"])
+        if recovered or requeued:
+            _log(f"Retomada: {recovered} arquivo(s) já assinado(s), {requeued} reenfileirado(s).")
+        index = load_index(conn)
+        in_flight = {}
+
+        def collect(futures):
+            for future in futures:
+                path, size, mtime, known = in_flight.pop(future)
+                try:
+                    status, digest, message, document_id = future.result()
+                except Exception as e:
+                    status, digest, message, document_id = "error", None, f"Erro ao assinar: {e}", None
+                if status == "missing":
+                    # Removido ou ilegível depois da varredura: volta ao estado anterior até a próxima
+                    if known:
+                        _save_entry(conn, path, *known)
+                    else:
+                        conn.execute("DELETE FROM watched_files WHERE path = ?", (path,))
+                        conn.commit()
+                    _log(f"⚠️ {path}: {message}")
+                    continue
+                if status == "unchanged":
+                    # Só a data mudou (ex.: arquivo copiado de novo com o mesmo conteúdo)
+                    status, document_id = "signed", known[4]
+                    totals["inalterados"] += 1
+                elif status == "signed":
+                    totals["assinados"] += 1
+                    _log(f"✅ {path} -> documento {document_id}")
+                else:
+                    totals["erros"] += 1
+                    _log(f"❌ {path}: {message}")
+                _save_entry(conn, path, size, mtime, digest, status, document_id, message if status == "error" else None)
+                index[path] = (size, mtime, digest, status, document_id)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(sender["user_id"], sender["email"], receivers, password, detached)) as pool:
+            while not stop.is_set():
+                busy = {entry[0] for entry in in_flight.values()}
+                for path, stat in _scan(folder, recursive, settle):
+                    if stop.is_set():
+                        break
+                    known = index.get(path)
+                    if path in busy or (known and known[:2] == (stat.st_size, stat.st_mtime)):
+                        continue
+
+                    # Contrapressão: com a fila cheia, espera uma assinatura terminar
+                    while len(in_flight) >= queue_size:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+
+                    # O hash é calculado no pool; a marcação guarda o conteúdo já assinado, se houver
+                    signed = known if known and known[3] == "signed" else None
+                    _save_entry(conn, path, stat.st_size, stat.st_mtime, signed and signed[2], "signing",
+                                signed and signed[4])
+                    in_flight[pool.submit(_sign_worker, path, signed and signed[2])] = \
+                        (path, stat.st_size, stat.st_mtime, known)
+                    busy.add(path)
+
+                collect([future for future in list(in_flight) if future.done()])
+                if once:
+                    break
+                stop.wait(interval)
+
+            # Encerramento: as assinaturas em andamento terminam e são registradas
+            collect(list(wait(in_flight)[0]))
+    finally:
+        conn.close()
+    return totals
+
+def _resolve_receivers(emails):
+    """Destinatários verificados pelos emails, e os emails não encontrados"""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(f"""
+            SELECT user_id, email FROM users
+            WHERE email IN ({",".join("?" * len(emails))}) AND email_verified = TRUE
+        """, emails).fetchall()
+    finally:
+        conn.close()
+    found = {row["email"]: row["user_id"] for row in rows}
+    return [(found[email], email) for email in emails if email in found], [email for email in emails if email not in found]
+
+def main():
+    parser = argparse.ArgumentParser(description="Assinatura automática dos arquivos de uma pasta monitorada")
+    parser.add_argument("pasta", help="Diretório monitorado")
+    parser.add_argument("--remetente", required=True, help="Email do remetente (assinante)")
+    parser.add_argument("--destinatarios", nargs="+", required=True, help="Emails dos destinatários")
+    parser.add_argument("--intervalo", type=float, default=5.0, help="Segundos entre varreduras")
+    parser.add_argument("--processos", type=int, default=2, help="Processos de assinatura")
+    parser.add_argument("--fila", type=int, help="Máximo de arquivos em andamento (padrão: 2 por processo)")
+    parser.add_argument("--destacada", action="store_true", help="Assinatura destacada (o arquivo fica na pasta)")
+    parser.add_argument("--recursivo", action="store_true", help="Inclui subdiretórios")
+    parser.add_argument("--estabilidade", type=float, default=2.0,
+                        help="Segundos sem modificação para um arquivo ser considerado completo")
+    parser.add_argument("--repetir-erros", action="store_true", help="Tenta de novo os arquivos que falharam")
+    parser.add_argument("--uma-vez", action="store_true", help="Faz uma única varredura e encerra")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.pasta):
+        parser.error(f"Pasta não encontrada: {args.pasta}")
+
+    database.create_tables()
+    password = os.environ.get("WATCH_PASSWORD") or getpass.getpass(f"Senha de {args.remetente}: ")
+    success, message, sender = login_user(args.remetente, password)
+    if not success:
+        print(f"❌ {message}")
+        sys.exit(1)
+
+    receivers, missing = _resolve_receivers(list(dict.fromkeys(args.destinatarios)))
+    if missing:
+        print(f"❌ Destinatário(s) não cadastrado(s) ou não verificado(s): {', '.join(missing)}")
+        sys.exit(1)
+
+    if args.repetir_erros:
+        conn = get_db_connection()
+        try:
+            conn.execute("DELETE FROM watched_files WHERE status = 'error'")
+            conn.commit()
+        finally:
+            conn.close()
+
+    # SIGTERM/Ctrl+C: para de varrer, espera as assinaturas em andamento e encerra
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    _log(f"Monitorando {os.path.abspath(args.pasta)} para {', '.join(email for _, email in receivers)}")
+    totals = watch(args.pasta, sender, receivers, password, args.processos, args.fila, args.destacada,
+                   args.intervalo, args.estabilidade, args.recursivo, args.uma_vez, stop)
+    _log(f"Encerrado: {totals['assinados']} assinado(s), {totals['inalterados']} inalterado(s), "
+         f"{totals['erros']} erro(s).")
+
+if __name__ == "__main__":
+    main()